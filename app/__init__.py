@@ -1,19 +1,76 @@
-from flask import Flask, jsonify
+import time
+
+from flask import Flask, jsonify, request
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import Config
+from .database import configure_sqlite
 from .extensions import db
 
+WRITE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    hops = app.config.get('PROXY_HOPS', 0)
+    if hops:
+        # request.remote_addr is the proxy otherwise, and every client
+        # behind it would share one join rate limit
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops, x_host=hops)
+
     db.init_app(app)
 
+    with app.app_context():
+        configure_sqlite(db.engine, app.config.get('SQLITE_PRAGMAS', {}))
+
+    # Registers the change journal's session hooks
+    from . import journal
+
+    from . import instrumentation
+    with app.app_context():
+        instrumentation.init_app(app, db.engine)
+
+    from . import metrics
+    metrics.init_app(app)
+
     from .routes.main import main_bp
     from .routes.api import api_bp
     
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp)
+
+    @app.cli.command('db-upgrade')
+    def db_upgrade():
+        """Create missing tables and apply pending schema migrations."""
+        from .migrations import init_db
+        init_db()
     
+    @app.after_request
+    def commit_unit_of_work(response):
+        # One transaction per request: endpoints and log_action only stage
+        # their changes, which go out here in a single commit.
+        if response.status_code >= 400:
+            db.session.rollback()
+            return response
+        try:
+            started = time.perf_counter()
+            db.session.commit()
+            if request.method in WRITE_METHODS:
+                metrics.COMMIT_SECONDS.observe(time.perf_counter() - started)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Db Commit Error: {e}")
+            response = jsonify({'error': 'Database error'})
+            response.status_code = 500
+            return response
+        try:
+            journal.compact_due(app.config.get('JOURNAL_COMPACT_EVERY', 2000))
+        except Exception as e:
+            # The request's own changes are committed; retried at the next threshold
+            db.session.rollback()
+            print(f"Journal compaction error: {e}")
+        return response
+
     @app.errorhandler(Exception)
     def handle_exception(e):
         # pass through HTTP errors
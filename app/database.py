@@ -0,0 +1,67 @@
+"""
+SQLite connection profile.
+
+Applied to the app's engine on every new connection: the PRAGMAs from
+SQLITE_PRAGMAS (WAL, busy timeout, synchronous=NORMAL, cache and mmap
+sizes, foreign keys).
+
+Transactions are begun explicitly instead of by the sqlite3 module. A
+deferred transaction that reads first and writes later cannot wait for
+the lock in WAL mode: if another writer committed in between, its
+upgrade fails with "database is locked" at once, busy_timeout or not.
+So every transaction starts deferred, and the first statement that
+writes (flush, bulk UPDATE, journal insert) first restarts it as BEGIN
+IMMEDIATE, which queues on busy_timeout. Until then nothing has been
+written, so only the read snapshot is given up.
+
+The write lock is thus held from the first write to the commit, and
+never by transactions that only read: password checks, report rendering
+and streamed responses run without it.
+
+In-memory databases (tests) get the same PRAGMAs, foreign keys
+included, but neither WAL nor the explicit transactions: they share one
+connection between all sessions and have no file to lock.
+"""
+from sqlalchemy import event
+
+READ_STATEMENTS = ('SELECT', 'PRAGMA', 'WITH')
+# Only meaningful for a database file
+FILE_PRAGMAS = ('journal_mode', 'mmap_size')
+
+
+def configure_sqlite(engine, pragmas):
+    if engine.dialect.name != 'sqlite':
+        return
+    in_memory = engine.url.database in (None, '', ':memory:')
+
+    @event.listens_for(engine, 'connect')
+    def apply_pragmas(dbapi_connection, connection_record):
+        if not in_memory:
+            # Take over transaction control from the sqlite3 module
+            dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if not (in_memory and name in FILE_PRAGMAS):
+                cursor.execute(f"PRAGMA {name} = {value}")
+        cursor.close()
+
+    if in_memory:
+        return
+
+    @event.listens_for(engine, 'begin')
+    def begin(connection):
+        # On the DBAPI connection, like the implicit BEGIN it replaces
+        # (not a statement for cursor-execute listeners)
+        connection.connection.driver_connection.execute("BEGIN")
+        connection.info['write_lock'] = False
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def take_write_lock(connection, cursor, statement, parameters, context, executemany):
+        if connection.info.get('write_lock') is not False:
+            return
+        if statement.lstrip()[:6].upper().startswith(READ_STATEMENTS):
+            return
+        driver = connection.connection.driver_connection
+        driver.execute("ROLLBACK")
+        driver.execute("BEGIN IMMEDIATE")
+        connection.info['write_lock'] = True
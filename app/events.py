@@ -0,0 +1,125 @@
+"""
+In-process change notifications for the `/api/stream` SSE channel.
+
+Each open stream subscribes to its session and gets a Subscription; the
+change journal publishes the session ids of every committed transaction.
+Notifications carry no data: a woken stream reads the current cursor and
+the client fetches `/api/updates?cursor=N` itself. Bursts of commits
+collapse into a single wake-up.
+
+Every stream holds a server thread while it is open, so subscribe()
+takes a limit (STREAM_LIMIT per process): beyond it the stream is turned
+away and its client polls until it reconnects.
+
+Subscriptions live in this process only. Writes handled by other worker
+processes are picked up by a per-process watcher thread (see watch()):
+every STREAM_WATCH_INTERVAL seconds it reads the latest cursor of each
+subscribed session, one query for all of them, and publishes the
+sessions whose cursor moved. Without it, streams only re-check the
+journal on every heartbeat.
+"""
+import os
+import threading
+import time
+
+_lock = threading.Lock()
+_subscribers = {}  # session_id -> set of Subscription
+_open = 0
+
+_watch_lock = threading.Lock()
+_watcher = None  # (pid, Thread)
+
+
+class Subscription:
+    def __init__(self, session_id, squad_id=None):
+        self.session_id = session_id
+        self.squad_id = squad_id
+        self._event = threading.Event()
+
+    def notify(self):
+        self._event.set()
+
+    def wait(self, timeout):
+        """Block until notified or `timeout` seconds passed; True if notified."""
+        notified = self._event.wait(timeout)
+        self._event.clear()
+        return notified
+
+
+def subscribe(session_id, squad_id=None, limit=0):
+    """A Subscription, or None if `limit` (0: unlimited) are already open in this process."""
+    global _open
+    sub = Subscription(session_id, squad_id)
+    with _lock:
+        if limit and _open >= limit:
+            return None
+        _subscribers.setdefault(session_id, set()).add(sub)
+        _open += 1
+    return sub
+
+
+def unsubscribe(sub):
+    global _open
+    with _lock:
+        subs = _subscribers.get(sub.session_id)
+        if subs and sub in subs:
+            subs.discard(sub)
+            _open -= 1
+            if not subs:
+                del _subscribers[sub.session_id]
+
+
+def publish(session_ids):
+    with _lock:
+        targets = [sub for sid in session_ids for sub in _subscribers.get(sid, ())]
+    for sub in targets:
+        sub.notify()
+
+
+def watch(app, interval):
+    """Start this process's journal watcher unless it is already running."""
+    global _watcher
+    with _watch_lock:
+        # A forked worker inherits the record but not the thread
+        if _watcher and _watcher[0] == os.getpid() and _watcher[1].is_alive():
+            return
+        thread = threading.Thread(target=_watch, args=(app, interval), name='journal-watcher', daemon=True)
+        _watcher = (os.getpid(), thread)
+    thread.start()
+
+
+def _watch(app, interval):
+    from .extensions import db
+    from .journal import latest_cursors
+
+    seen = {}
+    while True:
+        time.sleep(interval)
+        with _lock:
+            session_ids = list(_subscribers)
+        if not session_ids:
+            seen = {}
+            continue
+        try:
+            with app.app_context():
+                try:
+                    cursors = latest_cursors(session_ids)
+                finally:
+                    db.session.remove()
+        except Exception as e:
+            print(f"Journal watcher: {e}")
+            continue
+        # Sessions seen for the first time are published too: a commit may
+        # have landed between the stream's first cursor read and this one
+        moved = [sid for sid, cursor in cursors.items() if seen.get(sid) != cursor]
+        seen = cursors
+        if moved:
+            publish(moved)
+
+
+def connection_counts():
+    """Open subscriptions: (dashboards, squad phones)."""
+    with _lock:
+        subs = [sub for subs in _subscribers.values() for sub in subs]
+    squads = sum(1 for sub in subs if sub.squad_id is not None)
+    return len(subs) - squads, squads
@@ -0,0 +1,156 @@
+"""
+Per-request SQL instrumentation (opt-in: SQL_METRICS=1).
+
+Engine events count and time every statement a request issues, the
+commit at the end of the request included. Each response then carries
+
+    Server-Timing: db;dur=3.2;desc="7 queries", app;dur=11.8
+
+and the totals are aggregated per endpoint, with the slowest statements
+(SQL text only, no parameters), at /api/_debug/metrics. When disabled
+nothing is hooked and the debug endpoint does not exist.
+
+count_queries() counts the statements of a block on the current thread
+whether or not the instrumentation is enabled; the tests' query_budget
+fixture is built on it.
+"""
+import heapq
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g, has_request_context, jsonify, request
+from sqlalchemy import event
+
+STATEMENT_CHARS = 300
+
+
+class RequestStats:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.statements = []  # (seconds, statement)
+
+    def add(self, statement, seconds):
+        self.queries += 1
+        self.sql_seconds += seconds
+        self.statements.append((seconds, statement))
+
+
+class EndpointMetrics:
+    """Per-endpoint totals of one process, and its slowest statements."""
+
+    def __init__(self, slowest=5):
+        self.slowest = slowest
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, stats, elapsed):
+        with self._lock:
+            m = self._endpoints.setdefault(endpoint, {
+                'requests': 0, 'queries': 0, 'max_queries': 0,
+                'sql_seconds': 0.0, 'seconds': 0.0, 'max_seconds': 0.0, 'slowest': [],
+            })
+            m['requests'] += 1
+            m['queries'] += stats.queries
+            m['max_queries'] = max(m['max_queries'], stats.queries)
+            m['sql_seconds'] += stats.sql_seconds
+            m['seconds'] += elapsed
+            m['max_seconds'] = max(m['max_seconds'], elapsed)
+            m['slowest'] = heapq.nlargest(self.slowest, m['slowest'] + stats.statements)
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for endpoint, m in sorted(self._endpoints.items()):
+                n = m['requests']
+                result[endpoint] = {
+                    'requests': n,
+                    'queries_total': m['queries'],
+                    'queries_mean': round(m['queries'] / n, 2),
+                    'queries_max': m['max_queries'],
+                    'sql_ms_total': round(m['sql_seconds'] * 1000, 2),
+                    'sql_ms_mean': round(m['sql_seconds'] * 1000 / n, 2),
+                    'ms_mean': round(m['seconds'] * 1000 / n, 2),
+                    'ms_max': round(m['max_seconds'] * 1000, 2),
+                    'slowest': [{'ms': round(s * 1000, 2), 'statement': stmt} for s, stmt in m['slowest']],
+                }
+            return result
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+_counters = threading.local()
+_hooked = set()
+_hook_lock = threading.Lock()
+
+
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_start'].pop()
+    for counter in getattr(_counters, 'active', ()):
+        counter.append(statement)
+    if has_request_context() and (stats := g.get('sql_stats')) is not None:
+        stats.add(statement[:STATEMENT_CHARS], seconds)
+
+
+def hook_engine(engine):
+    with _hook_lock:
+        if engine in _hooked:
+            return
+        event.listen(engine, 'before_cursor_execute', _before_execute)
+        event.listen(engine, 'after_cursor_execute', _after_execute)
+        _hooked.add(engine)
+
+
+@contextmanager
+def count_queries(engine):
+    """Collect the statements run on this thread in the block (a list)."""
+    hook_engine(engine)
+    statements = []
+    active = _counters.__dict__.setdefault('active', [])
+    active.append(statements)
+    try:
+        yield statements
+    finally:
+        active.remove(statements)
+
+
+def init_app(app, engine):
+    """Hook the engine and the request cycle. Call before any other after_request."""
+    if not app.config.get('SQL_METRICS'):
+        return
+    hook_engine(engine)
+    metrics = app.extensions['sql_metrics'] = EndpointMetrics(app.config.get('SQL_METRICS_SLOWEST', 5))
+
+    @app.before_request
+    def start_sql_stats():
+        g.sql_stats = RequestStats()
+
+    # Registered first so it runs last, after the unit of work commits
+    @app.after_request
+    def report_sql_stats(response):
+        stats = g.pop('sql_stats', None)
+        if stats is None:
+            return response
+        elapsed = time.perf_counter() - stats.started
+        response.headers.add(
+            'Server-Timing',
+            f'db;dur={stats.sql_seconds * 1000:.1f};desc="{stats.queries} queries", app;dur={elapsed * 1000:.1f}'
+        )
+        if request.endpoint != 'sql_debug_metrics':
+            metrics.record(request.endpoint or request.path, stats, elapsed)
+        return response
+
+    @app.route('/api/_debug/metrics', endpoint='sql_debug_metrics', methods=['GET', 'DELETE'])
+    def debug_metrics():
+        if request.method == 'DELETE':
+            metrics.reset()
+            return jsonify({'status': 'reset'})
+        return jsonify(metrics.snapshot())
@@ -0,0 +1,136 @@
+"""
+Background PDF report jobs.
+
+POST /api/export/pdf/jobs queues generate_pdf_file() on a small thread
+pool and returns a job id; GET /api/export/pdf/jobs/<id> reports status
+and progress; .../download serves the finished file.
+
+Job state and results live on disk under REPORT_DIR, so any
+worker process can answer status and download requests. A result is
+named after the session and its data version (the change journal
+cursor): as long as the session is unchanged, a new job for it finishes
+immediately with the existing file.
+
+Job records not written to for REPORT_JOB_TTL seconds are removed when
+the next job is submitted. Running jobs rewrite theirs at every 10% of
+progress, so this only drops finished, failed and abandoned ones.
+"""
+import glob
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+
+from .extensions import db
+from .journal import current_cursor
+from .models import ShiftConfig
+from .report_cache import get_report_cache
+
+
+class ReportJobs:
+    def __init__(self, app):
+        self.app = app
+        self.cache = get_report_cache()
+        self.directory = self.cache.directory
+        self.ttl = app.config.get('REPORT_JOB_TTL', 3600)
+        self.executor = ThreadPoolExecutor(
+            max_workers=app.config.get('REPORT_WORKERS', 2), thread_name_prefix='report')
+
+    # --- Files ---
+
+    def _job_path(self, job_id):
+        return os.path.join(self.directory, f"job_{job_id}.json")
+
+    def _write(self, job):
+        # Atomic replace: readers in other threads/processes never see half a file
+        path = self._job_path(job['id'])
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def get(self, job_id):
+        try:
+            with open(self._job_path(job_id), encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _prune(self):
+        cutoff = time.time() - self.ttl
+        for path in glob.glob(os.path.join(self.directory, "job_*.json")):
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+    # --- Jobs ---
+
+    def submit(self, session_id, version):
+        """Queue a PDF for (session, version); done at once if already rendered."""
+        job = {
+            'id': uuid.uuid4().hex,
+            'session_id': session_id,
+            'version': version,
+            'status': 'queued',
+            'progress': 0.0,
+            'error': None,
+        }
+        self._prune()
+        if self.cache.get(session_id, 'pdf', version):
+            job.update(status='done', progress=1.0)
+            self._write(job)
+            return job
+
+        self._write(job)
+        self.executor.submit(self._run, job)
+        return job
+
+    def _run(self, job):
+        with self.app.app_context():
+            try:
+                # Read first, so the report below comes from the same read
+                # transaction: the file is stored under the version it was
+                # rendered from, which is newer than the submitted one if
+                # writes landed while the job was queued
+                job['version'] = current_cursor(job['session_id'])
+                job.update(status='running')
+                self._write(job)
+
+                def progress(fraction):
+                    # Persist in 10% steps, not on every flowable
+                    if int(fraction * 10) != int(job['progress'] * 10):
+                        job['progress'] = round(fraction, 2)
+                        self._write(job)
+
+                from .reports import generate_pdf_file
+                sid = job['session_id']
+                config = ShiftConfig.query.filter_by(is_active=True, session_id=sid).first() or \
+                    ShiftConfig.query.filter_by(session_id=sid).order_by(ShiftConfig.id.desc()).first()
+                mem = generate_pdf_file(config, session_id=sid, progress=progress)
+
+                self.cache.store(sid, 'pdf', job['version'], mem.getbuffer())
+                job.update(status='done', progress=1.0)
+            except Exception as e:
+                print(f"Report job {job['id']} failed: {e}")
+                job.update(status='failed', error=str(e))
+            finally:
+                db.session.remove()
+                self._write(job)
+
+
+_init_lock = threading.Lock()
+
+
+def get_report_jobs():
+    """Per-app job runner, created on first use."""
+    with _init_lock:
+        jobs = current_app.extensions.get('report_jobs')
+        if jobs is None:
+            jobs = current_app.extensions['report_jobs'] = ReportJobs(current_app._get_current_object())
+    return jobs
@@ -0,0 +1,218 @@
+"""
+Change journal for delta sync.
+
+Every flush records which squads, missions, log entries, configs and
+option sets of a session were written, as rows of ChangeEntry. The
+auto-incrementing ChangeEntry.id is the sync cursor handed to clients:
+`/api/updates?cursor=N` only has to look at entries with id > N.
+
+ORM writes are picked up automatically by the after_flush hook below.
+Bulk `Query.update()`/`Query.delete()` and raw SQL bypass the ORM and
+must call record_change() or record_changes() explicitly.
+
+Since a delta only needs each entity's final state, older entries of an
+entity are redundant once it was written again. compact() drops them,
+and everything before a session's latest reset, every
+JOURNAL_COMPACT_EVERY entries journaled per session, so the journal
+grows with the data rather than with the number of writes over a long
+shift.
+"""
+import threading
+
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from . import events, snapshot
+from .extensions import db
+from .models import ChangeEntry, Squad, Mission, LogEntry, ShiftConfig, PredefinedOption
+
+TRACKED = {
+    Squad: 'squad',
+    Mission: 'mission',
+    LogEntry: 'log',
+    ShiftConfig: 'config',
+    PredefinedOption: 'options',
+}
+
+_compact_lock = threading.Lock()
+_journaled = {}  # session_id -> entries journaled by this process since its last compaction
+
+
+def _pending(session):
+    # (session_id, entity, entity_id, op) already journaled in this transaction
+    return session.info.setdefault('journal_seen', set())
+
+
+def _stage(session, rows, session_id, entity, entity_id=None, op='upsert'):
+    key = (session_id, entity, entity_id, op)
+    seen = _pending(session)
+    if not session_id or key in seen:
+        return
+    seen.add(key)
+    rows.append({'session_id': session_id, 'entity': entity, 'entity_id': entity_id, 'op': op})
+
+
+def _track(session, rows):
+    # Entries per session journaled in this transaction
+    counts = session.info.setdefault('journal_sessions', {})
+    for r in rows:
+        counts[r['session_id']] = counts.get(r['session_id'], 0) + 1
+
+
+def _collection_history(obj, attr):
+    # Added/removed related objects without triggering a lazy load
+    hist = inspect(obj).attrs[attr].history
+    return list(hist.added or ()) + list(hist.deleted or ())
+
+
+@event.listens_for(Session, 'after_flush')
+def _journal_flush(session, flush_context):
+    rows = []
+    writes = [(obj, False) for obj in session.new]
+    writes += [(obj, False) for obj in session.dirty if session.is_modified(obj)]
+    writes += [(obj, True) for obj in session.deleted]
+
+    for obj, deleted in writes:
+        entity = TRACKED.get(type(obj))
+        if entity is None:
+            continue
+        sid = obj.session_id
+
+        if entity == 'options':
+            _stage(session, rows, sid, 'options')
+        elif entity == 'mission':
+            _stage(session, rows, sid, 'mission', obj.id, 'delete' if deleted or obj.is_deleted else 'upsert')
+            # Roster changes alter the squads' active mission
+            for s in _collection_history(obj, 'squads'):
+                _stage(session, rows, s.session_id, 'squad', s.id)
+        elif entity == 'squad':
+            _stage(session, rows, sid, 'squad', obj.id, 'delete' if deleted else 'upsert')
+            for m in _collection_history(obj, 'missions'):
+                _stage(session, rows, m.session_id, 'mission', m.id)
+        elif not deleted:
+            _stage(session, rows, sid, entity, obj.id)
+
+    if rows:
+        session.connection().execute(ChangeEntry.__table__.insert(), rows)
+        _track(session, rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _journal_commit(session):
+    session.info.pop('journal_seen', None)
+    changed = session.info.pop('journal_sessions', None)
+    if changed:
+        # Drop cached snapshots and wake the SSE streams of the sessions
+        # written in this transaction
+        snapshot.invalidate(changed)
+        events.publish(changed)
+        with _compact_lock:
+            for sid, count in changed.items():
+                _journaled[sid] = _journaled.get(sid, 0) + count
+
+
+@event.listens_for(Session, 'after_rollback')
+def _journal_rollback(session):
+    session.info.pop('journal_seen', None)
+    session.info.pop('journal_sessions', None)
+
+
+def record_change(session_id, entity, entity_id=None, op='upsert'):
+    """Journal a write the ORM cannot see (bulk update/delete, raw SQL).
+
+    Use entity='session', op='reset' when a session's data was replaced
+    wholesale; clients then drop their state and reload.
+    """
+    record_changes(session_id, entity, [entity_id], op)
+
+
+def record_changes(session_id, entity, entity_ids, op='upsert'):
+    """record_change() for several ids of one entity, in one INSERT."""
+    rows = []
+    for entity_id in entity_ids:
+        _stage(db.session, rows, session_id, entity, entity_id, op)
+    if rows:
+        db.session.execute(ChangeEntry.__table__.insert(), rows)
+        _track(db.session, rows)
+
+
+def current_cursor(session_id):
+    return db.session.query(func.max(ChangeEntry.id)).filter(ChangeEntry.session_id == session_id).scalar() or 0
+
+
+def latest_cursors(session_ids):
+    """current_cursor() of several sessions in one query: {session_id: cursor}."""
+    rows = db.session.query(ChangeEntry.session_id, func.max(ChangeEntry.id)) \
+        .filter(ChangeEntry.session_id.in_(session_ids)).group_by(ChangeEntry.session_id)
+    return {sid: cursor for sid, cursor in rows}
+
+
+def compact(session_id):
+    """
+    Delete the journal entries of a session that no cursor needs: all but
+    the newest per entity, and all before the latest reset. changes_since()
+    answers every cursor as before; the newest entry, and with it the
+    current cursor, stays. Returns the number of deleted entries.
+    """
+    newest = db.session.query(func.max(ChangeEntry.id)).filter(ChangeEntry.session_id == session_id) \
+        .group_by(ChangeEntry.entity, ChangeEntry.entity_id)
+    last_reset = db.session.query(func.max(ChangeEntry.id)).filter(
+        ChangeEntry.session_id == session_id, ChangeEntry.op == 'reset').scalar() or 0
+    return ChangeEntry.query.filter(
+        ChangeEntry.session_id == session_id,
+        db.or_(ChangeEntry.id.notin_(newest), ChangeEntry.id < last_reset)
+    ).delete(synchronize_session=False)
+
+
+def compact_due(every):
+    """compact() and commit the sessions this process journaled `every` entries for since."""
+    with _compact_lock:
+        due = [sid for sid, count in _journaled.items() if count >= every]
+        for sid in due:
+            del _journaled[sid]
+    for sid in due:
+        compact(sid)
+        db.session.commit()
+
+
+def changes_since(session_id, cursor):
+    """
+    Collapse the journal after `cursor` into the final state per entity.
+
+    Returns a dict with the new cursor, a reset flag and id sets for
+    upserted/deleted squads and missions, new logs and whether config or
+    options changed.
+    """
+    latest = current_cursor(session_id)
+    changes = {
+        'cursor': latest,
+        'reset': cursor > latest,
+        'squads': {},
+        'missions': {},
+        'logs': set(),
+        'config': False,
+        'options': False,
+    }
+    if changes['reset'] or cursor == latest:
+        return changes
+
+    entries = ChangeEntry.query.filter(
+        ChangeEntry.session_id == session_id,
+        ChangeEntry.id > cursor,
+        ChangeEntry.id <= latest
+    ).order_by(ChangeEntry.id).all()
+
+    for e in entries:
+        if e.op == 'reset':
+            changes['reset'] = True
+            break
+        if e.entity == 'squad':
+            changes['squads'][e.entity_id] = e.op
+        elif e.entity == 'mission':
+            changes['missions'][e.entity_id] = e.op
+        elif e.entity == 'log':
+            changes['logs'].add(e.entity_id)
+        elif e.entity in ('config', 'options'):
+            changes[e.entity] = True
+
+    return changes
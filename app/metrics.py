@@ -0,0 +1,242 @@
+"""
+Operational metrics at /metrics, in the Prometheus text format.
+
+    johanniter_http_requests_total{endpoint,method,status}
+    johanniter_http_request_duration_seconds{endpoint}       histogram
+    johanniter_db_commit_duration_seconds                    histogram (writes)
+    johanniter_log_actions_total{action}
+    johanniter_report_duration_seconds{format}               histogram
+    johanniter_active_sessions                               sessions seen in the last 5 min
+    johanniter_mobile_squads                                 squad tokens seen in the last 2 min
+    johanniter_stream_connections{kind}                      open /api/stream connections
+
+Counters and histograms are plain in-process objects behind one lock
+each: recording costs a dict lookup and an addition, cheap enough to
+stay on under load.
+
+Opt-in (METRICS_ENABLED=1): the endpoint has no authentication, so on a
+public deployment keep it off or block /metrics at the proxy. When
+disabled, the request hooks are not registered and /metrics does not
+exist.
+
+Every gunicorn worker keeps its own values, and a scrape is answered by
+whichever worker gets it; the `worker` label (the pid) on every sample
+tells them apart, sum over it in queries.
+"""
+import bisect
+import functools
+import inspect
+import os
+import threading
+import time
+
+from flask import Response, request, session
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+REPORT_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra) + [('worker', os.getpid())]
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in pairs) + '}'
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.label_names = tuple(labels)
+        self._lock = threading.Lock()
+        self._values = {}
+        _registry.append(self)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self._samples(key, value))
+        return lines
+
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_labels(self.label_names, key)} {_number(value)}']
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, seconds, *labels):
+        i = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            counts, total = self._values.get(labels) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[i] += 1
+            self._values[labels] = (counts, total + seconds)
+
+    def time(self, *labels):
+        """
+        Decorator: observe the duration of every call.
+
+        Generators are timed while they produce items, not while the
+        consumer holds one: a streamed report counts its generation, not
+        the client's download.
+        """
+        def decorator(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    return fn(*args, **kwargs)
+                finally:
+                    self.observe(time.perf_counter() - start, *labels)
+
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                items = fn(*args, **kwargs)
+                elapsed = 0.0
+                try:
+                    while True:
+                        start = time.perf_counter()
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            return
+                        finally:
+                            elapsed += time.perf_counter() - start
+                        yield item
+                finally:
+                    items.close()
+                    self.observe(elapsed, *labels)
+
+            return gen_wrapper if inspect.isgeneratorfunction(fn) else wrapper
+        return decorator
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_labels(self.label_names, key, [("le", _number(bound))])} {cumulative}')
+        lines.append(f'{self.name}_sum{_labels(self.label_names, key)} {_number(total)}')
+        lines.append(f'{self.name}_count{_labels(self.label_names, key)} {cumulative}')
+        return lines
+
+
+class Gauge(Metric):
+    """Read at scrape time from `collect()`, a {label values: value} dict."""
+    kind = 'gauge'
+
+    def __init__(self, name, help, collect, labels=()):
+        super().__init__(name, help, labels)
+        self.collect = collect
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for key, value in sorted(self.collect().items()):
+            lines.append(f'{self.name}{_labels(self.label_names, key)} {_number(value)}')
+        return lines
+
+
+class RecentSet:
+    """Distinct keys seen within the last `window` seconds."""
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._seen = {}
+
+    def mark(self, key):
+        with self._lock:
+            self._seen[key] = time.monotonic()
+
+    def count(self):
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            self._seen = {k: t for k, t in self._seen.items() if t >= cutoff}
+            return len(self._seen)
+
+
+recent_sessions = RecentSet(300)
+recent_squads = RecentSet(120)
+
+
+def _stream_connections():
+    from . import events
+    dashboards, squads = events.connection_counts()
+    return {('dashboard',): dashboards, ('squad',): squads}
+
+
+REQUESTS = Counter('johanniter_http_requests_total', "HTTP requests handled.", ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = Histogram('johanniter_http_request_duration_seconds',
+                            "Time to produce a response (streamed bodies excluded).", ('endpoint',))
+COMMIT_SECONDS = Histogram('johanniter_db_commit_duration_seconds', "Unit-of-work commit time of write requests.")
+LOG_ACTIONS = Counter('johanniter_log_actions_total', "Log entries written.", ('action',))
+REPORT_SECONDS = Histogram('johanniter_report_duration_seconds', "Report generation time.", ('format',),
+                           buckets=REPORT_BUCKETS)
+Gauge('johanniter_active_sessions', "Sessions with requests in the last 5 minutes.",
+      lambda: {(): recent_sessions.count()})
+Gauge('johanniter_mobile_squads', "Squad phones with requests in the last 2 minutes.",
+      lambda: {(): recent_squads.count()})
+Gauge('johanniter_stream_connections', "Open /api/stream connections.", _stream_connections, ('kind',))
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def init_app(app):
+    if not app.config.get('METRICS_ENABLED'):
+        return
+
+    @app.before_request
+    def start_timer():
+        request.environ['johanniter.started'] = time.perf_counter()
+
+    @app.after_request
+    def record_request(response):
+        started = request.environ.get('johanniter.started')
+        if started is None or request.endpoint == 'metrics':
+            return response
+        endpoint = request.endpoint or 'unmatched'
+        REQUESTS.inc(endpoint, request.method, response.status_code)
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint)
+        if request.blueprint == 'api':
+            # Don't create a session cookie just to count it
+            sid = request.headers.get('X-Session-ID') or session.get('user_id')
+            if sid:
+                recent_sessions.mark(sid)
+            if (token := request.args.get('token')):
+                recent_squads.mark(token)
+        return response
+
+    @app.route('/metrics', endpoint='metrics')
+    def metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,139 @@
+"""
+Versioned schema migrations.
+
+db.create_all() creates missing tables (with their current indexes and
+columns) but never alters existing ones. Databases created by an older
+version are brought up to date by the numbered steps below; the last
+applied step is recorded in the `schema_version` table, so every step
+runs exactly once per database.
+
+Run `flask --app run db-upgrade` (run.py does it on startup). Steps
+must be idempotent: a fresh database created by create_all() already
+has the new schema when its steps run for the first time.
+"""
+from sqlalchemy import inspect, text
+
+from .extensions import db
+
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(fn):
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return register
+
+
+def _columns(conn, table):
+    return {c['name'] for c in inspect(conn).get_columns(table)}
+
+
+@migration(1, "Indexes for session-scoped queries")
+def _session_indexes(conn):
+    for statement in (
+        "CREATE INDEX IF NOT EXISTS ix_squad_session_position ON squad (session_id, position)",
+        "CREATE INDEX IF NOT EXISTS ix_squad_access_token ON squad (access_token)",
+        "CREATE INDEX IF NOT EXISTS ix_mission_session_deleted_created ON mission (session_id, is_deleted, created_at)",
+        "CREATE INDEX IF NOT EXISTS ix_mission_session_updated ON mission (session_id, updated_at)",
+        "CREATE INDEX IF NOT EXISTS ix_log_entry_session_timestamp ON log_entry (session_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_log_entry_mission_timestamp ON log_entry (mission_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_log_entry_squad_timestamp ON log_entry (squad_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS ix_mission_squad_squad_id ON mission_squad (squad_id)",
+    ):
+        conn.execute(text(statement))
+
+
+@migration(2, "Join digest for password lookup")
+def _join_digest(conn):
+    if 'join_digest' not in _columns(conn, 'shift_config'):
+        conn.execute(text("ALTER TABLE shift_config ADD COLUMN join_digest VARCHAR(64)"))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS ix_shift_config_join_digest ON shift_config (join_digest)"))
+
+
+@migration(3, "Mission lifecycle timestamps, backfilled from logs")
+def _mission_lifecycle(conn):
+    columns = _columns(conn, 'mission')
+    for name in ('alarmed_at', 'arrived_at', 'completed_at'):
+        if name not in columns:
+            conn.execute(text(f"ALTER TABLE mission ADD COLUMN {name} DATETIME"))
+
+    # Dispatch: first squad status/assignment log of the mission,
+    # else creation time if squads are assigned
+    conn.execute(text("""
+        UPDATE mission SET alarmed_at = COALESCE(
+            (SELECT MIN(l.timestamp) FROM log_entry l
+             WHERE l.mission_id = mission.id AND l.action IN ('STATUS', 'INFO')),
+            CASE WHEN EXISTS (SELECT 1 FROM mission_squad ms WHERE ms.mission_id = mission.id)
+                 THEN mission.created_at END)
+        WHERE alarmed_at IS NULL
+    """))
+    # Arrival: first status change to BO (4) logged for the mission by a
+    # squad other than an Ambulanz, as update_squad_status stamps it
+    conn.execute(text("""
+        UPDATE mission SET arrived_at = (
+            SELECT MIN(l.timestamp) FROM log_entry l
+            JOIN squad s ON s.id = l.squad_id
+            WHERE l.mission_id = mission.id AND l.action = 'STATUS'
+              AND (s.type IS NULL OR s.type != 'Ambulanz')
+              AND (l.details LIKE '%-> BO%' OR l.details LIKE '%-> 4%'))
+        WHERE arrived_at IS NULL
+    """))
+    # Completion: last update that closed the mission, else its last update
+    conn.execute(text("""
+        UPDATE mission SET completed_at = COALESCE(
+            (SELECT MAX(l.timestamp) FROM log_entry l
+             WHERE l.mission_id = mission.id AND l.action = 'EINSATZ UPDATE'
+               AND (l.details LIKE '%Status: Laufend -> Abgeschlossen%'
+                    OR l.details LIKE '%auf Abgeschlossen%'
+                    OR l.details LIKE '%Status geändert: Abgeschlossen%')),
+            mission.updated_at)
+        WHERE completed_at IS NULL AND status = 'Abgeschlossen'
+    """))
+
+
+@migration(4, "Join digests keyed by a per-deployment key")
+def _join_key(conn):
+    # Stored digests were keyed by SECRET_KEY: drop them, /api/join
+    # re-keys each shift by its password hash on the next join
+    conn.execute(text("UPDATE shift_config SET join_digest = NULL"))
+
+
+@migration(5, "Join key kept out of the database")
+def _join_key_file(conn):
+    # The key now comes from JOIN_KEY or the instance folder; its digests
+    # are dropped by reset_stale_join_digests() (no fingerprint recorded)
+    if inspect(conn).has_table('app_setting'):
+        conn.execute(text("DELETE FROM app_setting WHERE name = 'join_key'"))
+
+
+def current_version(conn):
+    conn.execute(text("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL)"))
+    version = conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar()
+    return version or 0
+
+
+def upgrade(engine=None):
+    """Apply all pending migrations; returns the list of applied versions."""
+    engine = engine or db.engine
+    applied = []
+    with engine.begin() as conn:
+        version = current_version(conn)
+        for step, description, fn in MIGRATIONS:
+            if step <= version:
+                continue
+            print(f"Migration {step}: {description}")
+            fn(conn)
+            conn.execute(text("INSERT INTO schema_version (version) VALUES (:v)"), {'v': step})
+            applied.append(step)
+    return applied
+
+
+def init_db():
+    """Create missing tables, then bring existing ones up to date."""
+    from .utils import reset_stale_join_digests
+
+    db.create_all()
+    upgrade()
+    reset_stale_join_digests()
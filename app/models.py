@@ -1,10 +1,16 @@
 from .extensions import db
 from datetime import datetime
+from sqlalchemy.orm import selectinload
+
+# Mission states that no longer bind a squad
+CLOSED_MISSION_STATES = ('Abgeschlossen', 'Storniert', 'Intervention unterblieben')
 
 # Association Table for Many-to-Many between Mission and Squad
 mission_squad = db.Table('mission_squad',
     db.Column('mission_id', db.Integer, db.ForeignKey('mission.id'), primary_key=True),
-    db.Column('squad_id', db.Integer, db.ForeignKey('squad.id'), primary_key=True)
+    db.Column('squad_id', db.Integer, db.ForeignKey('squad.id'), primary_key=True),
+    # The primary key covers lookups by mission; this one serves squad.missions
+    db.Index('ix_mission_squad_squad_id', 'squad_id')
 )
 
 class ShiftConfig(db.Model):
@@ -16,6 +22,9 @@ class ShiftConfig(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     session_id = db.Column(db.String(36), nullable=False, index=True)
     password_hash = db.Column(db.String(128), nullable=True)
+    # Keyed digest of the password: finds the shift to join without
+    # checking every active shift's password hash
+    join_digest = db.Column(db.String(64), nullable=True, index=True)
 
     def to_dict(self):
         return {
@@ -37,47 +46,72 @@ class Squad(db.Model):
     service_numbers = db.Column(db.String(200), nullable=True) # Comma-seperated list
     custom_location = db.Column(db.String(200), nullable=True) # Manual override
     session_id = db.Column(db.String(100), nullable=False)
-    access_token = db.Column(db.String(36), nullable=True) # QR-Code Login Token
+    access_token = db.Column(db.String(36), nullable=True, index=True) # QR-Code Login Token
 
-    __table_args__ = (db.UniqueConstraint('name', 'session_id', name='_name_session_uc'),)
+    __table_args__ = (
+        db.UniqueConstraint('name', 'session_id', name='_name_session_uc'),
+        db.Index('ix_squad_session_position', 'session_id', 'position'),
+    )
     last_status_change = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
     missions = db.relationship('Mission', secondary=mission_squad, back_populates='squads')
     
-    def to_dict(self):
-        # Helper to sort safely
-        def safe_sort_key(m):
-            return m.created_at or datetime.min
+    @classmethod
+    def for_session(cls, session_id):
+        """Squads of a session with missions and mission rosters eager-loaded.
+
+        Serializing the result with to_dict() issues no further queries.
+        """
+        return cls.query.options(
+            selectinload(cls.missions).selectinload(Mission.squads)
+        ).filter_by(session_id=session_id)
 
-        # Find active mission for this squad
-        # Prefer latest mission if multiple are active
+    @classmethod
+    def by_ids(cls, session_id, ids):
+        """{id: squad} for the given ids of a session, in one query; unknown ids are left out."""
+        ids = set(ids)
+        if not ids:
+            return {}
+        return {s.id: s for s in cls.query.filter(cls.id.in_(ids), cls.session_id == session_id)}
+
+    def to_dict(self):
+        # Single pass over the (eager-loaded) missions:
+        # - active: latest open mission (prefer latest if multiple are active)
+        # - last: latest non-deleted mission of any status
         # Enforce session_id check on missions just in case of ghost links
-        active_missions = [m for m in self.missions if m.status not in ['Abgeschlossen', 'Storniert', 'Intervention unterblieben'] and not m.outcome and not m.is_deleted and m.session_id == self.session_id]
-        active_missions.sort(key=safe_sort_key, reverse=True)
-        
+        active = None
+        last = None
+        open_count = 0
+        for m in self.missions:
+            if m.is_deleted:
+                continue
+            created = m.created_at or datetime.min
+            if last is None or created > (last.created_at or datetime.min):
+                last = m
+            if m.status != 'Abgeschlossen':
+                open_count += 1
+            if m.status not in CLOSED_MISSION_STATES and not m.outcome and m.session_id == self.session_id:
+                if active is None or created > (active.created_at or datetime.min):
+                    active = m
+
         active_mission = None
-        if active_missions:
-            m = active_missions[0]
+        if active:
             active_mission = {
-                'id': m.id,
-                'mission_number': m.mission_number,
-                'location': m.location,
-                'reason': m.reason,
-                'squad_ids': [s.id for s in m.squads]
+                'id': active.id,
+                'mission_number': active.mission_number,
+                'location': active.location,
+                'reason': active.reason,
+                'squad_ids': [s.id for s in active.squads]
             }
 
-        # Find LAST mission (any status, sorted by time)
-        all_missions = [m for m in self.missions if not m.is_deleted]
-        all_missions.sort(key=safe_sort_key, reverse=True)
         last_mission = None
-        if all_missions:
-            m = all_missions[0]
+        if last:
             last_mission = {
-                'id': m.id,
-                'mission_number': m.mission_number,
-                'location': m.location
+                'id': last.id,
+                'mission_number': last.mission_number,
+                'location': last.location
             }
 
 
@@ -88,13 +122,8 @@ class Squad(db.Model):
         elif last_mission:
             current_location_display = last_mission['location']
 
-        # Calculate patient count for Ambulanz (active missions assigned)
-        patient_count = 0
-        if self.type == 'Ambulanz':
-            # Count active missions (assuming active means not deleted/cancelled/completed)
-            # Active mission usually means status != 'Abgeschlossen'
-            # Also self.missions contains ALL missions.
-            patient_count = sum(1 for m in self.missions if not m.is_deleted and m.status != 'Abgeschlossen')
+        # Patient count for Ambulanz: missions assigned that are not completed
+        patient_count = open_count if self.type == 'Ambulanz' else 0
 
         return {
             'id': self.id,
@@ -132,6 +161,11 @@ class Mission(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     session_id = db.Column(db.String(100), nullable=False)
+
+    # Lifecycle, stamped by the endpoints on the transitions
+    alarmed_at = db.Column(db.DateTime, nullable=True) # First squad dispatched
+    arrived_at = db.Column(db.DateTime, nullable=True) # First squad on scene (BO)
+    completed_at = db.Column(db.DateTime, nullable=True) # Status set to Abgeschlossen
     
     # Soft Delete
     is_deleted = db.Column(db.Boolean, default=False)
@@ -140,6 +174,16 @@ class Mission(db.Model):
     # Relationships
     squads = db.relationship('Squad', secondary=mission_squad, back_populates='missions')
 
+    __table_args__ = (
+        db.Index('ix_mission_session_deleted_created', 'session_id', 'is_deleted', 'created_at'),
+        db.Index('ix_mission_session_updated', 'session_id', 'updated_at'),
+    )
+
+    @classmethod
+    def for_session(cls, session_id):
+        """Missions of a session with their squad roster eager-loaded."""
+        return cls.query.options(selectinload(cls.squads)).filter_by(session_id=session_id)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -159,7 +203,10 @@ class Mission(db.Model):
             'naca_score': self.naca_score,
             'notes': self.notes,
             'created_at': (self.created_at.isoformat() + 'Z') if self.created_at else None,
-            'updated_at': (self.updated_at.isoformat() + 'Z') if self.updated_at else None
+            'updated_at': (self.updated_at.isoformat() + 'Z') if self.updated_at else None,
+            'alarmed_at': (self.alarmed_at.isoformat() + 'Z') if self.alarmed_at else None,
+            'arrived_at': (self.arrived_at.isoformat() + 'Z') if self.arrived_at else None,
+            'completed_at': (self.completed_at.isoformat() + 'Z') if self.completed_at else None
         }
 
 class LogEntry(db.Model):
@@ -171,6 +218,30 @@ class LogEntry(db.Model):
     squad_id = db.Column(db.Integer, db.ForeignKey('squad.id'), nullable=True)
     session_id = db.Column(db.String(36), nullable=False, index=True)
 
+    __table_args__ = (
+        db.Index('ix_log_entry_session_timestamp', 'session_id', 'timestamp'),
+        db.Index('ix_log_entry_mission_timestamp', 'mission_id', 'timestamp'),
+        db.Index('ix_log_entry_squad_timestamp', 'squad_id', 'timestamp'),
+    )
+
+    @classmethod
+    def page(cls, session_id, limit, before_id=None):
+        """Newest-first page of a session's log, starting below `before_id`.
+
+        Keyset pagination on (timestamp, id): cost depends on `limit`, not
+        on how deep the page is. An unknown `before_id` yields no rows.
+        """
+        query = cls.query.filter_by(session_id=session_id)
+        if before_id is not None:
+            anchor = db.session.query(cls.timestamp).filter_by(id=before_id, session_id=session_id).first()
+            if anchor is None:
+                return []
+            query = query.filter(db.or_(
+                cls.timestamp < anchor.timestamp,
+                db.and_(cls.timestamp == anchor.timestamp, cls.id < before_id)
+            ))
+        return query.order_by(cls.timestamp.desc(), cls.id.desc()).limit(limit).all()
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -194,3 +265,19 @@ class PredefinedOption(db.Model):
             'value': self.value,
             'category': self.category
         }
+
+class ChangeEntry(db.Model):
+    # Change journal for delta sync: the id is the client's cursor
+    id = db.Column(db.Integer, primary_key=True)
+    session_id = db.Column(db.String(100), nullable=False, index=True)
+    entity = db.Column(db.String(20)) # squad, mission, log, config, options, session
+    entity_id = db.Column(db.Integer, nullable=True)
+    op = db.Column(db.String(10)) # upsert, delete, reset
+
+    # AUTOINCREMENT keeps cursors monotonic even if rows are ever pruned
+    __table_args__ = {'sqlite_autoincrement': True}
+
+class AppSetting(db.Model):
+    # Per-deployment values kept with the data, e.g. the join key's fingerprint
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.String(200), nullable=False)
@@ -0,0 +1,120 @@
+"""
+On-disk cache for rendered reports.
+
+A report is fully determined by its session, its format and the data
+version it was rendered from. The version is the session's change
+journal cursor, which moves on every write to missions, squads, logs or
+the config, so an entry never has to be invalidated: a changed session
+simply asks for a new key. Older versions of the same report are pruned
+when a newer one is stored; a late store of an older version leaves the
+newer ones alone. Reports not served or stored for REPORT_CACHE_TTL
+seconds, such as those of ended shifts, are removed on the next store.
+
+The ETag is derived from the same key, so clients can revalidate with
+If-None-Match without the report being read or rendered.
+"""
+import glob
+import hashlib
+import os
+import threading
+import time
+import uuid
+
+from flask import current_app
+
+
+class ReportCache:
+    def __init__(self, directory, ttl=86400):
+        self.directory = directory
+        self.ttl = ttl
+        os.makedirs(directory, exist_ok=True)
+
+    def _session_key(self, session_id):
+        return hashlib.sha256(session_id.encode('utf-8')).hexdigest()[:16]
+
+    def path(self, session_id, fmt, version):
+        return os.path.join(self.directory, f"report_{self._session_key(session_id)}_{version}.{fmt}")
+
+    def etag(self, session_id, fmt, version):
+        return hashlib.sha256(f"{session_id}:{fmt}:{version}".encode('utf-8')).hexdigest()[:32]
+
+    def get(self, session_id, fmt, version):
+        """Path of the stored report, or None if this version was not rendered yet."""
+        path = self.path(session_id, fmt, version)
+        try:
+            # Last use, for the TTL
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def store(self, session_id, fmt, version, data):
+        path = self.path(session_id, fmt, version)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp, 'wb') as f:
+            f.write(data)
+        os.replace(tmp, path)
+        self._prune(session_id, fmt, version)
+        return path
+
+    def store_stream(self, session_id, fmt, version, chunks):
+        """
+        Pass `chunks` through while writing them to the cache.
+
+        The entry only becomes visible once the stream completed; an
+        aborted download leaves nothing behind.
+        """
+        path = self.path(session_id, fmt, version)
+        tmp = f"{path}.{uuid.uuid4().hex}.tmp"
+        complete = False
+        try:
+            with open(tmp, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            os.replace(tmp, path)
+            complete = True
+        finally:
+            if not complete and os.path.exists(tmp):
+                os.unlink(tmp)
+        self._prune(session_id, fmt, version)
+
+    def _prune(self, session_id, fmt, version):
+        keep = self.path(session_id, fmt, version)
+        self._expire(keep)
+        pattern = os.path.join(self.directory, f"report_{self._session_key(session_id)}_*.{fmt}")
+        for path in glob.glob(pattern):
+            if path == keep:
+                continue
+            # Journal cursors are ordered: never drop a newer report
+            stored = os.path.basename(path)[:-len(fmt) - 1].rsplit('_', 1)[1]
+            if isinstance(version, int) and stored.isdigit() and int(stored) > version:
+                continue
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+
+    def _expire(self, keep):
+        # Reports of any session, and temp files of crashed stores
+        cutoff = time.time() - self.ttl
+        for path in glob.glob(os.path.join(self.directory, "report_*")):
+            try:
+                if path != keep and os.path.getmtime(path) < cutoff:
+                    os.unlink(path)
+            except OSError:
+                pass
+
+
+_init_lock = threading.Lock()
+
+
+def get_report_cache():
+    """Per-app report cache, created on first use."""
+    with _init_lock:
+        cache = current_app.extensions.get('report_cache')
+        if cache is None:
+            directory = current_app.config.get('REPORT_DIR') or os.path.join(current_app.instance_path, 'reports')
+            cache = current_app.extensions['report_cache'] = ReportCache(
+                directory, current_app.config.get('REPORT_CACHE_TTL', 86400))
+    return cache
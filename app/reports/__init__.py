@@ -0,0 +1,30 @@
+"""
+Shift reports: TXT export, PDF export and its charts.
+
+The generators are loaded on first access, so importing this package
+(and with it the routes) costs nothing: ReportLab is only imported when
+a PDF is rendered, matplotlib only when REPORT_CHARTS=matplotlib.
+
+    from app import reports
+    reports.generate_pdf_file(config)      # imports app.reports.pdf now
+"""
+import importlib
+
+_EXPORTS = {
+    'load_report_data': 'data',
+    'iter_export_file': 'txt',
+    'iter_export_bytes': 'txt',
+    'generate_export_file': 'txt',
+    'generate_pdf_file': 'pdf',
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f'.{module}', __name__), name)
+    globals()[name] = value
+    return value
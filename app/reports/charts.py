@@ -0,0 +1,145 @@
+"""
+Charts for the PDF report: missions per hour and mission reasons.
+
+Two renderers, chosen with REPORT_CHARTS:
+
+    vector      ReportLab graphics, drawn straight into the PDF (default)
+    matplotlib  the original PNG charts; matplotlib is only imported here,
+                on the first PDF that needs it
+
+PNGs are cached in the report cache, keyed by the session and a digest
+of the chart data, so writes that don't touch missions (status changes,
+log lines) reuse the previous image.
+"""
+import hashlib
+import io
+import json
+
+from reportlab.graphics.charts.barcharts import VerticalBarChart
+from reportlab.graphics.charts.piecharts import Pie
+from reportlab.graphics.shapes import Drawing, String
+from reportlab.lib import colors
+from reportlab.lib.units import cm
+
+WIDTH, HEIGHT = 20 * cm, 8 * cm
+TITLE_HOURS = 'Einsätze pro Stunde'
+TITLE_REASONS = 'Einsatzarten'
+NO_DATA = 'Keine Daten'
+
+PIE_COLORS = [colors.HexColor(c) for c in (
+    '#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd',
+    '#8c564b', '#e377c2', '#7f7f7f', '#bcbd22', '#17becf',
+)]
+
+
+def chart_data(missions):
+    """([(hour, count)], [(reason, count)]) for the given missions, in display order."""
+    hours, reasons = {}, {}
+    for m in missions:
+        if m.created_at:
+            h = m.created_at.strftime('%H:00')
+            hours[h] = hours.get(h, 0) + 1
+        reasons[m.reason] = reasons.get(m.reason, 0) + 1
+    return sorted(hours.items()), list(reasons.items())
+
+
+def data_version(hours, reasons):
+    return hashlib.sha256(json.dumps([hours, reasons]).encode('utf-8')).hexdigest()[:16]
+
+
+def vector_charts(hours, reasons):
+    """Both charts side by side, as a ReportLab Drawing (a flowable)."""
+    drawing = Drawing(WIDTH, HEIGHT)
+    half = WIDTH / 2
+
+    drawing.add(String(half / 2, HEIGHT - 14, TITLE_HOURS, textAnchor='middle', fontName='Helvetica-Bold', fontSize=11))
+    if hours:
+        bars = VerticalBarChart()
+        bars.x, bars.y = 1.5 * cm, 1.5 * cm
+        bars.width, bars.height = half - 2.5 * cm, HEIGHT - 3 * cm
+        bars.data = [[count for _, count in hours]]
+        bars.categoryAxis.categoryNames = [h for h, _ in hours]
+        bars.categoryAxis.labels.fontSize = 7
+        bars.categoryAxis.labels.angle = 45 if len(hours) > 8 else 0
+        bars.categoryAxis.labels.boxAnchor = 'ne' if len(hours) > 8 else 'n'
+        bars.valueAxis.valueMin = 0
+        bars.valueAxis.valueStep = max(1, max(c for _, c in hours) // 5)
+        bars.valueAxis.labels.fontSize = 7
+        bars.bars[0].fillColor = colors.skyblue
+        bars.bars[0].strokeColor = None
+        drawing.add(bars)
+    else:
+        drawing.add(String(half / 2, HEIGHT / 2, NO_DATA, textAnchor='middle'))
+
+    drawing.add(String(half + half / 2, HEIGHT - 14, TITLE_REASONS, textAnchor='middle', fontName='Helvetica-Bold', fontSize=11))
+    if reasons:
+        total = sum(count for _, count in reasons)
+        pie = Pie()
+        size = HEIGHT - 3.5 * cm
+        pie.x, pie.y = half + (half - size) / 2, 1.2 * cm
+        pie.width = pie.height = size
+        pie.data = [count for _, count in reasons]
+        pie.labels = [f"{reason or '-'} ({count / total:.1%})" for reason, count in reasons]
+        pie.startAngle = 90
+        pie.direction = 'anticlockwise'
+        pie.sideLabels = True
+        pie.simpleLabels = False
+        pie.slices.fontSize = 7
+        pie.slices.strokeColor = colors.white
+        for i in range(len(reasons)):
+            pie.slices[i].fillColor = PIE_COLORS[i % len(PIE_COLORS)]
+        drawing.add(pie)
+    else:
+        drawing.add(String(half + half / 2, HEIGHT / 2, NO_DATA, textAnchor='middle'))
+    return drawing
+
+
+def matplotlib_png(hours, reasons):
+    """
+    Both charts as one PNG (the original matplotlib rendering).
+
+    Uses a Figure of its own with the Agg canvas, not pyplot: pyplot's
+    current-figure state is global, and this runs in report job threads
+    and request threads at the same time.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=(10, 4))
+    FigureCanvasAgg(fig)
+    ax1, ax2 = fig.subplots(1, 2)
+    if hours:
+        ax1.bar([h for h, _ in hours], [c for _, c in hours], color='skyblue')
+        ax1.set_title(TITLE_HOURS)
+        ax1.set_xlabel('Uhrzeit')
+        ax1.set_ylabel('Anzahl')
+    else:
+        ax1.text(0.5, 0.5, NO_DATA, ha='center', va='center')
+
+    if reasons:
+        ax2.pie([c for _, c in reasons], labels=[r for r, _ in reasons], autopct='%1.1f%%', startangle=90)
+        ax2.set_title(TITLE_REASONS)
+    else:
+        ax2.text(0.5, 0.5, NO_DATA, ha='center', va='center')
+
+    fig.tight_layout()
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return buf.getvalue()
+
+
+def chart_flowable(session_id, missions, renderer='vector'):
+    """The report's chart block for `missions`, as a flowable."""
+    hours, reasons = chart_data(missions)
+    if renderer != 'matplotlib':
+        return vector_charts(hours, reasons)
+
+    from reportlab.platypus import Image
+    from ..report_cache import get_report_cache
+
+    cache = get_report_cache()
+    version = data_version(hours, reasons)
+    path = cache.get(session_id, 'charts.png', version)
+    if path is None:
+        path = cache.store(session_id, 'charts.png', version, matplotlib_png(hours, reasons))
+    return Image(path, width=WIDTH, height=HEIGHT)
@@ -0,0 +1,45 @@
+"""Report data: one session's missions, squads and logs in bulk."""
+from datetime import timezone
+
+from sqlalchemy.orm import selectinload
+
+from ..extensions import db
+from ..models import LogEntry, Squad, Mission
+
+def to_local(dt_obj):
+    if not dt_obj:
+        return None
+    # Assume server local time is desired
+    # UTC -> Local System Time
+    return dt_obj.replace(tzinfo=timezone.utc).astimezone(None)
+
+def load_report_data(sid):
+    """
+    Everything a report needs for one session, in a few bulk queries.
+
+    Logs are plain rows (not ORM objects) sorted by time and grouped by
+    mission and squad in memory, so the report builders never query per
+    mission, squad or log line.
+    """
+    missions = Mission.query.options(selectinload(Mission.squads)).filter_by(session_id=sid).order_by(Mission.created_at).all()
+    squads = Squad.query.options(selectinload(Squad.missions)).filter_by(session_id=sid).all()
+    logs = db.session.query(
+        LogEntry.id, LogEntry.timestamp, LogEntry.action, LogEntry.details, LogEntry.mission_id, LogEntry.squad_id
+    ).filter(LogEntry.session_id == sid).order_by(LogEntry.timestamp, LogEntry.id).all()
+
+    logs_by_mission = {}
+    logs_by_squad = {}
+    for l in logs:
+        if l.mission_id:
+            logs_by_mission.setdefault(l.mission_id, []).append(l)
+        if l.squad_id:
+            logs_by_squad.setdefault(l.squad_id, []).append(l)
+
+    return {
+        'missions': missions,
+        'missions_by_id': {m.id: m for m in missions},
+        'squads': squads,
+        'logs': logs,
+        'logs_by_mission': logs_by_mission,
+        'logs_by_squad': logs_by_squad,
+    }
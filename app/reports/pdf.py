@@ -0,0 +1,375 @@
+"""
+The PDF shift report (ReportLab).
+
+The long sections (missions, squads, full log, deleted missions) are not
+assembled up front: the story holds a Deferred placeholder per section,
+and ReportTemplate pulls its flowables block by block as the layout
+reaches them. Log tables are cut into tables of LOG_CHUNK_ROWS rows,
+each with its own header row, since splitting one table across pages
+costs time proportional to its length on every page. Only the chunk
+being laid out exists as Paragraphs at any time, so time and memory
+stay linear in the number of log entries.
+
+The data comes from load_report_data() like the TXT report's: a fixed
+number of bulk queries, whatever the size of the shift.
+"""
+import io
+import math
+
+from flask import current_app
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import SimpleDocTemplate, Flowable, Paragraph, Spacer, Table, TableStyle, PageBreak, KeepTogether
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import cm
+
+from .. import metrics
+from ..messages import LogMessages
+from ..utils import get_session_id
+from .charts import chart_flowable
+from .data import load_report_data
+
+# Rows per log table; even, so alternating row backgrounds carry on
+LOG_CHUNK_ROWS = 200
+
+
+class Deferred(Flowable):
+    """
+    Placeholder for a section produced during the build: `blocks` yields
+    lists of flowables, `estimate` is roughly how many (for progress).
+    """
+    def __init__(self, blocks, estimate):
+        super().__init__()
+        self.blocks = iter(blocks)
+        self.estimate = max(estimate, 1)
+
+
+class ReportTemplate(SimpleDocTemplate):
+    """Expands Deferred sections as the layout reaches them."""
+
+    def __init__(self, *args, progress=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.progress = progress
+        self.blocks_total = 1
+        self.blocks_done = 0
+
+    def build(self, story):
+        self.blocks_total = sum(f.estimate for f in story if isinstance(f, Deferred)) or 1
+        super().build(story)
+
+    def filterFlowables(self, flowables):
+        while flowables and isinstance(flowables[0], Deferred):
+            block = next(flowables[0].blocks, None)
+            if block is None:
+                del flowables[0]
+                continue
+            flowables[0:0] = block
+            self.blocks_done += 1
+            if self.progress:
+                self.progress(min(self.blocks_done / self.blocks_total, 1.0))
+        if not flowables:
+            # The caller takes flowables[0] next; None is skipped
+            flowables.append(None)
+
+
+def chunked(rows, size=LOG_CHUNK_ROWS):
+    for i in range(0, len(rows), size):
+        yield rows[i:i + size]
+
+
+def _log_table(rows, col_widths, style, header=None):
+    data = [header] + rows if header else rows
+    table = Table(data, colWidths=col_widths, repeatRows=1 if header else 0)
+    table.setStyle(TableStyle(style))
+    return table
+
+@metrics.REPORT_SECONDS.time('pdf')
+def generate_pdf_file(config, session_id=None, progress=None):
+    """
+    Render the PDF report into an in-memory file.
+
+    `session_id` is required outside a request when there is no config.
+    `progress`, if given, is called with a fraction between 0 and 1 as
+    the story is assembled and laid out.
+    """
+    report_progress = progress or (lambda fraction: None)
+    buffer = io.BytesIO()
+    # Layout is the bulk of the work: 10-100%
+    doc = ReportTemplate(buffer, pagesize=landscape(A4), rightMargin=2*cm, leftMargin=2*cm, topMargin=2*cm, bottomMargin=2*cm,
+                         progress=lambda fraction: report_progress(0.1 + 0.9 * fraction))
+    styles = getSampleStyleSheet()
+    story = []
+    sid = config.session_id if config else (session_id or get_session_id())
+    data = load_report_data(sid)
+    
+    # Styles
+    title_style = styles['Title']
+    heading2 = styles['Heading2']
+    heading3 = styles['Heading3']
+    normal_style = styles['Normal']
+    small_style = ParagraphStyle('Small', parent=styles['Normal'], fontSize=8, leading=10)
+    
+    # Title
+    story.append(Paragraph(LogMessages.REPORT_TITLE_PDF, title_style))
+    story.append(Spacer(1, 0.5*cm))
+    
+    # Shift Info
+    s_str = config.start_time.strftime('%d.%m.%Y %H:%M') if config and config.start_time else '?'
+    e_str = config.end_time.strftime('%d.%m.%Y %H:%M') if config and config.end_time else 'Laufend'
+    loc = config.location if config else 'Unbekannt'
+    addr = config.address if config and config.address else '-'
+    
+    info_data = [
+        [f"{LogMessages.LBL_SERVICE}", loc, f"{LogMessages.LBL_ADDRESS}", addr],
+        [f"{LogMessages.LBL_PERIOD}", f"{s_str} - {e_str}", "", ""]
+    ]
+    t = Table(info_data, colWidths=[3*cm, 8*cm, 3*cm, 8*cm])
+    t.setStyle(TableStyle([
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+        ('FONTSIZE', (0,0), (-1,-1), 10),
+        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'), # Labels bold
+        ('FONTNAME', (2,0), (2,-1), 'Helvetica-Bold'),
+    ]))
+    story.append(t)
+    story.append(Spacer(1, 1*cm))
+    
+    # Statistics Calculation
+    valid_missions = [m for m in data['missions'] if not m.is_deleted]
+    
+    # Charts: missions per hour, reasons (see app/reports/charts.py)
+    if valid_missions:
+        story.append(chart_flowable(sid, valid_missions, current_app.config.get('REPORT_CHARTS', 'vector')))
+        story.append(Spacer(1, 1*cm))
+
+    # Response Times (mission created -> first squad on scene)
+    response_times = []
+    for m in valid_missions:
+        if m.arrived_at and m.created_at:
+            delta = (m.arrived_at - m.created_at).total_seconds() / 60.0 # Minutes
+            if delta > 0:
+                response_times.append(delta)
+
+    if response_times:
+         avg_resp = sum(response_times) / len(response_times)
+         story.append(Paragraph(LogMessages.LBL_RESPONSE_TIME.format(minutes=f"{avg_resp:.1f}"), normal_style))
+         story.append(Spacer(1, 0.5*cm))
+
+    report_progress(0.1)
+
+    # Detailed Missions
+    story.append(Paragraph(LogMessages.SECTION_MISSIONS, heading2))
+    story.append(Spacer(1, 0.2*cm))
+    story.append(Deferred(_mission_blocks(valid_missions, data, styles, small_style), len(valid_missions)))
+
+    # Squad Activity
+    story.append(PageBreak())
+    story.append(Paragraph(LogMessages.SECTION_SQUADS, heading2))
+    
+    squads = data['squads']
+    story.append(Deferred(_squad_blocks(squads, data, styles, small_style), 2 * len(squads)))
+
+    # Full Log
+    story.append(PageBreak())
+    story.append(Paragraph(LogMessages.SECTION_LOG, heading2))
+    
+    story.append(Deferred(_full_log_blocks(data['logs'], small_style), math.ceil(len(data['logs']) / LOG_CHUNK_ROWS)))
+
+    # Deleted Missions
+    deleted_missions = [m for m in data['missions'] if m.is_deleted]
+    if deleted_missions:
+        story.append(PageBreak())
+        story.append(Paragraph(LogMessages.SECTION_DELETED, heading2))
+        story.append(Deferred(_deleted_blocks(deleted_missions, data, styles, small_style), len(deleted_missions)))
+
+    doc.build(story)
+    report_progress(1.0)
+    buffer.seek(0)
+    return buffer
+
+def _mission_log_tables(logs, small_style, style):
+    rows = []
+    for l in logs:
+        safe_details = l.details.replace("None", "(leer)") if l.details else ""
+        rows.append((l.timestamp.strftime('%H:%M:%S'), l.action, safe_details))
+    return [
+        _log_table([[ts, action, Paragraph(details, small_style)] for ts, action, details in chunk],
+                   [2*cm, 4*cm, 16*cm], style)
+        for chunk in chunked(rows)
+    ]
+
+def _mission_blocks(valid_missions, data, styles, small_style):
+    heading3 = styles['Heading3']
+    normal_style = styles['Normal']
+
+    for m in valid_missions:
+        mission_elements = []  # Group elements for this mission
+        
+        m_num = m.mission_number or str(m.id)
+        mission_elements.append(Paragraph(LogMessages.LBL_MISSION_NUM.format(number=m_num), heading3))
+        
+        # Details Table for this mission
+        start_t = m.created_at.strftime('%d.%m.%Y %H:%M:%S') if m.created_at else "?"
+        
+        # Determine End Time
+        end_time = "Laufend"
+        if m.status == 'Abgeschlossen':
+            # Completion time, falling back to the last update
+            completed = m.completed_at or m.updated_at
+            if completed:
+                 end_time = completed.strftime('%d.%m.%Y %H:%M:%S')
+
+        outcome = m.outcome or "-"
+        if (m.outcome == 'ARM' or m.outcome == 'ARM (Anderes Rettungsmittel)') and m.arm_id:
+             outcome = f"ARM {m.arm_id}"
+
+        # Location Display with History
+        loc_display = m.location
+        if m.initial_location and m.initial_location != m.location:
+            loc_display = f"{m.location} (Initial: {m.initial_location})"
+
+        det_data = [
+            [f"{LogMessages.LBL_TIME}", f"{start_t} - {end_time}", f"{LogMessages.LBL_OUTCOME}", outcome],
+            [f"{LogMessages.LBL_LOCATION}", Paragraph(loc_display, normal_style), f"{LogMessages.LBL_ALARMING}:", m.alarming_entity or "-"],
+            [f"{LogMessages.LBL_REASON}", Paragraph(m.reason, normal_style), f"{LogMessages.LBL_SQUADS}:", ", ".join([s.name for s in m.squads])]
+        ]
+        
+        if m.naca_score:
+             det_data.append(["NACA:", m.naca_score, "", ""])
+        
+        # Add description and notes if present
+        if m.description:
+             det_data.append([f"{LogMessages.LBL_SITUATION}", Paragraph(m.description, normal_style), "", ""])
+        if m.notes:
+             det_data.append([f"{LogMessages.LBL_NOTES}", Paragraph(m.notes, normal_style), "", ""])
+
+        dt = Table(det_data, colWidths=[2*cm, 9*cm, 3*cm, 9*cm])
+        dt.setStyle(TableStyle([
+            ('FONTNAME', (0,0), (-1,-1), 'Helvetica'),
+            ('FONTSIZE', (0,0), (-1,-1), 10),
+            ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
+            ('FONTNAME', (2,0), (2,-1), 'Helvetica-Bold'),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('GRID', (0,0), (-1,-1), 0.5, colors.lightgrey),
+        ]))
+        mission_elements.append(dt)
+        
+        # Mission Log
+        log_tables = _mission_log_tables(data['logs_by_mission'].get(m.id, []), small_style, [
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ])
+        if log_tables:
+            mission_elements.append(Spacer(1, 0.2*cm))
+            mission_elements.append(Paragraph(LogMessages.LBL_HISTORY, styles['Normal']))
+            mission_elements.extend(log_tables)
+            
+        mission_elements.append(Spacer(1, 0.5*cm))
+        mission_elements.append(Paragraph("-" * 120, small_style)) # Separator
+        mission_elements.append(Spacer(1, 0.5*cm))
+
+        # Add the grouped elements to the story, ensuring they stay together
+        yield [KeepTogether(mission_elements)]
+
+def _squad_blocks(squads, data, styles, small_style):
+    heading3 = styles['Heading3']
+    normal_style = styles['Normal']
+    # Mission numbers for the log lines below, deleted missions included
+    mission_numbers = {m_id: m.mission_number or m_id for m_id, m in data['missions_by_id'].items()}
+    for s in squads:
+        block = []
+        mission_count = len([m for m in s.missions])
+        sn_text = f" [DN: {s.service_numbers}]" if s.service_numbers else ""
+        label_type = s.type if s.type else "Trupp"
+        block.append(Paragraph(f"{label_type}: {s.name} ({s.qualification}){sn_text} - {mission_count} Einsätze", heading3))
+        
+        s_logs = data['logs_by_squad'].get(s.id, [])
+        
+        # Logs list: (time, text), turned into Paragraphs one chunk at a time
+        squad_log_data = []
+        
+        # Pause Calculation vars
+        pause_periods = []
+        pause_start = None
+        
+        for l in s_logs:
+            safe_details = l.details.replace("None", "(leer)") if l.details else ""
+            
+            # Pause Calculation Logic
+            # Check for Status Change log entries
+            if l.action == 'STATUS':
+                if "auf Pause" in safe_details:
+                    if pause_start is None:
+                        pause_start = l.timestamp
+                
+                if "von Pause" in safe_details:
+                    if pause_start:
+                        p_end = l.timestamp
+                        duration = int((p_end - pause_start).total_seconds() / 60)
+                        pause_periods.append(f"{pause_start.strftime('%H:%M')} - {p_end.strftime('%H:%M')} ({duration} Min.)")
+                        pause_start = None # Reset
+            
+            # Format display log
+            mission_context = ""
+            if l.mission_id in mission_numbers:
+                mission_context = f" (Einsatz #{mission_numbers[l.mission_id]})"
+            
+            squad_log_data.append((l.timestamp.strftime('%H:%M:%S'), f"{safe_details}{mission_context}"))
+            
+        # Check if still in pause at end of log
+        if pause_start:
+             pause_periods.append(f"{pause_start.strftime('%H:%M')} - ... (laufend)")
+
+        # Display Pause Summary
+        if pause_periods:
+            block.append(Paragraph(f"<b>{LogMessages.LBL_PAUSES}:</b> {', '.join(pause_periods)}", normal_style))
+            block.append(Spacer(1, 0.2*cm))
+        else:
+             if len([m for m in s.missions]) > 0: # Just to not clutter empty squads
+                  block.append(Paragraph(LogMessages.LBL_NO_PAUSES, normal_style))
+                  block.append(Spacer(1, 0.2*cm))
+        yield block
+
+        for rows in chunked(squad_log_data):
+            yield [_log_table([[ts, Paragraph(text, small_style)] for ts, text in rows], [2.5*cm, 18*cm], [
+                ('FONTSIZE', (0,0), (-1,-1), 8),
+                ('VALIGN', (0,0), (-1,-1), 'TOP'),
+                ('ROWBACKGROUNDS', (0,0), (-1,-1), [colors.whitesmoke, colors.white])
+            ])]
+        
+        yield [Spacer(1, 0.5*cm)]
+
+def _full_log_blocks(logs, small_style):
+    style = [
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+        ('FONTSIZE', (0,0), (-1,-1), 8),
+        ('VALIGN', (0,0), (-1,-1), 'TOP'),
+        ('GRID', (0,0), (-1,-1), 0.5, colors.grey),
+    ]
+    header = ["Zeit", "Aktion", "Details"]
+    if not logs:
+        yield [_log_table([], [4*cm, 4*cm, 18*cm], style, header=header)]
+    for rows in chunked(logs):
+        full_log_data = []
+        for l in rows:
+            safe_details = l.details.replace("None", "(leer)") if l.details else ""
+            full_log_data.append([
+                l.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+                l.action,
+                Paragraph(safe_details, small_style)
+            ])
+        yield [_log_table(full_log_data, [4*cm, 4*cm, 18*cm], style, header=header)]
+
+def _deleted_blocks(deleted_missions, data, styles, small_style):
+    for m in deleted_missions:
+         block = []
+         m_num = m.mission_number or str(m.id)
+         block.append(Paragraph(f"{LogMessages.LBL_MISSION_NUM.format(number=m_num)} ({m.location})", styles['Heading3']))
+         block.append(Paragraph(f"{LogMessages.LBL_DELETE_REASON} {m.deletion_reason or '-'}", styles['Normal']))
+         block.append(Spacer(1, 0.2*cm))
+         
+         # Logs for deleted mission
+         block.extend(_mission_log_tables(data['logs_by_mission'].get(m.id, []), small_style, [('FONTSIZE', (0,0), (-1,-1), 8), ('VALIGN', (0,0), (-1,-1), 'TOP')]))
+         
+         block.append(Spacer(1, 0.5*cm))
+         yield block
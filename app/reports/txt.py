@@ -0,0 +1,207 @@
+"""The plain-text shift report."""
+import io
+
+from .. import metrics
+from ..messages import LogMessages
+from ..utils import get_session_id
+from .data import load_report_data, to_local
+
+def iter_export_file(config):
+    """
+    The TXT report as an iterator of text chunks (one per mission/squad
+    block).
+
+    The shift details are read right away, not in the generator: a
+    streamed response iterates it after the request's session has been
+    removed, and `config` is detached by then.
+    """
+    sid = config.session_id if config else get_session_id()
+    out = []
+
+    # Header
+    out.append(f"{LogMessages.REPORT_TITLE_TXT}\n")
+    if config:
+        out.append(f"{LogMessages.LBL_SERVICE} {config.location}\n")
+        if config.address:
+            out.append(f"{LogMessages.LBL_ADDRESS} {config.address}\n")
+        
+        # Format times nicely
+        s_local = to_local(config.start_time)
+        e_local = to_local(config.end_time)
+        
+        s_str = s_local.strftime('%d.%m.%Y %H:%M') if s_local else '?'
+        e_str = e_local.strftime('%d.%m.%Y %H:%M') if e_local else 'Laufend'
+        
+        out.append(f"{LogMessages.LBL_PERIOD} {s_str} - {e_str}\n")
+    out.append("\n")
+    return _iter_report(sid, out)
+
+def _iter_report(sid, out):
+    data = load_report_data(sid)
+
+    # Missions
+    missions = data['missions']
+    out.append(f"=== {LogMessages.SECTION_MISSIONS} ({len(missions)}) ===\n\n")
+    yield ''.join(out)
+    
+    for m in missions:
+        out = [f"{LogMessages.LBL_MISSION_NUM.format(number=m.mission_number or m.id)}\n"]
+        m_logs = data['logs_by_mission'].get(m.id, [])
+        
+        # Show start time and end time (if completed)
+        start_local = to_local(m.created_at)
+        start_time = start_local.strftime('%d.%m.%Y %H:%M:%S') if start_local else '?'
+        
+        if m.status == 'Abgeschlossen':
+            # Completion time, falling back to the last update
+            end_local = to_local(m.completed_at or m.updated_at)
+            end_time = end_local.strftime('%d.%m.%Y %H:%M:%S') if end_local else 'Abgeschlossen'
+            
+            outcome_display = m.outcome
+            if m.outcome == 'ARM' or m.outcome == 'Übergeben' or m.outcome == 'ARM (Anderes Rettungsmittel)' or (m.outcome and m.outcome.startswith('Übergeben')):
+                basic = "Übergeben"
+                parts = []
+                if m.arm_type: parts.append(m.arm_type)
+                if m.arm_id: parts.append(m.arm_id)
+                if m.arm_notes: parts.append(m.arm_notes)
+                
+                if parts:
+                    outcome_display = f"{basic} / {' / '.join(parts)}"
+                else:
+                    outcome_display = basic
+                
+            out.append(f"{LogMessages.LBL_TIME} {start_time} - {end_time} ({outcome_display})\n")
+        else:
+            out.append(f"{LogMessages.LBL_TIME} {start_time} - Laufend\n")
+        
+        if m.naca_score:
+            out.append(f"NACA: {m.naca_score}\n")
+        out.append(f"{LogMessages.LBL_LOCATION} {m.location}\n")
+        out.append(f"{LogMessages.LBL_REASON} {m.reason}\n")
+        val_entity = m.alarming_entity or "-"
+        out.append(f"{LogMessages.LBL_ALARMING}: {val_entity}\n")
+        out.append(f"{LogMessages.LBL_SQUADS}: {', '.join([s.name for s in m.squads])}\n")
+        
+        if m.description:
+            out.append(f"{LogMessages.LBL_SITUATION} {m.description}\n")
+        if m.notes:
+            out.append(f"{LogMessages.LBL_NOTES} {m.notes}\n")
+        
+        # Chronology of this mission
+        if m_logs:
+            out.append(f"  {LogMessages.LBL_HISTORY}\n")
+            for l in m_logs:
+                # Clean up log details "None"
+                safe_details = l.details.replace("None", "(leer)") if l.details else ""
+                cur_local = to_local(l.timestamp)
+                ts_str = cur_local.strftime('%H:%M:%S') if cur_local else "?"
+                out.append(f"  - [{ts_str}] {l.action}: {safe_details}\n")
+        
+        out.append("-" * 40 + "\n\n")
+        yield ''.join(out)
+
+    # Squad Activity / Pause Analysis
+    yield f"=== {LogMessages.SECTION_SQUADS} ===\n\n"
+    for s in data['squads']:
+        # Count missions for this squad
+        mission_count = len(s.missions)
+        
+        sn_text = f" [DN: {s.service_numbers}]" if s.service_numbers else ""
+        label_type = s.type if s.type else "Trupp"
+        out = [f"{label_type}: {s.name} ({s.qualification}){sn_text} - {mission_count} Einsätze\n"]
+        
+        # Track pause periods (start and end times)
+        pause_periods = []
+        pause_start = None
+        
+        for l in data['logs_by_squad'].get(s.id, []):
+            safe_details = l.details.replace("None", "(leer)") if l.details else ""
+            
+            cur_local = to_local(l.timestamp)
+            ts_str = cur_local.strftime('%H:%M:%S') if cur_local else "?"
+            
+            if l.action == 'STATUS':
+                # Add mission context if available
+                mission_context = ""
+                mission = data['missions_by_id'].get(l.mission_id) if l.mission_id else None
+                if mission:
+                    mission_num = mission.mission_number or mission.id
+                    mission_context = f" (Einsatz #{mission_num})"
+                
+                out.append(f"  [{ts_str}] {safe_details}{mission_context}\n")
+                
+                # Check if status changed to Pause
+                if '-> Pause' in l.details:
+                    pause_start = cur_local
+                # Check if status changed from Pause to something else
+                elif pause_start and 'Pause ->' in l.details:
+                    pause_end = cur_local
+                    pause_periods.append(f"{pause_start.strftime('%H:%M:%S')} - {pause_end.strftime('%H:%M:%S')}")
+                    pause_start = None
+        
+        # If pause is still ongoing (no end time)
+        if pause_start:
+            pause_periods.append(f"{pause_start.strftime('%H:%M:%S')} - laufend")
+        
+        # Summary of pauses
+        if pause_periods:
+            out.append(f"  {LogMessages.LBL_PAUSES}: {'; '.join(pause_periods)}\n")
+        out.append("\n")
+        yield ''.join(out)
+    
+    # Full Log
+    yield f"=== {LogMessages.SECTION_LOG} ===\n"
+    out = []
+    for l in data['logs']:
+        safe_details = l.details.replace("None", "(leer)") if l.details else ""
+        l_local = to_local(l.timestamp)
+        ts_full = l_local.strftime('%Y-%m-%d %H:%M:%S') if l_local else "?"
+        out.append(f"[{ts_full}] [{l.action}] {safe_details}\n")
+        if len(out) >= 500:
+            yield ''.join(out)
+            out = []
+        
+    out.append("\n")
+    yield ''.join(out)
+
+    # Deleted Missions
+    deleted_missions = [m for m in missions if m.is_deleted]
+    if deleted_missions:
+        yield f"=== {LogMessages.SECTION_DELETED} ===\n\n"
+        for m in deleted_missions:
+            m_num = m.mission_number or m.id
+            out = [f"{LogMessages.LBL_MISSION_NUM.format(number=m_num)} ({m.location})\n"]
+            val_reason = m.deletion_reason or "-"
+            out.append(f"  {LogMessages.LBL_DELETE_REASON} {val_reason}\n")
+            out.append(f"  {LogMessages.LBL_ORIGINAL_ALARM} {m.reason}\n")
+            if m.description:
+                out.append(f"  {LogMessages.LBL_SITUATION} {m.description}\n")
+            
+            # Add logs for deleted mission context
+            m_logs = data['logs_by_mission'].get(m.id, [])
+            if m_logs:
+                out.append(f"  {LogMessages.LBL_HISTORY}\n")
+                for l in m_logs:
+                     safe_details = l.details.replace("None", "(leer)") if l.details else ""
+                     l_local = to_local(l.timestamp)
+                     ts_str = l_local.strftime('%H:%M:%S') if l_local else "?"
+                     out.append(f"  - [{ts_str}] {l.action}: {safe_details}\n")
+            out.append("\n")
+            yield ''.join(out)
+
+def iter_export_bytes(config):
+    """UTF-8 encoded chunks of iter_export_file, for streaming responses."""
+    return _encode(iter_export_file(config))
+
+@metrics.REPORT_SECONDS.time('txt')
+def _encode(chunks):
+    for chunk in chunks:
+        yield chunk.encode('utf-8')
+
+def generate_export_file(config):
+    """The whole TXT report as an in-memory file."""
+    mem = io.BytesIO()
+    for chunk in iter_export_bytes(config):
+        mem.write(chunk)
+    mem.seek(0)
+    return mem
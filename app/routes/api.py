@@ -1,58 +1,150 @@
-from flask import Blueprint, request, jsonify, send_file, session
+from flask import Blueprint, request, jsonify, send_file, session, current_app, Response, stream_with_context
 from datetime import datetime
+import hashlib
+import json
 import uuid
 import os
 from werkzeug.security import generate_password_hash, check_password_hash
 
 from ..extensions import db
-from ..models import ShiftConfig, Squad, Mission, LogEntry, PredefinedOption
+from ..models import ShiftConfig, Squad, Mission, LogEntry, PredefinedOption, mission_squad, CLOSED_MISSION_STATES
+from ..journal import record_change, record_changes, current_cursor, changes_since
+from .. import events
+from ..jobs import get_report_jobs
+from ..report_cache import get_report_cache
+from ..snapshot import get_snapshot_cache
+from .. import reports
 from ..utils import (
-    get_session_id, log_action, update_ambulanz_occupancy, 
-    generate_export_file, generate_pdf_file, 
+    get_session_id, log_action, update_ambulanz_occupancy, join_digest, RateLimiter,
     STATUS_MAP, STATUS_CODES
 )
 from ..messages import LogMessages
 
 api_bp = Blueprint('api', __name__)
 
+def _options_map(sid):
+    opts = PredefinedOption.query.filter_by(session_id=sid).all()
+    options_map = {}
+    for o in opts:
+        if o.category not in options_map:
+            options_map[o.category] = []
+        options_map[o.category].append(o.value)
+    return options_map
+
+def _versioned(sid, build):
+    """
+    Conditional GET for the polling endpoints.
+
+    The ETag is the session's journal cursor (bumped by every write) plus
+    the request path and query, so If-None-Match is answered with a 304
+    before any rows are loaded: from the snapshot cache, or after a
+    single indexed lookup.
+    """
+    version = get_snapshot_cache().cursor(sid)
+    if version is None:
+        version = current_cursor(sid)
+    etag = hashlib.sha1(f"{sid}|{request.full_path}|{version}".encode('utf-8')).hexdigest()
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+        if response.status_code != 200:
+            return response
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def _snapshot(sid):
+    """The session's cached /api/init snapshot (see app/snapshot.py)."""
+    return get_snapshot_cache().get(sid, lambda: _build_snapshot(sid), lambda: current_cursor(sid))
+
+def _snapshot_response(sid):
+    return Response(_snapshot(sid).body, mimetype='application/json')
+
 @api_bp.route('/api/init', methods=['GET'])
 def get_init_data():
     sid = get_session_id()
+    return _versioned(sid, lambda: _snapshot_response(sid))
+
+def _build_snapshot(sid):
+    # Read the cursor first: anything written meanwhile is re-sent, never lost
+    cursor = current_cursor(sid)
     config = ShiftConfig.query.filter_by(is_active=True, session_id=sid).first()
     
-    squads = Squad.query.filter_by(session_id=sid).order_by(Squad.position).all()
+    squads = Squad.for_session(sid).order_by(Squad.position).all()
     
-    # Self-Healing: Ensure all squads have access_token
-    token_update_needed = False
+    # Self-Healing: Ensure all squads have access_token (committed at request end)
     for s in squads:
         if not s.access_token:
             s.access_token = str(uuid.uuid4())
-            token_update_needed = True
-    
-    if token_update_needed:
-        db.session.commit()
     
     # Filter out deleted missions
-    missions = Mission.query.filter_by(session_id=sid, is_deleted=False).order_by(Mission.created_at.desc()).all()
+    missions = Mission.for_session(sid).filter_by(is_deleted=False).order_by(Mission.created_at.desc()).all()
     
-    # Predefined options
-    opts = PredefinedOption.query.filter_by(session_id=sid).all()
-    options_map = {}
-    for o in opts:
-        if o.category not in options_map:
-            options_map[o.category] = []
-        options_map[o.category].append(o.value)
-    
-    # Logs
-    logs = LogEntry.query.filter_by(session_id=sid).order_by(LogEntry.timestamp.desc()).all()
+    # Latest logs only; older pages via /api/changes?before_id=
+    logs = LogEntry.page(sid, current_app.config['INIT_LOG_LIMIT'])
 
-    return jsonify({
+    return cursor, {
+        'cursor': cursor,
         'config': config.to_dict() if config else None,
         'squads': [s.to_dict() for s in squads],
         'missions': [m.to_dict() for m in missions],
-        'options': options_map,
+        'options': _options_map(sid),
         'logs': [l.to_dict() for l in logs]
-    })
+    }
+
+def _delta_payload(sid, cursor):
+    """Rows changed since `cursor`, with tombstones for deleted squads/missions."""
+    changes = changes_since(sid, cursor)
+    if changes['reset']:
+        return {'cursor': changes['cursor'], 'reset': True}
+
+    squad_ids = {i for i, op in changes['squads'].items() if op != 'delete'}
+    mission_ids = {i for i, op in changes['missions'].items() if op != 'delete'}
+    deleted_squads = {i for i, op in changes['squads'].items() if op == 'delete'}
+    deleted_missions = {i for i, op in changes['missions'].items() if op == 'delete'}
+
+    # Squads embed their active mission and missions embed squad status,
+    # so a change on either side re-sends the linked rows of the other.
+    changed_squads, changed_missions = set(squad_ids), mission_ids | deleted_missions
+    if changed_missions:
+        linked = db.session.query(mission_squad.c.squad_id).filter(
+            mission_squad.c.mission_id.in_(changed_missions))
+        squad_ids |= {row[0] for row in linked} - deleted_squads
+    if changed_squads:
+        linked = db.session.query(mission_squad.c.mission_id).filter(
+            mission_squad.c.squad_id.in_(changed_squads))
+        mission_ids |= {row[0] for row in linked} - deleted_missions
+
+    squads = Squad.for_session(sid).filter(Squad.id.in_(squad_ids)).order_by(Squad.position).all() if squad_ids else []
+    missions = Mission.for_session(sid).filter(Mission.id.in_(mission_ids)).order_by(Mission.created_at.desc()).all() if mission_ids else []
+
+    # Soft-deleted or vanished rows become tombstones
+    deleted_missions |= {m.id for m in missions if m.is_deleted}
+    deleted_missions |= mission_ids - {m.id for m in missions}
+    deleted_squads |= squad_ids - {s.id for s in squads}
+
+    logs = []
+    if changes['logs']:
+        logs = LogEntry.query.filter(LogEntry.session_id == sid, LogEntry.id.in_(changes['logs'])).order_by(LogEntry.timestamp.desc()).all()
+
+    payload = {
+        'cursor': changes['cursor'],
+        'squads': [s.to_dict() for s in squads],
+        'missions': [m.to_dict() for m in missions if not m.is_deleted],
+        'logs': [l.to_dict() for l in logs],
+        'deleted': {
+            'squads': sorted(deleted_squads),
+            'missions': sorted(deleted_missions)
+        }
+    }
+    # Config and options only when they changed
+    if changes['config']:
+        config = ShiftConfig.query.filter_by(session_id=sid, is_active=True).first()
+        payload['config'] = config.to_dict() if config else None
+    if changes['options']:
+        payload['options'] = _options_map(sid)
+    return payload
     
 @api_bp.route('/api/updates', methods=['GET'])
 def get_updates():
@@ -72,50 +164,118 @@ def get_updates():
         if not sid:
             sid = get_session_id()
 
-        # simplified long polling check
-        squad_query = Squad.query.filter_by(session_id=sid)
-        mission_query = Mission.query.filter_by(session_id=sid, is_deleted=False)
-        log_query = LogEntry.query.filter_by(session_id=sid)
-
-        since = request.args.get('since')
-        if since:
-            try:
-                # Handle JS toISOString Z suffix
-                if since.endswith('Z'):
-                    since = since[:-1]
-                limit_dt = datetime.fromisoformat(since)
-                
-                squad_query = squad_query.filter(Squad.updated_at > limit_dt)
-                mission_query = mission_query.filter(Mission.updated_at > limit_dt)
-                log_query = log_query.filter(LogEntry.timestamp > limit_dt)
-            except ValueError:
-                pass # Ignore invalid timestamp
-
-        squads = squad_query.order_by(Squad.position).all()
-        missions = mission_query.order_by(Mission.created_at.desc()).all()
-        logs = log_query.order_by(LogEntry.timestamp.desc()).limit(50).all()
-        
-        # Restore Config & Options (Critical for Frontend)
-        config = ShiftConfig.query.filter_by(session_id=sid, is_active=True).first()
-        
-        opts = PredefinedOption.query.filter_by(session_id=sid).all()
-        options_map = {}
-        for o in opts:
-            if o.category not in options_map:
-                options_map[o.category] = []
-            options_map[o.category].append(o.value)
-
-        return jsonify({
-            'config': config.to_dict() if config else None,
-            'squads': [s.to_dict() for s in squads],
-            'missions': [m.to_dict() for m in missions],
-            'options': options_map, 
-            'logs': [l.to_dict() for l in logs]
-        })
+        return _versioned(sid, lambda: _updates_payload(sid))
     except Exception as e:
         print(e)
         return jsonify({'error': str(e)}), 500
 
+def _updates_payload(sid):
+    # Delta mode: only rows journaled after the client's cursor
+    cursor = request.args.get('cursor', type=int)
+    if cursor is not None:
+        return jsonify(_delta_payload(sid, cursor))
+
+    since = request.args.get('since')
+    if not since:
+        # Full state is the init snapshot
+        return _snapshot_response(sid)
+
+    cursor = current_cursor(sid)
+
+    # simplified long polling check
+    squad_query = Squad.for_session(sid)
+    mission_query = Mission.for_session(sid).filter_by(is_deleted=False)
+    log_query = LogEntry.query.filter_by(session_id=sid)
+
+    if since:
+        try:
+            # Handle JS toISOString Z suffix
+            if since.endswith('Z'):
+                since = since[:-1]
+            limit_dt = datetime.fromisoformat(since)
+            
+            squad_query = squad_query.filter(Squad.updated_at > limit_dt)
+            mission_query = mission_query.filter(Mission.updated_at > limit_dt)
+            log_query = log_query.filter(LogEntry.timestamp > limit_dt)
+        except ValueError:
+            pass # Ignore invalid timestamp
+
+    squads = squad_query.order_by(Squad.position).all()
+    missions = mission_query.order_by(Mission.created_at.desc()).all()
+    logs = log_query.order_by(LogEntry.timestamp.desc()).limit(50).all()
+    
+    # Restore Config & Options (Critical for Frontend)
+    config = ShiftConfig.query.filter_by(session_id=sid, is_active=True).first()
+
+    return jsonify({
+        'cursor': cursor,
+        'config': config.to_dict() if config else None,
+        'squads': [s.to_dict() for s in squads],
+        'missions': [m.to_dict() for m in missions],
+        'options': _options_map(sid), 
+        'logs': [l.to_dict() for l in logs]
+    })
+
+# Reconnect delay of a stream turned away at STREAM_LIMIT, clients poll meanwhile
+STREAM_BUSY_RETRY_MS = 30000
+
+@api_bp.route('/api/stream', methods=['GET'])
+def stream_changes():
+    """
+    Server-Sent Events: a `change` event with the latest cursor whenever
+    the session's data was written. Clients then pull the delta via
+    /api/updates?cursor=N. Authenticated by session or squad token.
+
+    Beyond STREAM_LIMIT open streams in this process, a `busy` event
+    with a long `retry:` ends the stream right away.
+    """
+    token = request.args.get('token')
+    squad_id = None
+    if token:
+        squad = Squad.query.filter_by(access_token=token).first()
+        if not squad:
+            return jsonify({'error': 'Invalid token'}), 403
+        sid, squad_id = squad.session_id, squad.id
+    else:
+        sid = get_session_id()
+
+    heartbeat = current_app.config.get('STREAM_HEARTBEAT', 15)
+    limit = current_app.config.get('STREAM_LIMIT', 0)
+    watch_interval = current_app.config.get('STREAM_WATCH_INTERVAL')
+    if watch_interval:
+        events.watch(current_app._get_current_object(), watch_interval)
+    # Don't hold a read transaction open for the lifetime of the stream
+    db.session.remove()
+
+    def generate():
+        # Subscribe before reading the cursor so no commit slips in between
+        sub = events.subscribe(sid, squad_id, limit)
+        if sub is None:
+            # All stream threads taken: leave the rest to polls and writes.
+            # The client polls until it reconnects after `retry`
+            yield f"retry: {STREAM_BUSY_RETRY_MS}\nevent: busy\ndata: {{}}\n\n"
+            return
+        try:
+            last = current_cursor(sid)
+            db.session.remove()
+            yield f"retry: 3000\nid: {last}\nevent: change\ndata: {json.dumps({'cursor': last})}\n\n"
+            while True:
+                sub.wait(heartbeat)
+                latest = current_cursor(sid)
+                db.session.remove()
+                if latest != last:
+                    last = latest
+                    yield f"id: {last}\nevent: change\ndata: {json.dumps({'cursor': last})}\n\n"
+                else:
+                    yield ": keepalive\n\n"
+        finally:
+            events.unsubscribe(sub)
+
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
 @api_bp.route('/api/config', methods=['POST'])
 def save_config():
     data = request.json
@@ -141,11 +301,13 @@ def save_config():
         address=data.get('address', ''),
         start_time=start_dt,
         session_id=sid,
-        password_hash=p_hash
+        password_hash=p_hash,
+        join_digest=join_digest(pwd) if pwd else None
     )
     db.session.add(new_config)
     
     # Handle pre-defined options if provided
+    record_change(sid, 'options')
     if 'options' in data:
         PredefinedOption.query.filter_by(session_id=sid).delete()
         for cat, values in data['options'].items():
@@ -183,15 +345,18 @@ def save_config():
     # Initial Squads - Only create if requested (Standard Setup)
     if 'squads' in data:
         # Clean up associations first to prevent orphans
-        # Delete associations where the squad belongs to this session
+        # Delete associations where the squad or mission belongs to this session
         db.session.execute(db.text("""
             DELETE FROM mission_squad 
             WHERE squad_id IN (SELECT id FROM squad WHERE session_id = :sid)
+               OR mission_id IN (SELECT id FROM mission WHERE session_id = :sid)
         """), {'sid': sid})
         
-        Squad.query.filter_by(session_id=sid).delete()
-        Mission.query.filter_by(session_id=sid).delete()
+        # Referencing rows first (foreign keys are enforced)
         LogEntry.query.filter_by(session_id=sid).delete()
+        Mission.query.filter_by(session_id=sid).delete()
+        Squad.query.filter_by(session_id=sid).delete()
+        record_change(sid, 'session', op='reset')
         
         for s in data['squads']:
             new_squad = Squad(
@@ -202,7 +367,6 @@ def save_config():
             )
             db.session.add(new_squad)
 
-    db.session.commit()
     log_action('KONFIGURATION', LogMessages.SHIFT_STARTED.format(location=new_config.location))
     return jsonify(new_config.to_dict())
 
@@ -213,15 +377,33 @@ def join_session():
     
     if not pwd:
         return jsonify({"success": False, "message": "Passwort fehlt"}), 400
+
+    limiter = current_app.extensions.get('join_limiter')
+    if limiter is None:
+        limiter = current_app.extensions['join_limiter'] = RateLimiter(
+            current_app.config.get('JOIN_RATE_LIMIT', 10), current_app.config.get('JOIN_RATE_WINDOW', 60))
+    if not limiter.hit(request.remote_addr):
+        return jsonify({"success": False, "message": "Zu viele Versuche, bitte später erneut versuchen"}), 429
         
-    # Find active shifts
+    # Find the active shift by its join digest; only its hash gets verified
     try:
-        active_configs = ShiftConfig.query.filter_by(is_active=True).all()
+        digest = join_digest(pwd)
+        candidates = ShiftConfig.query.filter_by(is_active=True, join_digest=digest).all()
+        if not candidates:
+            # Shifts without a digest: started before join digests existed,
+            # or dropped when the join key changed
+            candidates = ShiftConfig.query.filter(
+                ShiftConfig.is_active == True,
+                ShiftConfig.join_digest == None,
+                ShiftConfig.password_hash != None
+            ).all()
         found_config = None
         
-        for conf in active_configs:
+        for conf in candidates:
             if conf.password_hash and check_password_hash(conf.password_hash, pwd):
                 found_config = conf
+                if not conf.join_digest:
+                    conf.join_digest = digest
                 break
                 
         if found_config:
@@ -281,7 +463,6 @@ def update_config():
             pass
             
     if changes:
-        db.session.commit()
         log_action('KONFIGURATION', LogMessages.CONFIG_CHANGED.format(changes=', '.join(changes)))
     
     # Handle locations import
@@ -295,12 +476,52 @@ def update_config():
                 new_count += 1
         
         if new_count > 0:
-            db.session.commit()
             log_action('KONFIGURATION', f"{new_count} neue Einsatzorte hinzugefügt")
     
     return jsonify(config.to_dict())
 
 
+@api_bp.route('/api/squads/me', methods=['GET'])
+def get_own_squad():
+    """
+    Everything the mobile squad view shows, and nothing else: the squad,
+    its active mission, its completed missions and the Ambulanz targets
+    for zAO. Answers If-None-Match with 304 when nothing of it changed.
+    """
+    token = request.args.get('token')
+    sid = None
+    if token:
+        sid = get_snapshot_cache().session_for_token(token) or \
+            db.session.query(Squad.session_id).filter_by(access_token=token).scalar()
+    snapshot = _snapshot(sid) if sid else None
+    squad_id = snapshot.tokens.get(token) if snapshot else None
+    if squad_id is None:
+        return jsonify({'error': 'Invalid token'}), 403
+
+    # Derived from the session snapshot (missions newest first)
+    data = snapshot.data
+    squad = next(s for s in data['squads'] if s['id'] == squad_id)
+    missions = [m for m in data['missions'] if squad_id in m['squad_ids']]
+    # The phone's own rule, by status only: a running mission stays on
+    # screen (and a zAO target) even once an outcome was entered
+    active = next((m for m in missions if m['status'] not in CLOSED_MISSION_STATES), None)
+
+    response = jsonify({
+        'squad': squad,
+        'active_mission': active,
+        'history': [m for m in missions if m['status'] == 'Abgeschlossen'],
+        'ambulanzen': [{
+            'id': a['id'],
+            'name': a['name'],
+            'current_status': a['current_status'],
+            'patient_count': a['patient_count']
+        } for a in data['squads'] if a['type'] == 'Ambulanz']
+    })
+    # Strong ETag over the body: phones re-download only when their view changed
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.add_etag()
+    return response.make_conditional(request)
+
 @api_bp.route('/api/squads', methods=['POST'])
 def create_squad():
     data = request.json
@@ -317,7 +538,7 @@ def create_squad():
         access_token=str(uuid.uuid4())
     )
     db.session.add(squad)
-    db.session.commit()
+    db.session.flush() # Assign id for the log entry
     dn_text = f", DN: {squad.service_numbers}" if squad.service_numbers else ""
     log_action('TRUPP NEU', LogMessages.SQUAD_CREATED.format(name=squad.name, qualification=squad.qualification, numbers=squad.service_numbers or "keine"), squad_id=squad.id)
     return jsonify(squad.to_dict()), 201
@@ -386,23 +607,69 @@ def update_squad(id):
 
 
     if changes:
-        db.session.commit()
         log_action('TRUPP UPDATE', LogMessages.SQUAD_UPDATED.format(name=squad.name, changes='; '.join(changes)), squad_id=squad.id)
         
     return jsonify(squad.to_dict())
 
+# Squad positions are spaced this far apart, leaving room to move a
+# squad between two others by rewriting its own row only
+POSITION_GAP = 1024
+
+def _place_moved_squad(order, moved, positions):
+    """
+    New position for `moved` between its neighbours in `order`, as
+    {id: position} ({} if it already sits there). None if the other
+    squads are not stored in this order or there is no gap left.
+    """
+    rest = [i for i in order if i != moved]
+    if any(positions[a] >= positions[b] for a, b in zip(rest, rest[1:])):
+        return None
+    idx = order.index(moved)
+    before = positions[order[idx - 1]] if idx > 0 else None
+    after = positions[order[idx + 1]] if idx + 1 < len(order) else None
+    current = positions[moved]
+    if (before is None or before < current) and (after is None or current < after):
+        return {}
+    if before is None:
+        return {moved: after - POSITION_GAP}
+    if after is None:
+        return {moved: before + POSITION_GAP}
+    if after - before > 1:
+        return {moved: (before + after) // 2}
+    return None
+
 @api_bp.route('/api/squads/reorder', methods=['POST'])
 def reorder_squads():
+    """
+    Store the dashboard's squad order: {"order": [ids], "moved": id}.
+
+    With `moved` (the dragged squad), only its row is updated when the
+    rest of the order matches the stored one. Otherwise the listed squads
+    are renumbered POSITION_GAP apart in a single UPDATE ... CASE.
+    """
     sid = get_session_id()
     data = request.json
-    # Expects list of {id: X, position: Y} or just list of IDs in order
     
     if 'order' in data: # List of IDs
-        for idx, squad_id in enumerate(data['order']):
-            squad = Squad.query.filter_by(id=squad_id, session_id=sid).first()
-            if squad:
-                squad.position = idx
-        db.session.commit()
+        positions = dict(db.session.execute(
+            db.select(Squad.id, Squad.position).filter_by(session_id=sid)
+        ).all())
+        order = [i for i in dict.fromkeys(data['order']) if i in positions]
+        moved = data.get('moved')
+
+        new_positions = _place_moved_squad(order, moved, positions) if moved in order else None
+        if new_positions is None:
+            new_positions = {squad_id: idx * POSITION_GAP for idx, squad_id in enumerate(order)}
+        changed = {i: p for i, p in new_positions.items() if positions[i] != p}
+
+        if changed:
+            db.session.execute(
+                db.update(Squad)
+                .where(Squad.session_id == sid, Squad.id.in_(changed))
+                .values(position=db.case(changed, value=Squad.id))
+                .execution_options(synchronize_session=False)
+            )
+            record_changes(sid, 'squad', changed)
     
     return jsonify({'status': 'ok'})
 
@@ -413,10 +680,18 @@ def delete_squad(id):
     name = squad.name
     
     # Delete association rows manually if not cascaded by model
+    linked = db.session.query(mission_squad.c.mission_id).filter(mission_squad.c.squad_id == id)
+    for (mission_id,) in linked:
+        record_change(sid, 'mission', mission_id)
     db.session.execute(db.text("DELETE FROM mission_squad WHERE squad_id = :id"), {'id': id})
+    db.session.expire(squad, ['missions'])
+    # Keep the squad's log lines, detached (foreign keys are enforced).
+    # A bulk update: journaled by hand, so delta clients re-fetch them
+    log_ids = [log_id for (log_id,) in db.session.query(LogEntry.id).filter_by(squad_id=id)]
+    LogEntry.query.filter_by(squad_id=id).update({LogEntry.squad_id: None})
+    record_changes(sid, 'log', log_ids)
     
     db.session.delete(squad)
-    db.session.commit()
     
     log_action('TRUPP GELÖSCHT', LogMessages.SQUAD_REMOVED.format(name=name))
     return jsonify({'status': 'deleted'})
@@ -447,6 +722,15 @@ def update_squad_status(id):
         old_status = squad.current_status
         squad.current_status = new_status
         squad.last_status_change = datetime.utcnow()
+
+        # First squad on scene marks the mission's arrival; an Ambulanz
+        # reports 4 when it takes on a patient, not when it arrives
+        if new_status == '4' and squad.type != 'Ambulanz':
+            for m in squad.missions:
+                if m.status != 'Abgeschlossen' and not m.is_deleted:
+                    if not m.arrived_at:
+                        m.arrived_at = squad.last_status_change
+                    break
         
         # Auto-Clear Custom Location Logic refined
         if new_status == '2':
@@ -478,9 +762,9 @@ def update_squad_status(id):
                          squad.custom_location = found_loc
 
         try:
-            db.session.commit()
+            db.session.flush()
         except Exception as e:
-            print(f"Db Commit Error: {e}")
+            print(f"Db Flush Error: {e}")
             return jsonify({'error': 'Database error'}), 500
         
         # Log logic
@@ -533,13 +817,17 @@ def create_mission():
         notes=data.get('notes', ''),
         session_id=get_session_id()
     )
+    # Flush first so dispatch logs can reference the mission id
+    db.session.add(new_mission)
+    db.session.flush()
     
     # Handle Squads
     if 'squad_ids' in data:
         # Deduplicate IDs to prevent accidental double assignment
-        unique_ids = set(data['squad_ids'])
+        unique_ids = list(dict.fromkeys(data['squad_ids']))
+        squads_by_id = Squad.by_ids(new_mission.session_id, unique_ids)
         for sid in unique_ids:
-            squad = Squad.query.filter_by(id=sid, session_id=get_session_id()).first()
+            squad = squads_by_id.get(sid)
             if squad:
                 new_mission.squads.append(squad)
                 # Auto-set status to Integriert (Alarmiert)
@@ -557,9 +845,9 @@ def create_mission():
                     # For Ambulanz, just log assignment, don't change status to 'Integriert'
                     log_action('INFO', f"{squad.name}: {LogMessages.PATIENT_ASSIGNED}", 
                                squad_id=squad.id, mission_id=new_mission.id)
-    
-    db.session.add(new_mission)
-    db.session.commit()
+
+    if new_mission.squads:
+        new_mission.alarmed_at = datetime.utcnow()
     
     log_action('EINSATZ ERSTELLT', LogMessages.MISSION_CREATED.format(number=new_mission.mission_number or new_mission.id, reason=new_mission.reason, location=new_mission.location), mission_id=new_mission.id)
     
@@ -580,6 +868,7 @@ def update_mission(id):
     if 'status' in data and data['status'] != mission.status:
         changes.append(f"Status geändert: {data['status']}")
         mission.status = data['status']
+        mission.completed_at = datetime.utcnow() if mission.status == 'Abgeschlossen' else None
     
     if 'outcome' in data and data['outcome'] != mission.outcome:
         new_val = data['outcome'] or ""
@@ -617,21 +906,19 @@ def update_mission(id):
     if 'squad_ids' in data:
         # Update roster
         current_ids = {s.id for s in mission.squads}
-        new_ids = set(data['squad_ids'])
+        requested_ids = list(dict.fromkeys(data['squad_ids']))
+        new_ids = set(requested_ids)
         if current_ids != new_ids:
             # Calculate diff
             added_ids = new_ids - current_ids
             removed_ids = current_ids - new_ids
             
-            added_names = []
-            for sid in added_ids:
-                sq = Squad.query.filter_by(id=sid, session_id=sid_val).first()
-                if sq: added_names.append(sq.name)
-
-            removed_names = []
-            for sid in removed_ids:
-                sq = Squad.query.filter_by(id=sid, session_id=sid_val).first()
-                if sq: removed_names.append(sq.name)
+            # One query for the added squads; removed ones are on the mission already
+            added = Squad.by_ids(sid_val, added_ids)
+            removed = [s for s in mission.squads if s.id in removed_ids]
+
+            added_names = [added[sid].name for sid in requested_ids if sid in added]
+            removed_names = [s.name for s in removed]
             
             diff_parts = []
             if added_names:
@@ -641,16 +928,19 @@ def update_mission(id):
             
             changes.append(f"Trupps: {'; '.join(diff_parts)}")
 
-            # Update Relationship
-            mission.squads = []
-            for sid in new_ids:
-                s = Squad.query.filter_by(id=sid, session_id=sid_val).first()
-                if s: 
+            # Update Relationship: only the changed mission_squad rows
+            for s in removed:
+                mission.squads.remove(s)
+            for sid in requested_ids:
+                s = added.get(sid)
+                if s:
                     mission.squads.append(s)
                     # Defer status change to ensure log order
-                    if sid not in current_ids:
-                         s.custom_location = None
-                         squads_to_update_status.append(s)
+                    s.custom_location = None
+                    squads_to_update_status.append(s)
+
+            if squads_to_update_status and not mission.alarmed_at:
+                mission.alarmed_at = datetime.utcnow()
 
     # Description update logic moved to below validation block to include content
     if 'description' in data and mission.description != data['description']:
@@ -686,9 +976,8 @@ def update_mission(id):
             changes.append(f"Notiz geändert: {old_val} zu {new_val}")
         mission.notes = data['notes']
 
-    # Commit Mission Updates First
+    # Log Mission Updates First
     if changes:
-        db.session.commit()
         m_num = mission.mission_number or mission.id
         # Log Mission Update
         log_action('EINSATZ UPDATE', LogMessages.MISSION_UPDATED.format(number=m_num, changes='; '.join(changes)), mission_id=mission.id)
@@ -700,7 +989,6 @@ def update_mission(id):
                 old_status = s.current_status # Not used in simple log, but good to know
                 s.current_status = 'Integriert'
                 s.last_status_change = datetime.utcnow()
-                db.session.commit() # Commit each status change
                 log_action('STATUS', f"{s.name}: Status auf {STATUS_MAP.get('Integriert', 'Integriert')} gesetzt", 
                            squad_id=s.id, mission_id=mission.id)
 
@@ -724,15 +1012,29 @@ def delete_mission(id):
     mission.is_deleted = True
     mission.deletion_reason = reason
     
-    db.session.commit()
-    
     return jsonify({'status': 'deleted'})
 
+def _log_limit(default):
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, current_app.config['LOG_PAGE_MAX']))
+
 @api_bp.route('/api/changes', methods=['GET'])
 def get_changes():
+    """Session log, newest first, one page at a time.
+
+    Pass the id of the last entry received as `before_id` for the next
+    page; a page shorter than `limit` is the last one.
+    """
+    sid = get_session_id()
+    before_id = request.args.get('before_id', type=int)
+    limit = _log_limit(current_app.config['LOG_PAGE_SIZE'])
+    return _versioned(sid, lambda: jsonify([l.to_dict() for l in LogEntry.page(sid, limit, before_id)]))
+
+@api_bp.route('/api/logs/latest', methods=['GET'])
+def get_latest_logs():
     sid = get_session_id()
-    logs = LogEntry.query.filter_by(session_id=sid).order_by(LogEntry.timestamp.desc()).all()
-    return jsonify([l.to_dict() for l in logs])
+    limit = _log_limit(1)
+    return _versioned(sid, lambda: jsonify([l.to_dict() for l in LogEntry.page(sid, limit)]))
 
 @api_bp.route('/api/missions/<int:id>/logs', methods=['GET'])
 def get_mission_logs(id):
@@ -743,17 +1045,53 @@ def get_mission_logs(id):
     logs = LogEntry.query.filter_by(mission_id=id, session_id=sid).order_by(LogEntry.timestamp.asc()).all()
     
     # We want to enhance logs with squad names if squad_id is present
+    squad_ids = {l.squad_id for l in logs if l.squad_id}
+    names = dict(db.session.execute(
+        db.select(Squad.id, Squad.name).where(Squad.session_id == sid, Squad.id.in_(squad_ids))
+    ).all()) if squad_ids else {}
     result = []
     for l in logs:
         entry = l.to_dict()
-        if l.squad_id:
-            squad = Squad.query.get(l.squad_id)
-            if squad:
-                entry['squad_name'] = squad.name
+        if l.squad_id in names:
+            entry['squad_name'] = names[l.squad_id]
         result.append(entry)
         
     return jsonify(result)
 
+def _report_response(sid, fmt, config, prefix):
+    """
+    Serve a report from the cache, rendering it on a miss.
+
+    Keyed by the session's journal cursor: an unchanged session gets the
+    stored bytes, and a matching If-None-Match gets a 304.
+    """
+    if not sid:
+        return jsonify({'error': 'No session'}), 400
+    cache = get_report_cache()
+    version = current_cursor(sid)
+    etag = cache.etag(sid, fmt, version)
+    filename = f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M')}.{fmt}"
+    mimetype = 'application/pdf' if fmt == 'pdf' else 'text/plain'
+
+    if request.method == 'GET' and request.if_none_match.contains(etag):
+        response = Response(status=304)
+    elif (path := cache.get(sid, fmt, version)):
+        response = send_file(path, as_attachment=True, download_name=filename, mimetype=mimetype)
+    elif fmt == 'txt':
+        # Stream the report as it is generated, filling the cache on the way
+        chunks = cache.store_stream(sid, fmt, version, reports.iter_export_bytes(config))
+        response = Response(stream_with_context(chunks), mimetype=mimetype, headers={
+            'Content-Disposition': f'attachment; filename={filename}'
+        })
+    else:
+        mem = reports.generate_pdf_file(config)
+        cache.store(sid, fmt, version, mem.getbuffer())
+        response = send_file(mem, as_attachment=True, download_name=filename, mimetype=mimetype)
+
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
 @api_bp.route('/api/export', methods=['GET'])
 def export_data():
     sid = get_session_id()
@@ -764,9 +1102,7 @@ def export_data():
     if not config:
         config = ShiftConfig.query.filter_by(session_id=sid).order_by(ShiftConfig.id.desc()).first()
         
-    mem = generate_export_file(config)
-    filename = f"protokoll_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
-    return send_file(mem, as_attachment=True, download_name=filename, mimetype='text/plain')
+    return _report_response(sid, 'txt', config, 'protokoll')
 
 @api_bp.route('/api/export/pdf', methods=['GET'])
 def export_pdf():
@@ -775,9 +1111,51 @@ def export_pdf():
     if not config:
         config = ShiftConfig.query.filter_by(session_id=sid).order_by(ShiftConfig.id.desc()).first()
         
-    mem = generate_pdf_file(config)
+    return _report_response(sid, 'pdf', config, 'report')
+
+def _job_payload(job):
+    return {
+        'id': job['id'],
+        'status': job['status'],
+        'progress': job['progress'],
+        'error': job['error'],
+        'download_url': f"/api/export/pdf/jobs/{job['id']}/download" if job['status'] == 'done' else None,
+    }
+
+def _own_job(job_id):
+    job = get_report_jobs().get(job_id)
+    if not job or job['session_id'] != get_session_id():
+        return None
+    return job
+
+@api_bp.route('/api/export/pdf/jobs', methods=['POST'])
+def create_pdf_job():
+    sid = get_session_id()
+    if not sid:
+        return jsonify({'error': 'No session'}), 400
+    job = get_report_jobs().submit(sid, current_cursor(sid))
+    return jsonify(_job_payload(job)), 200 if job['status'] == 'done' else 202
+
+@api_bp.route('/api/export/pdf/jobs/<job_id>', methods=['GET'])
+def get_pdf_job(job_id):
+    job = _own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(_job_payload(job))
+
+@api_bp.route('/api/export/pdf/jobs/<job_id>/download', methods=['GET'])
+def download_pdf_job(job_id):
+    job = _own_job(job_id)
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    if job['status'] != 'done':
+        return jsonify({'error': 'Report not ready'}), 409
+    path = get_report_cache().get(job['session_id'], 'pdf', job['version'])
+    if not path:
+        # Superseded by a newer version of the report in the meantime
+        return jsonify({'error': 'Report expired'}), 410
     filename = f"report_{datetime.now().strftime('%Y%m%d_%H%M')}.pdf"
-    return send_file(mem, as_attachment=True, download_name=filename, mimetype='application/pdf')
+    return send_file(path, as_attachment=True, download_name=filename, mimetype='application/pdf')
 
 @api_bp.route('/api/config/end', methods=['POST'])
 def end_shift():
@@ -788,11 +1166,12 @@ def end_shift():
         config.end_time = datetime.utcnow()
         # Cleanup Access Tokens
         Squad.query.filter_by(session_id=sid).update({Squad.access_token: None})
-        db.session.commit()
+        record_change(sid, 'session', op='reset')
         log_action('KONFIGURATION', LogMessages.SHIFT_ENDED.format(location=config.location))
         
     # Reset predefined options to default values
     PredefinedOption.query.filter_by(session_id=sid).delete()
+    record_change(sid, 'options')
     
     # Load default options from file if it exists
     default_file = 'scripts/default_options.txt'
@@ -816,6 +1195,7 @@ def end_shift():
         except Exception as e:
             print(f"Error loading default options: {e}")
     
+    # Persist the shift end even if the export below fails
     db.session.commit()
         
     # Generate export (even if config was None/already ended, try to get last)
@@ -823,9 +1203,7 @@ def end_shift():
     if not config:
          config = ShiftConfig.query.filter_by(session_id=sid).order_by(ShiftConfig.id.desc()).first()
          
-    mem = generate_export_file(config)
-    filename = f"abschluss_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
-    return send_file(mem, as_attachment=True, download_name=filename, mimetype='text/plain')
+    return _report_response(sid, 'txt', config, 'abschluss')
 
 @api_bp.route('/api/logs/custom', methods=['POST'])
 def custom_log():
@@ -0,0 +1,109 @@
+"""
+Production server: the app under gunicorn.
+
+    python -m app serve [--bind HOST:PORT] [--workers N] [--threads N]
+
+Settings come from the command line or the environment:
+
+    JOHANNITER_BIND        listen address            (0.0.0.0:8000)
+    JOHANNITER_WORKERS     worker processes          (2)
+    JOHANNITER_THREADS     threads per worker        (64)
+    JOHANNITER_KEEPALIVE   seconds to keep idle
+                           connections open          (5)
+    DATABASE_URL           SQLAlchemy database URL   (sqlite:///app.db)
+    SECRET_KEY             session cookie key        (required in production)
+    JOIN_KEY               join digest key           (<instance>/join_key)
+    PROXY_HOPS             trusted reverse proxies
+                           setting X-Forwarded-*     (0)
+    REPORT_DIR             report cache and jobs     (<instance>/reports)
+    SNAPSHOT_REVALIDATE    see below                 (0 with several workers)
+    STREAM_WATCH_INTERVAL  see below                 (1 with several workers)
+    STREAM_LIMIT           open streams per worker   (3/4 of its threads)
+
+Workers use the gthread class: every open /api/stream holds one thread
+for its lifetime, while polls and writes only borrow one per request.
+Streams may take at most STREAM_LIMIT threads of a worker, by default
+three quarters: the defaults hold 2 x 48 streams (dashboards and the
+phones of a large shift) and keep 16 threads per worker for everything
+else. Streams beyond the limit are turned away with a long `retry:`,
+and those clients poll until they reconnect. For more open streams,
+raise the threads.
+Workers share nothing but the database. Each keeps its own snapshot
+cache, stream subscribers and join rate limiter, and picks up the
+others' writes through the change journal (see app/snapshot.py and
+app/events.py). With more than one worker, snapshots are re-checked
+against the journal on every poll (SNAPSHOT_REVALIDATE=0, one indexed
+lookup), so a client never reads older data than it just wrote through
+another worker. Likewise each worker checks the journal once a second
+for the others' writes and wakes its own streams (STREAM_WATCH_INTERVAL=1,
+one query per worker for all open streams), so a dashboard sees a write
+made through another worker within about a second, not at the next
+heartbeat.
+
+The schema is created and migrated once, in the master process, before
+any worker is forked.
+"""
+import argparse
+import os
+
+
+def gunicorn_options(bind=None, workers=None, threads=None):
+    env = os.environ
+    return {
+        'bind': bind or env.get('JOHANNITER_BIND', '0.0.0.0:8000'),
+        'workers': workers or int(env.get('JOHANNITER_WORKERS', 2)),
+        'worker_class': 'gthread',
+        'threads': threads or int(env.get('JOHANNITER_THREADS', 64)),
+        'keepalive': int(env.get('JOHANNITER_KEEPALIVE', 5)),
+        # gthread workers heartbeat from the main thread, so a long-lived
+        # stream does not count against this
+        'timeout': 60,
+        'graceful_timeout': 20,
+        'accesslog': '-',
+    }
+
+
+def serve(bind=None, workers=None, threads=None):
+    from gunicorn.app.base import BaseApplication
+
+    from . import create_app
+    from .extensions import db
+    from .migrations import init_db
+
+    options = gunicorn_options(bind, workers, threads)
+    app = create_app()
+    if 'STREAM_LIMIT' not in os.environ:
+        app.config['STREAM_LIMIT'] = max(1, options['threads'] * 3 // 4)
+    if options['workers'] > 1:
+        if 'SNAPSHOT_REVALIDATE' not in os.environ:
+            app.config['SNAPSHOT_REVALIDATE'] = 0
+        if 'STREAM_WATCH_INTERVAL' not in os.environ:
+            app.config['STREAM_WATCH_INTERVAL'] = 1.0
+    with app.app_context():
+        init_db()
+        # Forked workers must not inherit the master's connections
+        db.session.remove()
+        db.engine.dispose()
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return app
+
+    Server().run()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m app', description="Johanniter Einsatzverwaltung")
+    commands = parser.add_subparsers(dest='command', required=True)
+    serve_cmd = commands.add_parser('serve', help="run the production server (gunicorn)")
+    serve_cmd.add_argument('--bind', help="HOST:PORT (JOHANNITER_BIND)")
+    serve_cmd.add_argument('--workers', type=int, help="worker processes (JOHANNITER_WORKERS)")
+    serve_cmd.add_argument('--threads', type=int, help="threads per worker (JOHANNITER_THREADS)")
+    args = parser.parse_args(argv)
+
+    if args.command == 'serve':
+        serve(args.bind, args.workers, args.threads)
@@ -0,0 +1,145 @@
+"""
+In-process cache of per-session dashboard snapshots.
+
+A snapshot is what /api/init returns: config, squads, missions, options
+and the latest log window, serialized once and tagged with the change
+journal cursor it was built at. Dashboard and mobile polls are served
+from it without touching the database.
+
+Invalidation is write-through: the journal's after_commit hook calls
+invalidate() with every session a transaction wrote, so the next poll
+rebuilds. Writes handled by other worker processes cannot reach this
+hook; an entry older than SNAPSHOT_REVALIDATE seconds is therefore
+re-checked against the journal cursor (one indexed lookup) before use.
+
+Entries are evicted least-recently-used beyond SNAPSHOT_CACHE_SESSIONS
+sessions or SNAPSHOT_CACHE_BYTES. An entry keeps only the serialized
+JSON and its token index, and that is what the byte cap counts; views
+that need the parsed data (the mobile squad view) parse the body.
+"""
+import json
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, has_app_context
+
+
+class Snapshot:
+    __slots__ = ('cursor', 'body', 'tokens', 'size', 'checked_at')
+
+    def __init__(self, cursor, data):
+        self.cursor = cursor
+        self.body = json.dumps(data).encode('utf-8')
+        self.tokens = {s['access_token']: s['id'] for s in data['squads'] if s.get('access_token')}
+        # Bytes held in memory: the body object and the token index
+        self.size = sys.getsizeof(self.body) + sys.getsizeof(self.tokens) + \
+            sum(sys.getsizeof(token) + sys.getsizeof(squad_id) for token, squad_id in self.tokens.items())
+        self.checked_at = time.monotonic()
+
+    @property
+    def data(self):
+        """The snapshot parsed again; not kept, so the cap covers what is cached."""
+        return json.loads(self.body)
+
+
+class SnapshotCache:
+    def __init__(self, max_sessions=64, max_bytes=32 * 1024 * 1024, revalidate=1.0):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # session_id -> Snapshot, least recently used first
+        self._generations = {}  # session_id -> invalidation count
+        self._tokens = {}  # squad access token -> session_id
+        self._bytes = 0
+
+    def get(self, session_id, build, current_cursor):
+        """
+        The session's snapshot, built via `build()` -> (cursor, data) on a
+        miss. `current_cursor()` is only called to revalidate old entries.
+        """
+        with self._lock:
+            entry = self._entries.get(session_id)
+            generation = self._generations.get(session_id, 0)
+        if entry and not self._fresh(entry):
+            if current_cursor() == entry.cursor:
+                entry.checked_at = time.monotonic()
+            else:
+                self.invalidate([session_id])
+                entry = None
+                generation += 1
+        if entry:
+            with self._lock:
+                if session_id in self._entries:
+                    self._entries.move_to_end(session_id)
+            return entry
+
+        entry = Snapshot(*build())
+        with self._lock:
+            # Don't store what a concurrent commit invalidated meanwhile
+            if self._generations.get(session_id, 0) == generation:
+                self._store(session_id, entry)
+        return entry
+
+    def cursor(self, session_id):
+        """Journal cursor of a fresh entry, or None if it must be read from the database."""
+        with self._lock:
+            entry = self._entries.get(session_id)
+        return entry.cursor if entry and self._fresh(entry) else None
+
+    def session_for_token(self, token):
+        with self._lock:
+            return self._tokens.get(token)
+
+    def invalidate(self, session_ids):
+        with self._lock:
+            for session_id in session_ids:
+                self._generations[session_id] = self._generations.get(session_id, 0) + 1
+                self._drop(session_id)
+
+    def _fresh(self, entry):
+        return time.monotonic() - entry.checked_at < self.revalidate
+
+    def _store(self, session_id, entry):
+        self._drop(session_id)
+        if entry.size > self.max_bytes:
+            return
+        self._entries[session_id] = entry
+        self._bytes += entry.size
+        for token in entry.tokens:
+            self._tokens[token] = session_id
+        while len(self._entries) > self.max_sessions or self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def _drop(self, session_id):
+        entry = self._entries.pop(session_id, None)
+        if entry:
+            self._bytes -= entry.size
+            for token in entry.tokens:
+                if self._tokens.get(token) == session_id:
+                    del self._tokens[token]
+
+
+_init_lock = threading.Lock()
+
+
+def get_snapshot_cache():
+    """Per-app snapshot cache, created on first use."""
+    with _init_lock:
+        cache = current_app.extensions.get('snapshot_cache')
+        if cache is None:
+            cache = current_app.extensions['snapshot_cache'] = SnapshotCache(
+                max_sessions=current_app.config.get('SNAPSHOT_CACHE_SESSIONS', 64),
+                max_bytes=current_app.config.get('SNAPSHOT_CACHE_BYTES', 32 * 1024 * 1024),
+                revalidate=current_app.config.get('SNAPSHOT_REVALIDATE', 1.0))
+    return cache
+
+
+def invalidate(session_ids):
+    """Drop the snapshots of sessions written by a committed transaction."""
+    if has_app_context():
+        cache = current_app.extensions.get('snapshot_cache')
+        if cache:
+            cache.invalidate(session_ids)
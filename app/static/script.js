@@ -74,14 +74,96 @@ document.addEventListener('DOMContentLoaded', () => {
     setInterval(fetchWeather, 600000); // Refresh every 10 mins
     setInterval(updateClock, 1000);
     setInterval(updateTimers, 1000);
-    setInterval(loadData, 5000); // Polling for live updates
+    connectStream(); // Live updates (falls back to polling)
     checkMobile(); // Check initial view
 });
 
+// Delta sync: cursor of the last applied server change (null = full reload)
+let syncCursor = null;
+let pollTimer = null;
+let loadInFlight = null;
+let loadQueued = false;
+
+// Live updates: the server pushes a 'change' event for every write; we then pull
+// the delta. Plain 5s polling only runs while the stream is down.
+function connectStream() {
+    if (!window.EventSource) {
+        startPolling();
+        return;
+    }
+    const stream = new EventSource('/api/stream');
+    stream.addEventListener('change', (e) => {
+        const cursor = JSON.parse(e.data).cursor;
+        if (syncCursor === null || cursor !== syncCursor) loadData();
+    });
+    stream.onopen = () => stopPolling();
+    stream.onerror = () => startPolling(); // EventSource keeps reconnecting on its own
+}
+
+function startPolling() {
+    if (!pollTimer) pollTimer = setInterval(loadData, 5000);
+}
+
+function stopPolling() {
+    clearInterval(pollTimer);
+    pollTimer = null;
+}
+
+// Conditional GET: resend the last ETag per endpoint. Resolves to null on
+// a 304 (nothing changed since the last response), else to the parsed body.
+// Keyed by path without the query, so the moving ?cursor= keeps one entry
+// per endpoint; the server's ETag covers the query, so a stale one from an
+// older cursor just misses.
+const etags = new Map();
+async function fetchIfChanged(url) {
+    const key = url.split('?')[0];
+    const headers = {};
+    if (etags.has(key)) headers['If-None-Match'] = etags.get(key);
+    const response = await fetch(url, { headers, cache: 'no-store' });
+    if (response.status === 304) return null;
+    const etag = response.headers.get('ETag');
+    if (etag) etags.set(key, etag);
+    return response.json();
+}
+
 async function loadData() {
+    // Coalesce overlapping triggers (stream events, polling, user actions)
+    if (loadInFlight) {
+        loadQueued = true;
+        return loadInFlight;
+    }
+    loadInFlight = fetchAndApply();
     try {
-        const response = await fetch('/api/init');
-        const data = await response.json();
+        await loadInFlight;
+    } finally {
+        loadInFlight = null;
+        if (loadQueued) {
+            loadQueued = false;
+            loadData();
+        }
+    }
+}
+
+async function fetchAndApply() {
+    try {
+        let data;
+        if (syncCursor === null) {
+            data = await fetchIfChanged('/api/init');
+            if (data === null) return;
+        } else {
+            const delta = await fetchIfChanged(`/api/updates?cursor=${syncCursor}`);
+            if (delta === null) return;
+            if (delta.reset) {
+                syncCursor = null;
+                return fetchAndApply();
+            }
+            if (isEmptyDelta(delta)) {
+                syncCursor = delta.cursor;
+                return;
+            }
+            data = mergeDelta(delta);
+        }
+        syncCursor = data.cursor;
 
         // DEBUG: Temporary diagnostic
         const lsID = localStorage.getItem('session_id');
@@ -160,6 +242,32 @@ async function loadData() {
     }
 }
 
+function isEmptyDelta(delta) {
+    return delta.squads.length === 0 && delta.missions.length === 0 && delta.logs.length === 0 &&
+        delta.deleted.squads.length === 0 && delta.deleted.missions.length === 0 &&
+        !('config' in delta) && !('options' in delta);
+}
+
+// Apply a /api/updates?cursor= delta onto the current state, returning a full snapshot
+function mergeDelta(delta) {
+    const squads = new Map(squadsData.map(s => [s.id, s]));
+    delta.squads.forEach(s => squads.set(s.id, s));
+    delta.deleted.squads.forEach(id => squads.delete(id));
+
+    const missions = new Map(missionsData.map(m => [m.id, m]));
+    delta.missions.forEach(m => missions.set(m.id, m));
+    delta.deleted.missions.forEach(id => missions.delete(id));
+
+    return {
+        cursor: delta.cursor,
+        config: 'config' in delta ? delta.config : configData,
+        options: 'options' in delta ? delta.options : optionsData,
+        squads: [...squads.values()].sort((a, b) => a.position - b.position),
+        missions: [...missions.values()].sort((a, b) => (b.created_at || '').localeCompare(a.created_at || '')),
+        logs: delta.logs
+    };
+}
+
 async function startShift(e) {
     e.preventDefault();
     const locInfo = document.body.dataset.locInfo || "N/A";
@@ -204,6 +312,7 @@ async function startShift(e) {
 
         closeModal('shift-setup-modal');
         document.getElementById('welcome-screen').classList.remove('active');
+        syncCursor = null; // New session: full reload
         loadData();
     } catch (error) {
         console.error('Error starting shift:', error);
@@ -277,6 +386,7 @@ async function joinShift(e) {
             closeModal('join-modal');
             document.getElementById('welcome-screen').classList.remove('active');
             // Reload data to sync with the session we just joined
+            syncCursor = null;
             loadData();
         } else {
             alert(data.message || "Beitritt fehlgeschlagen.");
@@ -2097,6 +2207,39 @@ function openExportModal() {
     document.getElementById('export-modal').classList.add('open');
 }
 
+// PDF reports are rendered in the background: queue a job, poll its
+// progress on the button, then download the finished file.
+async function exportPdf() {
+    const btn = document.getElementById('btn-export-pdf');
+    const label = btn.textContent;
+    btn.disabled = true;
+    btn.textContent = 'PDF wird erstellt...';
+
+    try {
+        let res = await fetch('/api/export/pdf/jobs', { method: 'POST' });
+        let job = await res.json();
+        if (!res.ok) throw new Error(job.error || 'Export fehlgeschlagen');
+
+        while (job.status === 'queued' || job.status === 'running') {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            res = await fetch(`/api/export/pdf/jobs/${job.id}`);
+            job = await res.json();
+            if (!res.ok) throw new Error(job.error || 'Export fehlgeschlagen');
+            btn.textContent = `PDF wird erstellt... ${Math.round(job.progress * 100)}%`;
+        }
+
+        if (job.status !== 'done') throw new Error(job.error || 'Export fehlgeschlagen');
+        window.location.href = job.download_url;
+        closeModal('export-modal');
+    } catch (error) {
+        console.error(error);
+        alert("Fehler: " + error.message);
+    } finally {
+        btn.disabled = false;
+        btn.textContent = label;
+    }
+}
+
 function openDeleteMissionModal() {
     document.getElementById('delete-mission-reason').value = '';
     document.getElementById('delete-mission-modal').classList.add('open');
@@ -2131,13 +2274,24 @@ async function confirmDeleteMission() {
 
 // --- Logs ---
 
+const LOG_PAGE_SIZE = 100;
+let logOldestId = null;
+
 async function openLogModal() {
-    const response = await fetch('/api/changes');
+    document.querySelector('#log-table tbody').innerHTML = '';
+    logOldestId = null;
+    await loadLogPage();
+    document.getElementById('log-modal').classList.add('open');
+}
+
+// Append the next (older) page of the protocol to the log table
+async function loadLogPage() {
+    const params = new URLSearchParams({ limit: LOG_PAGE_SIZE });
+    if (logOldestId !== null) params.set('before_id', logOldestId);
+    const response = await fetch(`/api/changes?${params}`);
     const logs = await response.json();
 
     const tbody = document.querySelector('#log-table tbody');
-    tbody.innerHTML = '';
-
     logs.forEach(l => {
         const row = document.createElement('tr');
         row.innerHTML = `
@@ -2148,13 +2302,13 @@ async function openLogModal() {
         tbody.appendChild(row);
     });
 
-    document.getElementById('log-modal').classList.add('open');
+    if (logs.length > 0) logOldestId = logs[logs.length - 1].id;
+    document.getElementById('btn-log-more').style.display = logs.length < LOG_PAGE_SIZE ? 'none' : '';
 }
 
 async function updateLastLog() {
-    const response = await fetch('/api/changes');
-    const logs = await response.json();
-    if (logs.length > 0) {
+    const logs = await fetchIfChanged('/api/logs/latest');
+    if (logs && logs.length > 0) {
         document.getElementById('last-log').textContent =
             `${new Date(logs[0].timestamp).toLocaleTimeString()} - ${logs[0].details}`;
     }
@@ -2316,7 +2470,7 @@ function handleDrop(e) {
         }
 
         // Save new order
-        saveSquadOrder();
+        saveSquadOrder(parseInt(dragSrcEl.dataset.id));
     }
 
     return false;
@@ -2337,16 +2491,17 @@ document.addEventListener('dragend', function (e) {
     }
 });
 
-async function saveSquadOrder() {
+async function saveSquadOrder(movedId) {
     const container = document.getElementById('squad-list');
     const cards = Array.from(container.children);
     const order = cards.map(card => parseInt(card.dataset.id));
 
     try {
+        // With the dragged squad named, the server usually only moves that one
         await fetch('/api/squads/reorder', {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ order: order })
+            body: JSON.stringify({ order: order, moved: movedId })
         });
     } catch (e) {
         console.error("Order save failed:", e);
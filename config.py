@@ -1,6 +1,91 @@
 import os
 
 class Config:
-    SECRET_KEY = 'dev-secret-key-change-in-prod'
+    # Overridable from the environment, see app/server.py
+    SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-prod'
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///app.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Applied to every SQLite connection (see app/database.py)
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',         # readers don't block the writer
+        'busy_timeout': 10000,         # ms a writer waits for the lock
+        'synchronous': 'NORMAL',       # durable with WAL, fsync at checkpoints only
+        'foreign_keys': 'ON',
+        'cache_size': -32000,          # KiB of page cache per connection
+        'mmap_size': 268435456,        # 256 MiB
+        'temp_store': 'MEMORY',
+    }
+    # Enough connections for the worker threads plus open SSE streams
+    # (which only borrow one per heartbeat)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'pool_size': 10,
+        'max_overflow': 20,
+        'pool_timeout': 30,
+    }
+
+    # Key of the digests that let /api/join find a shift by its password.
+    # Unset: a random key created in <instance>/join_key. Never stored in
+    # the database; with a new key each shift's next join falls back to
+    # checking password hashes once
+    JOIN_KEY = os.environ.get('JOIN_KEY')
+
+    # Reverse proxies in front of the app: with N > 0 the client address
+    # (join rate limit, access log) is taken from the N-th last
+    # X-Forwarded-For entry, scheme and host likewise. Only set it when
+    # that many trusted proxies do set these headers, or clients can forge them
+    PROXY_HOPS = int(os.environ.get('PROXY_HOPS', 0))
+
+    # /api/join attempts per client address and window (seconds)
+    JOIN_RATE_LIMIT = 10
+    JOIN_RATE_WINDOW = 60
+
+    # Seconds between SSE keepalives on /api/stream
+    STREAM_HEARTBEAT = 15
+    # Open /api/stream connections per process, each holding a server
+    # thread. Beyond it streams are turned away and their clients poll.
+    # 0: no limit; app/server.py derives it from the thread count
+    STREAM_LIMIT = int(os.environ.get('STREAM_LIMIT', 0))
+    # Seconds between checks of the journal for writes made by other
+    # worker processes, which then wake this process's streams (see
+    # app/events.py). 0: only the heartbeat picks them up
+    STREAM_WATCH_INTERVAL = float(os.environ.get('STREAM_WATCH_INTERVAL', 0))
+
+    # Log feed: entries in /api/init, default and maximum page size of
+    # /api/changes (keyset-paginated with ?before_id=)
+    INIT_LOG_LIMIT = 50
+    LOG_PAGE_SIZE = 100
+    LOG_PAGE_MAX = 500
+
+    # Change journal entries a session may gain (per process) before its
+    # redundant entries are compacted away after a request (see app/journal.py)
+    JOURNAL_COMPACT_EVERY = 2000
+
+    # Per-process /api/init snapshot cache: sessions and serialized bytes
+    # kept (LRU), and seconds before an entry is re-checked against the
+    # journal for writes made by other worker processes
+    SNAPSHOT_CACHE_SESSIONS = 64
+    SNAPSHOT_CACHE_BYTES = 32 * 1024 * 1024
+    SNAPSHOT_REVALIDATE = float(os.environ.get('SNAPSHOT_REVALIDATE', 1.0))
+
+    # Per-request SQL counts and timings: Server-Timing headers and
+    # /api/_debug/metrics (see app/instrumentation.py). Shows SQL text,
+    # keep it off on public deployments
+    SQL_METRICS = os.environ.get('SQL_METRICS') == '1'
+    SQL_METRICS_SLOWEST = 5
+
+    # Prometheus text metrics at /metrics (see app/metrics.py). Not
+    # authenticated and shows per-session activity: only turn it on
+    # where /metrics is not reachable from the public network
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED') == '1'
+
+    # Background PDF reports: worker threads and where jobs/results are
+    # kept (defaults to <instance>/reports)
+    REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', 2))
+    REPORT_DIR = os.environ.get('REPORT_DIR')
+    # Seconds a job's status stays available after its last update
+    REPORT_JOB_TTL = 3600
+    # Seconds a cached report stays on disk after it was last served
+    REPORT_CACHE_TTL = 86400
+    # PDF charts: 'vector' (ReportLab graphics) or 'matplotlib' (cached PNGs)
+    REPORT_CHARTS = os.environ.get('REPORT_CHARTS', 'vector')
@@ -1,10 +1,11 @@
 from app import create_app
-from app.extensions import db
+from app.migrations import init_db
 
 app = create_app()
 
+# Development server. In production: python -m app serve (see app/server.py)
 if __name__ == '__main__':
     with app.app_context():
-        # Auto-create DB if not exists
-        db.create_all()
+        # Auto-create DB if not exists, apply pending migrations
+        init_db()
     app.run(debug=True, port=5001)
@@ -0,0 +1,387 @@
+"""
+Load test: simulates a full event shift against the real endpoints.
+
+Actors (one thread each):
+  - dispatcher tabs: load /api/init once, then poll /api/updates?cursor=
+    and /api/logs/latest with If-None-Match, like script.js in polling mode
+  - squad phones: poll /api/squads/me?token= with If-None-Match and post
+    status changes, like mobile_squad_view.html
+  - mission churn: one dispatcher creating, editing and closing missions
+  - open streams (--streams N): /api/stream connections held for the
+    whole run, opened before the other actors start. Against a server
+    (--url) they occupy worker threads like connected dashboards and
+    phones, so the other endpoints show whether polls and writes stay
+    responsive; streams turned away at STREAM_LIMIT count as
+    `GET /api/stream (busy)`
+
+By default the app runs in-process on a temporary SQLite file with the
+production profile, which also yields DB query counts per endpoint.
+--url drives a running server instead (no query counts).
+
+    python scripts/load_test.py --squads 40 --tabs 4 --duration 60
+    python scripts/load_test.py --speed 5 --out results.json --baseline scripts/load_test_baseline.json
+    python scripts/load_test.py --url http://127.0.0.1:8000 --streams 120 --speed 5
+
+--speed N compresses all think times N-fold (more load per simulated actor).
+Prints p50/p95/p99 latency, throughput and queries per request per
+endpoint; --baseline prints the change against a previous --out file.
+
+scripts/load_test_baseline.json was recorded in-process with
+--duration 30 --speed 5 and the defaults otherwise. Latencies depend on
+the machine: re-record it there before comparing. Query counts don't.
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+SESSION_ID = 'load-test'
+STATUS_CYCLE = ['3', '4', '7', '8', '2']
+
+
+class InProcessClient:
+    """Drives the app through its WSGI interface and counts SQL per request."""
+
+    def __init__(self, app, counter):
+        self.client = app.test_client()
+        self.counter = counter
+
+    def request(self, method, path, json_body=None, headers=None):
+        self.counter.reset()
+        start = time.perf_counter()
+        rv = self.client.open(path, method=method, json=json_body, headers=headers or {})
+        body = rv.get_data()
+        elapsed = time.perf_counter() - start
+        data = json.loads(body) if body and rv.mimetype == 'application/json' else None
+        return rv.status_code, data, rv.headers, elapsed, self.counter.count
+
+    def stream(self, path, headers=None):
+        """Open an event stream: status, first event, seconds to it, further chunks, close()."""
+        start = time.perf_counter()
+        rv = self.client.get(path, headers=headers or {}, buffered=False)
+        chunks = (chunk.decode('utf-8') for chunk in rv.response)
+        first = next(chunks, '')
+        return rv.status_code, first, time.perf_counter() - start, chunks, rv.close
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        import requests
+        self.base_url = base_url.rstrip('/')
+        self.session = requests.Session()
+
+    def request(self, method, path, json_body=None, headers=None):
+        start = time.perf_counter()
+        rv = self.session.request(method, self.base_url + path, json=json_body, headers=headers or {}, timeout=30)
+        elapsed = time.perf_counter() - start
+        data = rv.json() if rv.content and rv.headers.get('Content-Type', '').startswith('application/json') else None
+        return rv.status_code, data, rv.headers, elapsed, None
+
+    def stream(self, path, headers=None):
+        start = time.perf_counter()
+        # Keepalives arrive every STREAM_HEARTBEAT (15 s); a stream queued
+        # behind busy threads fails after a minute
+        rv = self.session.get(self.base_url + path, headers=headers or {}, stream=True, timeout=(30, 60))
+        chunks = rv.iter_content(chunk_size=None, decode_unicode=True)
+        first = next(chunks, '')
+        return rv.status_code, first, time.perf_counter() - start, chunks, rv.close
+
+
+class QueryCounter:
+    """Per-thread count of SQL statements, hooked into the engine."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self._local = threading.local()
+        event.listen(engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self._local.count = getattr(self._local, 'count', 0) + 1
+
+    def reset(self):
+        self._local.count = 0
+
+    @property
+    def count(self):
+        return getattr(self._local, 'count', 0)
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = defaultdict(list)  # endpoint -> [(seconds, queries, ok)]
+
+    def add(self, endpoint, elapsed, queries, ok):
+        with self._lock:
+            self.samples[endpoint].append((elapsed, queries, ok))
+
+
+def percentile(values, p):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    k = min(len(values) - 1, max(0, int(round(p / 100 * (len(values) - 1)))))
+    return values[k]
+
+
+class Shift:
+    def __init__(self, make_client, args):
+        self.make_client = make_client
+        self.args = args
+        self.recorder = Recorder()
+        self.deadline = None
+        self.rng = random.Random(args.seed)
+        self.rng_lock = threading.Lock()
+        self.squads = []
+
+    def call(self, client, endpoint, method, path, json_body=None, headers=None):
+        headers = dict(headers or {}, **{'X-Session-ID': SESSION_ID})
+        start = time.perf_counter()
+        try:
+            status, data, resp_headers, elapsed, queries = client.request(method, path, json_body, headers)
+        except Exception:
+            # Timed out or refused: an error, the actor carries on
+            self.recorder.add(endpoint, time.perf_counter() - start, None, False)
+            return 599, None, {}
+        self.recorder.add(endpoint, elapsed, queries, status < 400)
+        return status, data, resp_headers
+
+    def think(self, seconds):
+        with self.rng_lock:
+            jitter = self.rng.uniform(0.5, 1.5)
+        time.sleep(seconds * jitter / self.args.speed)
+
+    def running(self):
+        return time.monotonic() < self.deadline
+
+    # --- Setup ---
+
+    def setup(self):
+        client = self.make_client()
+        squads = [{"name": f"Trupp {i + 1}"} for i in range(self.args.squads)]
+        self.call(client, 'POST /api/config', 'POST', '/api/config', {"location": "Lasttest", "squads": squads})
+        for i in range(self.args.ambulanzen):
+            self.call(client, 'POST /api/squads', 'POST', '/api/squads', {"name": f"UHS {i + 1}", "type": "Ambulanz"})
+        _, data, _ = self.call(client, 'GET /api/init', 'GET', '/api/init')
+        self.squads = data['squads']
+        self.recorder = Recorder()  # setup doesn't count
+
+    # --- Actors ---
+
+    def dispatcher_tab(self):
+        client = self.make_client()
+        etags = {}
+
+        def poll(endpoint, path):
+            headers = {'If-None-Match': etags[path]} if path in etags else {}
+            status, data, resp_headers = self.call(client, endpoint, 'GET', path, headers=headers)
+            if status == 200 and resp_headers.get('ETag'):
+                etags[path] = resp_headers['ETag']
+            return status, data
+
+        status, data = poll('GET /api/init', '/api/init')
+        # A failed load starts from cursor 0, i.e. a full delta
+        cursor = data['cursor'] if status == 200 else 0
+        while self.running():
+            self.think(self.args.poll_interval)
+            status, delta = poll('GET /api/updates?cursor', f'/api/updates?cursor={cursor}')
+            if status == 200:
+                if delta.get('reset'):
+                    status, data = poll('GET /api/init', '/api/init')
+                    cursor = data['cursor'] if status == 200 else 0
+                    continue
+                cursor = delta['cursor']
+                poll('GET /api/logs/latest', '/api/logs/latest')
+
+    def squad_phone(self, squad):
+        client = self.make_client()
+        token = squad['access_token']
+        etag = None
+        with self.rng_lock:
+            offset = self.rng.random()
+        # Spread the first status change over the interval
+        next_status = time.monotonic() + self.args.status_interval / self.args.speed * offset
+        step = 0
+        while self.running():
+            headers = {'If-None-Match': etag} if etag else {}
+            status, _, resp_headers = self.call(client, 'GET /api/squads/me', 'GET', f'/api/squads/me?token={token}', headers=headers)
+            if status == 200:
+                etag = resp_headers.get('ETag')
+            if time.monotonic() >= next_status:
+                new_status = STATUS_CYCLE[step % len(STATUS_CYCLE)]
+                step += 1
+                self.call(client, 'POST /api/squads/<id>/status', 'POST',
+                          f"/api/squads/{squad['id']}/status?token={token}", {"status": new_status})
+                next_status = time.monotonic() + self.args.status_interval / self.args.speed
+            self.think(self.args.phone_interval)
+
+    def mission_churn(self):
+        client = self.make_client()
+        trupps = [s['id'] for s in self.squads if s['type'] != 'Ambulanz']
+        open_missions = []
+        n = 0
+        while self.running():
+            self.think(self.args.mission_interval)
+            n += 1
+            with self.rng_lock:
+                assigned = self.rng.sample(trupps, min(len(trupps), self.rng.randint(1, 2)))
+            status, mission, _ = self.call(client, 'POST /api/missions', 'POST', '/api/missions', {
+                "location": f"Sektor {n % 12}", "reason": "Lasttest", "alarming_entity": "Leitstelle",
+                "squad_ids": assigned})
+            if status == 201:
+                open_missions.append(mission['id'])
+            if open_missions:
+                self.call(client, 'PUT /api/missions/<id>', 'PUT', f'/api/missions/{open_missions[-1]}',
+                          {"notes": f"Update {n}"})
+            if len(open_missions) > 3:
+                done = open_missions.pop(0)
+                self.call(client, 'PUT /api/missions/<id>', 'PUT', f'/api/missions/{done}',
+                          {"status": "Abgeschlossen", "outcome": "Belassen"})
+
+    def open_stream(self, opened):
+        client = self.make_client()
+        try:
+            status, first, elapsed, chunks, close = client.stream('/api/stream', {'X-Session-ID': SESSION_ID})
+        except Exception:
+            self.recorder.add('GET /api/stream', 0.0, None, False)
+            return
+        finally:
+            opened.release()
+        busy = 'event: busy' in first
+        self.recorder.add('GET /api/stream (busy)' if busy else 'GET /api/stream', elapsed, None, status == 200)
+        try:
+            if status == 200 and not busy:
+                # Hold it; every event or keepalive checks the deadline
+                for _ in chunks:
+                    if not self.running():
+                        break
+        finally:
+            close()
+
+    def run(self):
+        self.setup()
+        self.deadline = float('inf')
+        opened = threading.Semaphore(0)
+        for _ in range(self.args.streams):
+            threading.Thread(target=self.open_stream, args=(opened,), daemon=True).start()
+        for _ in range(self.args.streams):
+            opened.acquire()
+        self.deadline = time.monotonic() + self.args.duration
+        threads = [threading.Thread(target=self.dispatcher_tab) for _ in range(self.args.tabs)]
+        threads += [threading.Thread(target=self.squad_phone, args=(s,)) for s in self.squads if s['type'] != 'Ambulanz']
+        threads.append(threading.Thread(target=self.mission_churn))
+        start = time.monotonic()
+        for t in threads:
+            t.daemon = True
+            t.start()
+        for t in threads:
+            t.join()
+        return time.monotonic() - start
+
+
+def summarize(recorder, wall):
+    results = {}
+    for endpoint, samples in sorted(recorder.samples.items()):
+        times = [s[0] * 1000 for s in samples]
+        queries = [s[1] for s in samples if s[1] is not None]
+        results[endpoint] = {
+            'requests': len(samples),
+            'errors': sum(1 for s in samples if not s[2]),
+            'rps': round(len(samples) / wall, 2),
+            'p50_ms': round(percentile(times, 50), 2),
+            'p95_ms': round(percentile(times, 95), 2),
+            'p99_ms': round(percentile(times, 99), 2),
+            'max_ms': round(max(times), 2),
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return results
+
+
+def print_table(results, baseline=None):
+    header = f"{'endpoint':32} {'req':>6} {'err':>4} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8} {'q/req':>6}"
+    print(header)
+    print('-' * len(header))
+    for endpoint, r in results.items():
+        q = '-' if r['queries_per_request'] is None else f"{r['queries_per_request']:.1f}"
+        print(f"{endpoint:32} {r['requests']:6} {r['errors']:4} {r['rps']:7.1f} {r['p50_ms']:8.1f} "
+              f"{r['p95_ms']:8.1f} {r['p99_ms']:8.1f} {r['max_ms']:8.1f} {q:>6}")
+        if baseline and endpoint in baseline:
+            b = baseline[endpoint]
+            change = lambda new, old: f"{(new - old) / old * 100:+.0f}%" if old else 'n/a'
+            q_change = '-' if r['queries_per_request'] is None or b['queries_per_request'] is None else \
+                change(r['queries_per_request'], b['queries_per_request'])
+            print(f"{'  vs baseline':32} {'':6} {'':4} {change(r['rps'], b['rps']):>7} "
+                  f"{change(r['p50_ms'], b['p50_ms']):>8} {change(r['p95_ms'], b['p95_ms']):>8} "
+                  f"{change(r['p99_ms'], b['p99_ms']):>8} {'':8} {q_change:>6}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help="drive a running server (e.g. http://127.0.0.1:8000) instead of in-process")
+    parser.add_argument('--squads', type=int, default=40, help="squads, each with a phone (default 40)")
+    parser.add_argument('--ambulanzen', type=int, default=2)
+    parser.add_argument('--tabs', type=int, default=4, help="dispatcher tabs (default 4)")
+    parser.add_argument('--streams', type=int, default=0, help="open /api/stream connections (default 0)")
+    parser.add_argument('--duration', type=float, default=60, help="seconds (default 60)")
+    parser.add_argument('--speed', type=float, default=1, help="compress think times N-fold")
+    parser.add_argument('--poll-interval', type=float, default=5, help="dashboard poll, s")
+    parser.add_argument('--phone-interval', type=float, default=3, help="phone poll, s")
+    parser.add_argument('--status-interval', type=float, default=60, help="status change per squad, s")
+    parser.add_argument('--mission-interval', type=float, default=20, help="new mission, s")
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--out', help="write results as JSON")
+    parser.add_argument('--baseline', help="compare against a previous --out file")
+    args = parser.parse_args()
+
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        from app import create_app
+        from app.extensions import db
+        from app.migrations import init_db
+        from config import Config
+
+        workdir = tempfile.mkdtemp(prefix='johanniter-load-')
+
+        class LoadConfig(Config):
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'load.db')}"
+            REPORT_DIR = os.path.join(workdir, 'reports')
+            JOIN_KEY = 'load-test'
+            # Held streams notice the end of the run within a second
+            STREAM_HEARTBEAT = 1
+
+        app = create_app(LoadConfig)
+        with app.app_context():
+            init_db()
+            counter = QueryCounter(db.engine)
+        make_client = lambda: InProcessClient(app, counter)
+
+    shift = Shift(make_client, args)
+    wall = shift.run()
+    results = summarize(shift.recorder, wall)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)['endpoints']
+
+    total = sum(r['requests'] for r in results.values())
+    print(f"{args.squads} squads, {args.tabs} tabs, {args.streams} streams, {wall:.0f}s at speed {args.speed:g}: "
+          f"{total} requests, {total / wall:.1f} req/s")
+    print_table(results, baseline)
+
+    if args.out:
+        settings = {k: v for k, v in vars(args).items() if k not in ('out', 'baseline')}
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump({'settings': settings, 'endpoints': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
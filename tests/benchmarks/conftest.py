@@ -0,0 +1,237 @@
+"""
+Benchmark fixtures: realistic shifts at several sizes, peak memory tracking.
+
+The benchmarks take about a minute and their results belong to one
+machine, so a plain `pytest` skips them (plain tests in this
+directory, like the startup import check, still run):
+
+    BENCHMARK=1 pytest tests/benchmarks                    # 10/100 missions, 10k logs
+    BENCHMARK=1 BENCHMARK_FULL=1 pytest tests/benchmarks   # + 1,000 missions, 100k logs
+
+The PDF report is benchmarked on smaller logs (1k, 10k with
+BENCHMARK_FULL): ReportLab layout costs about a millisecond per log
+line. test_pdf_scaling.py checks that this stays linear (opt-in with
+BENCHMARK_SCALING=1).
+
+Timing regressions use pytest-benchmark's own comparison, against a run
+saved on the same machine:
+
+    BENCHMARK=1 pytest tests/benchmarks --benchmark-autosave
+    BENCHMARK=1 pytest tests/benchmarks --benchmark-compare --benchmark-compare-fail=mean:15%
+
+Peak memory (tracemalloc, one extra run per benchmark) is compared with
+.benchmarks/memory_baseline.json and fails beyond
+BENCHMARK_MEMORY_THRESHOLD (0.25, i.e. +25%). Like the saved timing runs
+next to it, the baseline is recorded on and for one machine and is not
+committed: BENCHMARK_UPDATE_BASELINE=1 records the current values, and
+benchmarks without a recorded value are not checked.
+"""
+import json
+import os
+import random
+import sys
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..')))
+
+from app import create_app
+from app.extensions import db
+from app.models import ShiftConfig, Squad, Mission, LogEntry, mission_squad
+from config import Config
+
+ENABLED = os.environ.get('BENCHMARK') == '1'
+FULL = os.environ.get('BENCHMARK_FULL') == '1'
+# (missions, log entries)
+SIZES = [(10, 10_000), (100, 10_000)] + ([(1_000, 100_000)] if FULL else [])
+PDF_SIZES = [(10, 1_000), (100, 1_000)] + ([(1_000, 10_000)] if FULL else [])
+SQUADS = 40
+SESSION_ID = 'bench'
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), '..', '..', '.benchmarks', 'memory_baseline.json')
+MEMORY_THRESHOLD = float(os.environ.get('BENCHMARK_MEMORY_THRESHOLD', 0.25))
+# Absolute allowance, so allocator noise on tiny peaks does not fail a run
+MEMORY_SLACK_KB = 64
+UPDATE_BASELINE = os.environ.get('BENCHMARK_UPDATE_BASELINE') == '1'
+
+
+def pytest_collection_modifyitems(config, items):
+    if ENABLED:
+        return
+    skip = pytest.mark.skip(reason="benchmarks are opt-in, set BENCHMARK=1")
+    for item in items:
+        if 'benchmark' in getattr(item, 'fixturenames', ()):
+            item.add_marker(skip)
+
+
+class BenchConfig(Config):
+    TESTING = True
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    SQLALCHEMY_ENGINE_OPTIONS = {}
+    SECRET_KEY = 'bench-key'
+
+
+def seed_shift(missions, logs, squads=SQUADS, seed=1):
+    """A shift with `missions` missions (1-2 squads each) and `logs` log lines."""
+    rng = random.Random(seed)
+    t0 = datetime(2025, 7, 1, 8, 0, 0)
+    db.session.add(ShiftConfig(location='Festival', address='Festplatz 1', start_time=t0, session_id=SESSION_ID))
+
+    db.session.execute(db.insert(Squad), [{
+        'name': f'Trupp {i + 1}' if i >= 2 else f'UHS {i + 1}',
+        'type': 'Ambulanz' if i < 2 else 'Trupp',
+        'current_status': rng.choice(['2', '3', '4', '7', '8']),
+        'position': i,
+        'service_numbers': '1234,5678' if i % 3 == 0 else None,
+        'access_token': f'token-{i}',
+        'session_id': SESSION_ID,
+        'last_status_change': t0,
+        'updated_at': t0,
+    } for i in range(squads)])
+    squad_ids = [row[0] for row in db.session.execute(db.select(Squad.id).order_by(Squad.id))]
+
+    span = timedelta(hours=12) / max(missions, 1)
+    rows = []
+    for i in range(missions):
+        created = t0 + span * i
+        closed = i < missions * 0.8
+        rows.append({
+            'mission_number': str(100 + i),
+            'location': f'Sektor {i % 12}',
+            'initial_location': f'Sektor {i % 12}',
+            'alarming_entity': rng.choice(['Leitstelle', 'Security', 'Passant']),
+            'reason': rng.choice(['Chirurgisch', 'Internistisch', 'Neurologisch']),
+            'description': 'Person gestürzt' if i % 2 else None,
+            'status': 'Abgeschlossen' if closed else 'Laufend',
+            'outcome': rng.choice(['Belassen', 'ARM', 'Übergeben an RD']) if closed else None,
+            'arm_type': 'RTW' if closed and i % 4 == 0 else None,
+            'notes': 'Notiz' if i % 5 == 0 else None,
+            'is_deleted': i % 25 == 24,
+            'deletion_reason': 'Fehlalarm' if i % 25 == 24 else None,
+            'session_id': SESSION_ID,
+            'created_at': created,
+            'updated_at': created + timedelta(minutes=40),
+            'alarmed_at': created + timedelta(minutes=1),
+            'arrived_at': created + timedelta(minutes=6),
+            'completed_at': created + timedelta(minutes=40) if closed else None,
+        })
+    db.session.execute(db.insert(Mission), rows)
+    mission_ids = [row[0] for row in db.session.execute(db.select(Mission.id).order_by(Mission.id))]
+
+    links = set()
+    for i, mission_id in enumerate(mission_ids):
+        for squad_id in rng.sample(squad_ids[2:], rng.randint(1, 2)):
+            links.add((mission_id, squad_id))
+        if i % 4 == 0:
+            links.add((mission_id, squad_ids[i % 2]))
+    db.session.execute(mission_squad.insert(), [{'mission_id': m, 'squad_id': s} for m, s in links])
+
+    step = timedelta(hours=12) / max(logs, 1)
+    db.session.execute(db.insert(LogEntry), [{
+        'timestamp': t0 + step * i,
+        'action': 'STATUS' if i % 3 else rng.choice(['EINSATZ UPDATE', 'EINSATZ ERSTELLT', 'EREIGNIS']),
+        'details': f'Statusänderung Trupp {i % squads + 1}: Einsatzbereit -> Unterwegs',
+        'mission_id': mission_ids[i % len(mission_ids)] if mission_ids and i % 2 else None,
+        'squad_id': squad_ids[i % len(squad_ids)] if i % 3 else None,
+        'session_id': SESSION_ID,
+    } for i in range(logs)])
+    db.session.commit()
+    return ShiftConfig.query.filter_by(session_id=SESSION_ID).first()
+
+
+def size_id(size):
+    return f'{size[0]}m-{size[1] // 1000}k'
+
+
+@contextmanager
+def seeded_app(size):
+    """(app, config) with a seeded shift of `size` (missions, log entries)."""
+    app = create_app(BenchConfig)
+    with app.app_context():
+        db.create_all()
+        config = seed_shift(*size)
+        yield app, config
+        db.session.remove()
+        db.drop_all()
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=size_id)
+def shift(request):
+    """(app, config) with a seeded shift, shared by the benchmarks of a module."""
+    with seeded_app(request.param) as shift:
+        yield shift
+
+
+@pytest.fixture(scope='module', params=PDF_SIZES, ids=size_id)
+def pdf_shift(request):
+    with seeded_app(request.param) as shift:
+        yield shift
+
+
+@pytest.fixture(scope='session')
+def make_shift():
+    """seeded_app, for tests that seed their own sizes."""
+    return seeded_app
+
+
+class MemoryBaseline:
+    def __init__(self):
+        self.values = {}
+        if os.path.exists(BASELINE_PATH):
+            with open(BASELINE_PATH, encoding='utf-8') as f:
+                self.values = json.load(f)
+        self.changed = False
+
+    def check(self, name, peak_kb):
+        baseline = self.values.get(name)
+        if UPDATE_BASELINE or baseline is None:
+            self.values[name] = peak_kb
+            self.changed = True
+            return
+        limit = baseline * (1 + MEMORY_THRESHOLD) + MEMORY_SLACK_KB
+        assert peak_kb <= limit, f"{name}: peak memory {peak_kb} KiB exceeds baseline {baseline} KiB by more than {MEMORY_THRESHOLD:.0%}"
+
+    def save(self):
+        if self.changed:
+            os.makedirs(os.path.dirname(BASELINE_PATH), exist_ok=True)
+            with open(BASELINE_PATH, 'w', encoding='utf-8') as f:
+                json.dump(dict(sorted(self.values.items())), f, indent=2)
+                f.write('\n')
+
+
+@pytest.fixture(scope='session')
+def memory_baseline():
+    baseline = MemoryBaseline()
+    yield baseline
+    # Only record new entries from a full run, so CI never writes here by accident
+    if UPDATE_BASELINE:
+        baseline.save()
+
+
+@pytest.fixture
+def measure(benchmark, memory_baseline, request):
+    """
+    measure(fn, rounds=None): time `fn` with pytest-benchmark, then run it
+    once more under tracemalloc and check its peak against the baseline.
+    `rounds` switches to a fixed number of rounds for slow functions.
+    """
+    def run(fn, rounds=None):
+        if rounds:
+            result = benchmark.pedantic(fn, rounds=rounds, iterations=1)
+        else:
+            result = benchmark(fn)
+        tracemalloc.start()
+        try:
+            fn()
+            peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+        benchmark.extra_info['peak_kb'] = peak_kb
+        memory_baseline.check(request.node.name, peak_kb)
+        return result
+    return run
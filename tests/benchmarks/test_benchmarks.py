@@ -0,0 +1,65 @@
+from app.extensions import db
+from app.journal import current_cursor
+from app.models import Squad, Mission
+from app.snapshot import get_snapshot_cache
+from app.reports import generate_export_file, generate_pdf_file
+
+SESSION_ID = 'bench'  # see seed_shift() in conftest.py
+HEADERS = {'X-Session-ID': SESSION_ID}
+
+
+def test_squad_to_dict(shift, measure):
+    data = measure(lambda: [s.to_dict() for s in Squad.for_session(SESSION_ID).order_by(Squad.position).all()])
+    assert data
+
+
+def test_mission_to_dict(shift, measure):
+    query = lambda: Mission.for_session(SESSION_ID).filter_by(is_deleted=False).order_by(Mission.created_at.desc())
+    data = measure(lambda: [m.to_dict() for m in query().all()])
+    assert data
+
+
+def test_export_txt(shift, measure):
+    app, config = shift
+    report = measure(lambda: generate_export_file(config).getvalue())
+    assert b'Festival' in report
+
+
+def test_export_pdf(pdf_shift, measure):
+    app, config = pdf_shift
+    report = measure(lambda: generate_pdf_file(config).getvalue(), rounds=3)
+    assert report.startswith(b'%PDF')
+
+
+def test_updates_full_uncached(shift, measure):
+    app, config = shift
+    client = app.test_client()
+
+    def poll():
+        # Rebuild the snapshot every time: the cost after each write
+        get_snapshot_cache().invalidate([SESSION_ID])
+        return client.get('/api/updates', headers=HEADERS)
+
+    rv = measure(poll)
+    assert rv.status_code == 200
+
+
+def test_updates_full_cached(shift, measure):
+    app, config = shift
+    client = app.test_client()
+    rv = measure(lambda: client.get('/api/updates', headers=HEADERS))
+    assert rv.status_code == 200
+
+
+def test_updates_delta(shift, measure):
+    app, config = shift
+    client = app.test_client()
+    # A dashboard one status change behind
+    squad = Squad.query.filter_by(session_id=SESSION_ID, type='Trupp').first()
+    cursor = current_cursor(SESSION_ID)
+    client.post(f'/api/squads/{squad.id}/status', json={"status": "2" if squad.current_status != '2' else '3'},
+                headers=HEADERS)
+    db.session.expire_all()
+
+    rv = measure(lambda: client.get(f'/api/updates?cursor={cursor}', headers=HEADERS))
+    assert rv.status_code == 200 and rv.get_json()['squads']
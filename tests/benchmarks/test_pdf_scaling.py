@@ -0,0 +1,60 @@
+"""
+The PDF report must scale linearly with the log: the same per-entry time
+and memory at four (BENCHMARK_FULL: ten) times the log entries.
+
+It compares wall-clock times, takes most of a minute and is only
+meaningful on an otherwise idle machine, so it is opt-in:
+
+    BENCHMARK=1 BENCHMARK_SCALING=1 pytest tests/benchmarks/test_pdf_scaling.py
+"""
+import os
+import time
+import tracemalloc
+
+import pytest
+
+from app.reports import generate_pdf_file
+
+pytestmark = pytest.mark.skipif(os.environ.get('BENCHMARK_SCALING') != '1',
+                                reason="wall-clock scaling check, set BENCHMARK_SCALING=1")
+
+FULL = os.environ.get('BENCHMARK_FULL') == '1'
+SIZES = (5_000, 50_000) if FULL else (1_000, 4_000)
+# Missions grow with the log (100 entries each), as in a real shift
+LOGS_PER_MISSION = 100
+# Allowed growth of the per-entry cost from the small to the large log
+TOLERANCE = 1.5
+
+
+def _render(make_shift, logs):
+    with make_shift((logs // LOGS_PER_MISSION, logs)) as (app, config):
+        start = time.perf_counter()
+        generate_pdf_file(config)
+        seconds = time.perf_counter() - start
+        tracemalloc.start()
+        try:
+            generate_pdf_file(config)
+            peak_kb = tracemalloc.get_traced_memory()[1] // 1024
+        finally:
+            tracemalloc.stop()
+    return seconds, peak_kb
+
+
+def test_export_pdf_scales_linearly(benchmark, make_shift):
+    small, large = SIZES
+    results = {}
+
+    def run():
+        for logs in SIZES:
+            results[logs] = _render(make_shift, logs)
+
+    benchmark.pedantic(run, rounds=1, iterations=1)
+    for logs, (seconds, peak_kb) in results.items():
+        benchmark.extra_info[f'{logs}_ms_per_log'] = round(seconds * 1000 / logs, 3)
+        benchmark.extra_info[f'{logs}_peak_kb'] = peak_kb
+
+    (t_small, m_small), (t_large, m_large) = results[small], results[large]
+    time_growth = (t_large / large) / (t_small / small)
+    memory_growth = (m_large / large) / (m_small / small)
+    assert time_growth < TOLERANCE, f"per-entry time grew {time_growth:.2f}x from {small} to {large} logs"
+    assert memory_growth < TOLERANCE, f"per-entry peak memory grew {memory_growth:.2f}x from {small} to {large} logs"
@@ -0,0 +1,53 @@
+"""
+Cold start of a worker: `create_app()` in a fresh interpreter.
+
+Wall time is benchmarked over a few subprocess runs; the import profile
+comes from `python -X importtime` (slowest modules in extra_info) and
+peak RSS (Linux) is recorded next to it. RSS depends on the interpreter
+build, allocator and installed wheels, so it is not compared with a
+baseline; what startup must not load is asserted directly instead.
+"""
+import os
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+STARTUP = "from app import create_app; create_app()"
+# Only loaded when a report is rendered (see app/reports/__init__.py)
+LAZY_MODULES = ('reportlab', 'matplotlib', 'app.reports.pdf')
+
+
+def _python(*args):
+    return subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def import_profile():
+    """{module: cumulative microseconds} of a cold create_app()."""
+    profile = {}
+    for line in _python('-X', 'importtime', '-c', STARTUP).stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        profile[name.strip()] = int(cumulative)
+    return profile
+
+
+def test_startup_time(benchmark):
+    benchmark.pedantic(lambda: _python('-c', STARTUP), rounds=5, iterations=1)
+
+    profile = import_profile()
+    slowest = sorted(profile.items(), key=lambda item: -item[1])[:10]
+    benchmark.extra_info['import_us'] = profile.get('app')
+    benchmark.extra_info['slowest_imports'] = dict(slowest)
+
+    # Reported by the child: VmHWM belongs to its own address space,
+    # unlike ru_maxrss, which keeps the forked parent's peak across exec
+    if os.path.exists('/proc/self/status'):
+        peak_kb = int(_python('-c', f"{STARTUP}; print(open('/proc/self/status').read())").stdout
+                      .split('VmHWM:')[1].split()[0])
+        benchmark.extra_info['peak_rss_kb'] = peak_kb
+
+
+def test_startup_skips_report_libraries():
+    loaded = _python('-c', f"{STARTUP}; import sys; print(' '.join(sys.modules))").stdout.split()
+    assert not [name for name in loaded if any(name == m or name.startswith(m + '.') for m in LAZY_MODULES)]
@@ -13,16 +13,40 @@ class TestConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     SECRET_KEY = 'test-key'
+    JOIN_KEY = 'test-join-key'
+    # In-memory databases use a single static connection, no pool to size
+    SQLALCHEMY_ENGINE_OPTIONS = {}
 
 @pytest.fixture
-def app():
+def app(tmp_path):
     app = create_app(TestConfig)
+    app.config['REPORT_DIR'] = str(tmp_path / 'reports')
     
     with app.app_context():
         db.create_all()
         yield app
         db.drop_all()
 
+@pytest.fixture
+def query_budget(app):
+    """
+    with query_budget(3): client.get(...)
+
+    Fails if the block runs more SQL statements than the budget (the
+    request's commit included); yields the statements for inspection.
+    """
+    from contextlib import contextmanager
+    from app.instrumentation import count_queries
+
+    @contextmanager
+    def budget(limit):
+        with count_queries(db.engine) as statements:
+            yield statements
+        assert len(statements) <= limit, (
+            f"{len(statements)} queries, budget {limit}:\n" + "\n".join(statements)
+        )
+    return budget
+
 @pytest.fixture
 def client(app):
     return app.test_client()
@@ -0,0 +1,152 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+from sqlalchemy import text
+
+from app import create_app
+from app.extensions import db
+from app.migrations import init_db
+from app.models import LogEntry
+from config import Config
+
+
+def test_concurrent_status_updates_on_file_database(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-key'
+        JOIN_KEY = 'test-join-key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        REPORT_DIR = str(tmp_path / 'reports')
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        init_db()
+        assert db.session.execute(text("PRAGMA journal_mode")).scalar() == 'wal'
+        assert db.session.execute(text("PRAGMA foreign_keys")).scalar() == 1
+        db.session.rollback()
+
+    sid = 'load-test'
+    setup = app.test_client()
+    setup.post('/api/config', json={"location": "Test Event", "squads": [{"name": f"S{i}"} for i in range(16)]},
+               headers={'X-Session-ID': sid})
+    squads = setup.get('/api/init', headers={'X-Session-ID': sid}).get_json()['squads']
+
+    threads, rounds = len(squads), 10
+    failures = []
+
+    def hammer(n):
+        client = app.test_client()
+        squad = squads[n]
+        for i in range(rounds):
+            status = '3' if i % 2 == 0 else '2'
+            rv = client.post(f"/api/squads/{squad['id']}/status?token={squad['access_token']}", json={"status": status})
+            if rv.status_code != 200:
+                failures.append((rv.status_code, rv.get_data(as_text=True)))
+            # Readers run alongside the writers
+            client.get('/api/init', headers={'X-Session-ID': sid})
+
+    workers = [threading.Thread(target=hammer, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+
+    assert failures == []
+    with app.app_context():
+        assert LogEntry.query.filter_by(session_id=sid, action='STATUS').count() == threads * rounds
+        db.session.remove()
+
+
+def test_write_while_report_streams(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-key'
+        JOIN_KEY = 'test-join-key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        REPORT_DIR = str(tmp_path / 'reports')
+        # Fail fast instead of queueing if the stream held the write lock
+        SQLITE_PRAGMAS = {**Config.SQLITE_PRAGMAS, 'busy_timeout': 200}
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        init_db()
+        db.session.remove()
+
+    sid = 'stream-test'
+    client = app.test_client()
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]},
+                headers={'X-Session-ID': sid})
+
+    # The end-of-shift report is a POST whose body is read afterwards
+    report = client.post('/api/config/end', headers={'X-Session-ID': sid})
+    chunks = iter(report.response)
+    first = next(chunks)
+
+    # From another thread: on this one the stream's app context (and
+    # its session) is still pushed and would be reused
+    results = []
+    writer = threading.Thread(target=lambda: results.append(
+        app.test_client().post('/api/squads', json={"name": "S2"}, headers={'X-Session-ID': sid})))
+    writer.start()
+    writer.join()
+    assert results[0].status_code == 201, results[0].get_data(as_text=True)
+
+    body = (first + b''.join(chunks)).decode()
+    report.close()
+    assert "Dienst: Test Event" in body
+
+
+WRITER = """
+import sys
+sys.path.insert(0, sys.argv[1])
+from app import create_app
+from config import Config
+
+class WriterConfig(Config):
+    SQLALCHEMY_DATABASE_URI = sys.argv[2]
+
+rv = create_app(WriterConfig).test_client().post(f"/api/squads/{sys.argv[3]}/status?token={sys.argv[4]}", json={"status": "3"})
+assert rv.status_code == 200, rv.get_data(as_text=True)
+"""
+
+
+def test_stream_wakes_for_write_in_other_process(tmp_path):
+    class FileConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-key'
+        JOIN_KEY = 'test-join-key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        REPORT_DIR = str(tmp_path / 'reports')
+        STREAM_HEARTBEAT = 30
+        STREAM_WATCH_INTERVAL = 0.2
+
+    app = create_app(FileConfig)
+    with app.app_context():
+        init_db()
+        db.session.remove()
+
+    sid = 'stream-test'
+    client = app.test_client()
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]},
+                headers={'X-Session-ID': sid})
+    squad = client.get('/api/init', headers={'X-Session-ID': sid}).get_json()['squads'][0]
+
+    stream = client.get('/api/stream', headers={'X-Session-ID': sid}, buffered=False)
+    chunks = iter(stream.response)
+    assert b'event: change' in next(chunks)
+
+    # A second app on the same database file, in its own process: its
+    # commit cannot reach this process's subscribers directly
+    root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    subprocess.run([sys.executable, '-c', WRITER, root, FileConfig.SQLALCHEMY_DATABASE_URI,
+                    str(squad['id']), squad['access_token']], check=True)
+    written = time.monotonic()
+    event = next(chunks)
+    latency = time.monotonic() - written
+    stream.close()
+
+    assert b'event: change' in event
+    assert latency < 2, f"woken after {latency:.1f}s"
@@ -23,3 +23,662 @@ def test_config_start(client):
     assert data['config']['location'] == "Test Event"
     assert len(data['squads']) == 1
     assert data['squads'][0]['name'] == "S1"
+
+def test_updates_cursor_delta(client):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}, {"name": "S2"}]})
+    init = client.get('/api/init').get_json()
+    cursor = init['cursor']
+    s1 = init['squads'][0]['id']
+
+    # Quiet poll: nothing changed, config/options omitted
+    data = client.get(f'/api/updates?cursor={cursor}').get_json()
+    assert data['cursor'] == cursor
+    assert data['squads'] == [] and data['missions'] == [] and data['logs'] == []
+    assert 'config' not in data and 'options' not in data
+
+    rv = client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": [s1]})
+    mid = rv.get_json()['id']
+    data = client.get(f'/api/updates?cursor={cursor}').get_json()
+    assert data['cursor'] > cursor
+    assert [m['id'] for m in data['missions']] == [mid]
+    assert [s['id'] for s in data['squads']] == [s1]
+    assert data['squads'][0]['active_mission']['id'] == mid
+    s1_logs = {l['id'] for l in data['logs'] if l['squad_id'] == s1}
+    assert s1_logs
+    cursor = data['cursor']
+
+    # Soft delete shows up as a tombstone
+    client.delete(f'/api/missions/{mid}', json={"reason": "Test"})
+    data = client.get(f'/api/updates?cursor={cursor}').get_json()
+    assert data['deleted']['missions'] == [mid]
+    assert data['missions'] == []
+    assert data['squads'][0]['active_mission'] is None
+    cursor = data['cursor']
+
+    client.delete(f'/api/squads/{s1}')
+    data = client.get(f'/api/updates?cursor={cursor}').get_json()
+    assert data['deleted']['squads'] == [s1]
+    # Its log lines come again, detached
+    assert s1_logs <= {l['id'] for l in data['logs'] if l['squad_id'] is None}
+
+    # Restarting the shift with new squads asks clients for a full reload
+    client.post('/api/config', json={"location": "Neu", "squads": [{"name": "S3"}]})
+    data = client.get(f'/api/updates?cursor={data["cursor"]}').get_json()
+    assert data['reset'] is True
+
+def test_journal_compaction_keeps_deltas(app, client):
+    from app.extensions import db
+    from app.journal import compact
+    from app.models import ChangeEntry
+
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}, {"name": "S2"}]})
+    init = client.get('/api/init').get_json()
+    sid = init['config']['session_id']
+    s1, s2 = (s['id'] for s in init['squads'])
+    cursors = [init['cursor']]
+    for status in ['3', '4', '7', '8', '2'] * 3:
+        client.post(f'/api/squads/{s1}/status', json={"status": status})
+        cursors.append(client.get('/api/init').get_json()['cursor'])
+    client.delete(f'/api/squads/{s2}')
+    cursors.append(client.get('/api/init').get_json()['cursor'])
+
+    def deltas():
+        return [client.get(f'/api/updates?cursor={c}').get_json() for c in cursors]
+
+    before, entries = deltas(), ChangeEntry.query.count()
+    assert compact(sid) > 0
+    db.session.commit()
+    # Same answer for every cursor, tombstone included, from fewer entries
+    assert deltas() == before
+    assert ChangeEntry.query.count() < entries
+
+    # A shift restart: nothing before it is kept, old cursors get the reset
+    client.post('/api/config', json={"location": "Neu", "squads": [{"name": "S3"}]})
+    compact(sid)
+    db.session.commit()
+    reset = ChangeEntry.query.filter_by(session_id=sid, op='reset').one()
+    assert ChangeEntry.query.filter(ChangeEntry.session_id == sid, ChangeEntry.id < reset.id).count() == 0
+    assert client.get(f'/api/updates?cursor={cursors[-1]}').get_json()['reset'] is True
+
+def test_journal_compacted_while_writing(app, client):
+    from app.models import ChangeEntry
+
+    app.config['JOURNAL_COMPACT_EVERY'] = 10
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    for status in ['3', '4', '7', '8', '2'] * 10:
+        client.post(f'/api/squads/{s1}/status', json={"status": status})
+    # 50 writes: the squad's entries collapse into one, its 50 log lines stay
+    assert ChangeEntry.query.count() < 80
+
+def test_stream_pushes_change_events(app, client):
+    app.config['STREAM_HEARTBEAT'] = 0.05
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+
+    rv = client.get('/api/stream', buffered=False)
+    assert rv.mimetype == 'text/event-stream'
+    chunks = iter(rv.response)
+    first = next(chunks).decode()
+    assert 'event: change' in first
+    cursor = int(first.split('"cursor": ')[1].split('}')[0])
+
+    assert next(chunks).decode() == ': keepalive\n\n'
+
+    client.post('/api/logs/custom', json={"details": "Lagemeldung"})
+    event = next(chunks).decode()
+    assert 'event: change' in event
+    assert f'"cursor": {cursor}' not in event
+    rv.close()
+
+    token = client.get('/api/init').get_json()['squads'][0]['access_token']
+    assert client.get('/api/stream?token=invalid').status_code == 403
+    rv = client.get(f'/api/stream?token={token}', buffered=False)
+    assert 'event: change' in next(iter(rv.response)).decode()
+    rv.close()
+
+def test_stream_limit_turns_streams_away(app, client):
+    app.config['STREAM_LIMIT'] = 1
+    client.post('/api/config', json={"location": "Test Event", "squads": []})
+
+    first = client.get('/api/stream', buffered=False)
+    assert 'event: change' in next(iter(first.response)).decode()
+
+    # Refused in one event, without holding a thread
+    busy = client.get('/api/stream').get_data(as_text=True)
+    assert busy.startswith('retry: 30000\n') and 'event: busy' in busy
+
+    first.close()
+    again = client.get('/api/stream', buffered=False)
+    assert 'event: change' in next(iter(again.response)).decode()
+    again.close()
+
+def test_create_mission_single_commit(app, client):
+    from sqlalchemy import event
+    from app.extensions import db
+
+    squads = [{"name": f"S{i}"} for i in range(5)]
+    client.post('/api/config', json={"location": "Test Event", "squads": squads})
+    squad_ids = [s['id'] for s in client.get('/api/init').get_json()['squads']]
+
+    commits = []
+    def count(conn):
+        commits.append(conn)
+    event.listen(db.engine, 'commit', count)
+    try:
+        rv = client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": squad_ids})
+    finally:
+        event.remove(db.engine, 'commit', count)
+    assert rv.status_code == 201
+    assert len(commits) == 1
+
+    mid = rv.get_json()['id']
+    logs = client.get(f'/api/missions/{mid}/logs').get_json()
+    # Dispatch logs first, in call order, then the creation log
+    assert [l['action'] for l in logs] == ['STATUS'] * 5 + ['EINSATZ ERSTELLT']
+    assert [l['id'] for l in logs] == sorted(l['id'] for l in logs)
+
+def test_join_verifies_only_matching_shift(app, monkeypatch):
+    from app.routes import api
+
+    for i in range(3):
+        app.test_client().post('/api/config', json={"location": f"Event {i}", "password": f"pw{i}", "squads": []})
+
+    checked = []
+    real_check = api.check_password_hash
+    def counting_check(pw_hash, pwd):
+        checked.append(pw_hash)
+        return real_check(pw_hash, pwd)
+    monkeypatch.setattr(api, 'check_password_hash', counting_check)
+
+    rv = app.test_client().post('/api/join', json={"password": "pw1"})
+    assert rv.status_code == 200
+    assert rv.get_json()['config']['location'] == "Event 1"
+    assert len(checked) == 1
+
+    checked.clear()
+    rv = app.test_client().post('/api/join', json={"password": "wrong"})
+    assert rv.status_code == 404
+    assert checked == []
+
+def test_join_survives_secret_key_rotation(app, monkeypatch):
+    from app.routes import api
+    app.test_client().post('/api/config', json={"location": "Event", "password": "pw", "squads": []})
+
+    checked = []
+    real_check = api.check_password_hash
+    monkeypatch.setattr(api, 'check_password_hash', lambda pw_hash, pwd: checked.append(pw_hash) or real_check(pw_hash, pwd))
+
+    # SECRET_KEY set or rotated by the operator: digests are not keyed by it
+    app.config['SECRET_KEY'] = 'rotated-key'
+    rv = app.test_client().post('/api/join', json={"password": "pw"})
+    assert rv.status_code == 200 and rv.get_json()['config']['location'] == "Event"
+    assert len(checked) == 1
+
+def test_join_rate_limited(app, client):
+    app.config['JOIN_RATE_LIMIT'] = 3
+    for _ in range(3):
+        assert client.post('/api/join', json={"password": "nope"}).status_code == 404
+    assert client.post('/api/join', json={"password": "nope"}).status_code == 429
+
+def test_join_rate_limited_per_client_behind_proxy():
+    from app import create_app
+    from app.extensions import db
+    from tests.conftest import TestConfig
+
+    class ProxyConfig(TestConfig):
+        PROXY_HOPS = 1
+        JOIN_RATE_LIMIT = 2
+
+    app = create_app(ProxyConfig)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        def join(addr):
+            return client.post('/api/join', json={"password": "nope"}, headers={'X-Forwarded-For': addr},
+                               environ_base={'REMOTE_ADDR': '10.0.0.1'}).status_code
+        assert [join('203.0.113.5') for _ in range(3)] == [404, 404, 429]
+        # Another phone behind the same proxy keeps its own budget
+        assert join('203.0.113.6') == 404
+        db.drop_all()
+
+def test_export_txt_streams_report(client):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    client.post('/api/missions', json={"mission_number": "7", "location": "Bühne", "reason": "Chirurg", "squad_ids": [s1]})
+    client.post(f'/api/squads/{s1}/status', json={"status": "4"})
+
+    rv = client.get('/api/export')
+    assert rv.status_code == 200
+    assert rv.is_streamed
+    assert rv.headers['Content-Disposition'].startswith('attachment; filename=protokoll_')
+    text = rv.get_data(as_text=True)
+    assert "=== EINSÄTZE (1) ===" in text
+    assert "Einsatz #7" in text
+    assert "Statusänderung S1: Integriert -> BO (Einsatz #7)" in text
+
+    rv = client.post('/api/config/end')
+    assert rv.headers['Content-Disposition'].startswith('attachment; filename=abschluss_')
+    assert "Dienstschluss" in rv.get_data(as_text=True)
+
+def test_export_txt_without_app_context(tmp_path):
+    from app import create_app
+    from app.extensions import db
+    from tests.conftest import TestConfig
+
+    class FileConfig(TestConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        REPORT_DIR = str(tmp_path / 'reports')
+
+    # As served: each request pushes and tears down its own context
+    # before the streamed body is read
+    app = create_app(FileConfig)
+    with app.app_context():
+        db.create_all()
+    client = app.test_client()
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+
+    rv = client.get('/api/export')
+    assert rv.status_code == 200
+    assert "Dienst: Test Event" in rv.get_data(as_text=True)
+    rv = client.post('/api/config/end')
+    assert rv.status_code == 200
+    assert "Dienst: Test Event" in rv.get_data(as_text=True)
+
+def test_mission_lifecycle_timestamps(client):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    uhs = client.post('/api/squads', json={"name": "UHS", "type": "Ambulanz"}).get_json()['id']
+
+    m = client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": [s1, uhs]}).get_json()
+    assert m['alarmed_at'] and not m['arrived_at'] and not m['completed_at']
+
+    # The Ambulanz taking the patient is not an arrival on scene
+    client.post(f'/api/squads/{uhs}/status', json={"status": "2"})
+    client.post(f'/api/squads/{uhs}/status', json={"status": "4"})
+    assert not client.get('/api/init').get_json()['missions'][0]['arrived_at']
+
+    client.post(f'/api/squads/{s1}/status', json={"status": "4"})
+    m = client.put(f"/api/missions/{m['id']}", json={"status": "Abgeschlossen"}).get_json()
+    assert m['arrived_at'] >= m['alarmed_at']
+    assert m['completed_at'] >= m['arrived_at']
+
+    m = client.put(f"/api/missions/{m['id']}", json={"status": "Laufend"}).get_json()
+    assert m['completed_at'] is None
+
+def test_pdf_report_job(client, app):
+    import os
+    import time
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": [s1]})
+
+    rv = client.post('/api/export/pdf/jobs')
+    assert rv.status_code == 202
+    job = rv.get_json()
+    for _ in range(100):
+        job = client.get(f"/api/export/pdf/jobs/{job['id']}").get_json()
+        if job['status'] not in ('queued', 'running'):
+            break
+        time.sleep(0.1)
+    assert job['status'] == 'done' and job['progress'] == 1.0
+
+    rv = client.get(job['download_url'])
+    assert rv.status_code == 200
+    assert rv.data.startswith(b'%PDF')
+    rv.close()
+
+    # Unchanged session: the rendered file is reused
+    rv = client.post('/api/export/pdf/jobs')
+    assert rv.status_code == 200 and rv.get_json()['status'] == 'done'
+
+    other = app.test_client()
+    other.post('/api/config', json={"location": "Other"})
+    assert other.get(f"/api/export/pdf/jobs/{job['id']}").status_code == 404
+
+    # Records older than REPORT_JOB_TTL go when the next job is submitted
+    from app.jobs import get_report_jobs
+    path = get_report_jobs()._job_path(job['id'])
+    stale = time.time() - app.config['REPORT_JOB_TTL'] - 1
+    os.utime(path, (stale, stale))
+    fresh = client.post('/api/export/pdf/jobs').get_json()
+    assert client.get(f"/api/export/pdf/jobs/{job['id']}").status_code == 404
+    assert client.get(f"/api/export/pdf/jobs/{fresh['id']}").status_code == 200
+
+def test_pdf_report_job_stored_under_rendered_version(client, app, monkeypatch, tmp_path):
+    from app.jobs import get_report_jobs
+    from app.report_cache import get_report_cache
+    app.config['REPORT_DIR'] = str(tmp_path)
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    jobs = get_report_jobs()
+
+    # Hold the job in the queue while a write lands
+    queued = []
+    monkeypatch.setattr(jobs.executor, 'submit', lambda fn, job: queued.append((fn, job)))
+    job = client.post('/api/export/pdf/jobs').get_json()
+    submitted = jobs.get(job['id'])['version']
+    client.post(f'/api/squads/{s1}/status', json={"status": "3"})
+    latest = client.get('/api/init').get_json()['cursor']
+    assert latest > submitted
+
+    # A newer report of the session must survive an older one being stored
+    cache = get_report_cache()
+    cache.store(jobs.get(job['id'])['session_id'], 'pdf', latest + 1, b'%PDF newer')
+    fn, queued_job = queued[0]
+    fn(queued_job)
+
+    job = client.get(f"/api/export/pdf/jobs/{job['id']}").get_json()
+    assert job['status'] == 'done'
+    stored = jobs.get(job['id'])
+    assert stored['version'] == latest
+    assert cache.get(stored['session_id'], 'pdf', latest)
+    assert cache.get(stored['session_id'], 'pdf', latest + 1)
+    rv = client.get(job['download_url'])
+    assert rv.status_code == 200 and rv.data.startswith(b'%PDF')
+    rv.close()
+
+def test_pdf_report_query_count(client, query_budget):
+    from app import reports
+    from app.models import ShiftConfig
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": f"S{i}"} for i in range(5)]})
+    squad_ids = [s['id'] for s in client.get('/api/init').get_json()['squads']]
+    for i in range(5):
+        mid = client.post('/api/missions', json={"location": f"Sektor {i}", "reason": "Chirurg", "squad_ids": squad_ids[i:]}).get_json()['id']
+        client.post(f'/api/squads/{squad_ids[i]}/status', json={"status": "3"})
+    client.delete(f'/api/missions/{mid}', json={"reason": "Fehlalarm"})
+    config = ShiftConfig.query.one()
+
+    # The bulk loads of load_report_data, nothing per mission or squad
+    with query_budget(5):
+        assert reports.generate_pdf_file(config).getvalue().startswith(b'%PDF')
+
+def test_export_cached_by_version(client, monkeypatch):
+    from app.routes import api
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+
+    first = client.get('/api/export')
+    body = first.get_data()
+    etag = first.headers['ETag']
+
+    # Unchanged session: served from the cache without rendering
+    with monkeypatch.context() as m:
+        m.setattr(api.reports, 'iter_export_bytes', None)
+        second = client.get('/api/export')
+        assert second.get_data() == body and second.headers['ETag'] == etag
+        second.close()
+
+    assert client.get('/api/export', headers={'If-None-Match': etag}).status_code == 304
+
+    # Any write moves the version: new ETag, fresh report
+    client.post(f'/api/squads/{s1}/status', json={"status": "3"})
+    rv = client.get('/api/export', headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+    assert rv.headers['ETag'] != etag
+    assert rv.get_data() != body
+
+    pdf = client.get('/api/export/pdf')
+    assert pdf.data.startswith(b'%PDF')
+    assert client.get('/api/export/pdf', headers={'If-None-Match': pdf.headers['ETag']}).status_code == 304
+
+def test_report_cache_drops_old_and_unused_reports(client, app):
+    import glob
+    import os
+    import time
+    reports_dir = app.config['REPORT_DIR']
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    s1 = client.get('/api/init').get_json()['squads'][0]['id']
+    client.get('/api/export').get_data()
+
+    # Another (ended) shift's report, last served two days ago
+    stale = os.path.join(reports_dir, 'report_0123456789abcdef_7.txt')
+    with open(stale, 'w') as f:
+        f.write('old')
+    os.utime(stale, (time.time() - 2 * 86400,) * 2)
+
+    client.post(f'/api/squads/{s1}/status', json={"status": "3"})
+    client.get('/api/export').get_data()
+    # One file for the current version, nothing else
+    assert len(glob.glob(os.path.join(reports_dir, 'report_*'))) == 1
+
+def test_log_feed_is_paginated(client, app):
+    app.config['INIT_LOG_LIMIT'] = 3
+    client.post('/api/config', json={"location": "Test Event"})
+    for i in range(7):
+        client.post('/api/logs/custom', json={"details": f"Ereignis {i}"})
+
+    everything = [l['id'] for l in client.get('/api/changes?limit=500').get_json()]
+    assert len(client.get('/api/init').get_json()['logs']) == 3
+
+    pages, before = [], None
+    while True:
+        url = '/api/changes?limit=3' + (f'&before_id={before}' if before else '')
+        page = client.get(url).get_json()
+        pages.extend(l['id'] for l in page)
+        if len(page) < 3:
+            break
+        before = page[-1]['id']
+    assert pages == everything
+
+    latest = client.get('/api/logs/latest').get_json()
+    assert len(latest) == 1 and latest[0]['details'] == "Ereignis 6"
+
+def test_squad_me_view(client):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}, {"name": "S2"}]})
+    client.post('/api/squads', json={"name": "UHS", "type": "Ambulanz"})
+    squads = client.get('/api/init').get_json()['squads']
+    s1, s2 = squads[0], squads[1]
+    me = f"/api/squads/me?token={s1['access_token']}"
+
+    rv = client.get(me)
+    data = rv.get_json()
+    assert data['squad']['id'] == s1['id']
+    assert data['active_mission'] is None
+    assert [a['name'] for a in data['ambulanzen']] == ['UHS']
+    etag = rv.headers['ETag']
+
+    assert client.get(me, headers={'If-None-Match': etag}).status_code == 304
+
+    # A change elsewhere in the session leaves this view untouched
+    client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": [s2['id']]})
+    assert client.get(me, headers={'If-None-Match': etag}).status_code == 304
+
+    client.post('/api/missions', json={"location": "Zelt", "reason": "Intern", "squad_ids": [s1['id']]})
+    rv = client.get(me, headers={'If-None-Match': etag})
+    assert rv.status_code == 200
+    mission = rv.get_json()['active_mission']
+    assert mission['location'] == "Zelt"
+
+    # Still running with an outcome entered: the phone keeps showing it
+    client.put(f"/api/missions/{mission['id']}", json={"outcome": "Belassen"})
+    data = client.get(me).get_json()
+    assert data['active_mission']['id'] == mission['id']
+    client.put(f"/api/missions/{mission['id']}", json={"status": "Abgeschlossen"})
+    assert client.get(me).get_json()['active_mission'] is None
+
+    assert client.get('/api/squads/me?token=nope').status_code == 403
+
+def test_polling_endpoints_conditional_get(client):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    init = client.get('/api/init')
+    s1 = init.get_json()['squads'][0]['id']
+
+    urls = ['/api/init', '/api/updates', f"/api/updates?cursor={init.get_json()['cursor']}",
+            '/api/changes', '/api/logs/latest']
+    etags = {url: client.get(url).headers['ETag'] for url in urls}
+    assert len(set(etags.values())) == len(urls)
+    for url, etag in etags.items():
+        rv = client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 304 and rv.data == b''
+
+    # Any write bumps the version
+    client.post(f'/api/squads/{s1}/status', json={"status": "3"})
+    for url, etag in etags.items():
+        rv = client.get(url, headers={'If-None-Match': etag})
+        assert rv.status_code == 200 and rv.headers['ETag'] != etag
+
+def test_polls_served_from_snapshot(client, app, query_budget):
+    app.config['SNAPSHOT_REVALIDATE'] = 60
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+    squad = client.get('/api/init').get_json()['squads'][0]
+    me = f"/api/squads/me?token={squad['access_token']}"
+    client.get(me)
+
+    with query_budget(0):
+        init = client.get('/api/init').get_json()
+        client.get('/api/updates')
+        client.get(me)
+
+    # Committed writes invalidate the snapshot
+    client.post(f"/api/squads/{squad['id']}/status", json={"status": "3"})
+    data = client.get('/api/init').get_json()
+    assert data['cursor'] > init['cursor']
+    assert data['squads'][0]['current_status'] == '3'
+    assert client.get(me).get_json()['squad']['current_status'] == '3'
+
+def test_mission_logs_query_budget(client, query_budget):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": f"S{i}"} for i in range(5)]})
+    squad_ids = [s['id'] for s in client.get('/api/init').get_json()['squads']]
+    mid = client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": squad_ids}).get_json()['id']
+
+    # Mission check, logs, squad names: not one lookup per log line
+    with query_budget(3):
+        logs = client.get(f'/api/missions/{mid}/logs').get_json()
+    assert sorted(l['squad_name'] for l in logs if l['squad_id']) == [f"S{i}" for i in range(5)]
+
+    # Squad names only come from the mission's own session
+    from app.extensions import db
+    from app.models import LogEntry, Mission
+    other = client.application.test_client()
+    other.post('/api/config', json={"location": "Other", "squads": [{"name": "Fremd"}]})
+    foreign = other.get('/api/init').get_json()['squads'][0]['id']
+    db.session.add(LogEntry(action='INFO', details='x', mission_id=mid, squad_id=foreign,
+                            session_id=db.session.get(Mission, mid).session_id))
+    db.session.commit()
+    logs = client.get(f'/api/missions/{mid}/logs').get_json()
+    assert 'squad_name' not in next(l for l in logs if l['squad_id'] == foreign)
+
+def test_sql_metrics(tmp_path):
+    from app import create_app
+    from app.extensions import db
+    from tests.conftest import TestConfig
+
+    class MetricsConfig(TestConfig):
+        SQL_METRICS = True
+        REPORT_DIR = str(tmp_path / 'reports')
+
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+        rv = client.get('/api/init')
+        assert rv.headers['Server-Timing'].startswith('db;dur=')
+        assert 'queries"' in rv.headers['Server-Timing']
+
+        metrics = client.get('/api/_debug/metrics').get_json()
+        assert metrics['api.get_init_data']['requests'] == 1
+        assert metrics['api.get_init_data']['queries_max'] > 0
+        assert metrics['api.save_config']['slowest'][0]['statement']
+        assert 'sql_debug_metrics' not in metrics
+
+        client.delete('/api/_debug/metrics')
+        assert client.get('/api/_debug/metrics').get_json() == {}
+        db.drop_all()
+
+def test_sql_metrics_disabled_by_default(client):
+    assert client.get('/api/_debug/metrics').status_code == 404
+    assert 'Server-Timing' not in client.get('/api/init').headers
+
+def test_prometheus_metrics_disabled_by_default(client):
+    assert client.get('/metrics').status_code == 404
+
+def test_prometheus_metrics(tmp_path):
+    from app import create_app
+    from app.extensions import db
+    from tests.conftest import TestConfig
+
+    class MetricsConfig(TestConfig):
+        METRICS_ENABLED = True
+        REPORT_DIR = str(tmp_path / 'reports')
+
+    app = create_app(MetricsConfig)
+    with app.app_context():
+        db.create_all()
+        client = app.test_client()
+        client.post('/api/config', json={"location": "Test Event", "squads": [{"name": "S1"}]})
+        squad = client.get('/api/init').get_json()['squads'][0]
+        client.post(f"/api/squads/{squad['id']}/status?token={squad['access_token']}", json={"status": "3"})
+        client.get('/api/export')
+
+        rv = client.get('/metrics')
+        assert rv.status_code == 200 and rv.mimetype == 'text/plain'
+        lines = rv.get_data(as_text=True).splitlines()
+        samples = {line.rsplit(' ', 1)[0].split('{')[0] for line in lines if not line.startswith('#')}
+        assert {
+            'johanniter_http_requests_total', 'johanniter_http_request_duration_seconds_bucket',
+            'johanniter_db_commit_duration_seconds_count', 'johanniter_log_actions_total',
+            'johanniter_report_duration_seconds_sum', 'johanniter_active_sessions',
+            'johanniter_mobile_squads', 'johanniter_stream_connections',
+        } <= samples
+        assert any(l.startswith('johanniter_http_requests_total{endpoint="api.get_init_data",method="GET",status="200"')
+                   for l in lines)
+        assert any(l.startswith('johanniter_report_duration_seconds_count{format="txt"') for l in lines)
+        mobile = next(l for l in lines if l.startswith('johanniter_mobile_squads{'))
+        assert int(mobile.rsplit(' ', 1)[1]) >= 1
+
+def test_mission_roster_bulk_and_incremental(client, query_budget):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": f"S{i}"} for i in range(6)]})
+    ids = [s['id'] for s in client.get('/api/init').get_json()['squads']]
+
+    with query_budget(40) as statements:
+        rv = client.post('/api/missions', json={"location": "Bühne", "reason": "Chirurg", "squad_ids": ids[:4] + ids[:1]})
+    mid = rv.get_json()['id']
+    assert rv.get_json()['squad_ids'] == ids[:4]
+    squad_selects = [s for s in statements if s.lstrip().startswith('SELECT') and 'FROM squad' in s and 'mission_squad' not in s]
+    assert len(squad_selects) == 1 and ' IN ' in squad_selects[0]
+
+    # Swap one squad: one lookup for the added id, one row out, one row in
+    with query_budget(40) as statements:
+        rv = client.put(f'/api/missions/{mid}', json={"squad_ids": ids[1:5]})
+    assert sorted(rv.get_json()['squad_ids']) == sorted(ids[1:5])
+    squad_selects = [s for s in statements if s.lstrip().startswith('SELECT') and 'FROM squad' in s and 'mission_squad' not in s]
+    assert len(squad_selects) == 1
+    roster_writes = [s for s in statements if 'mission_squad' in s and not s.lstrip().startswith('SELECT')]
+    assert len(roster_writes) == 2 and all('mission_id = ?' in s or 'VALUES' in s for s in roster_writes)
+
+    logs = client.get(f'/api/missions/{mid}/logs').get_json()
+    update = next(l for l in logs if l['action'] == 'EINSATZ UPDATE')
+    assert "+ S4" in update['details'] and "- S0" in update['details']
+
+def test_reorder_squads(client, query_budget):
+    client.post('/api/config', json={"location": "Test Event", "squads": [{"name": f"S{i}"} for i in range(5)]})
+    order = lambda: [s['name'] for s in client.get('/api/init').get_json()['squads']]
+    ids = {s['name']: s['id'] for s in client.get('/api/init').get_json()['squads']}
+    as_ids = lambda names: [ids[n] for n in names]
+
+    # First save renumbers with gaps, in one UPDATE
+    with query_budget(10) as statements:
+        client.post('/api/squads/reorder', json={"order": as_ids(['S4', 'S0', 'S1', 'S2', 'S3']), "moved": ids['S4']})
+    updates = [s for s in statements if s.lstrip().startswith('UPDATE squad')]
+    assert len(updates) == 1 and 'CASE' in updates[0]
+    assert order() == ['S4', 'S0', 'S1', 'S2', 'S3']
+
+    # Then a move touches the moved squad only
+    positions = {s['name']: s['position'] for s in client.get('/api/init').get_json()['squads']}
+    client.post('/api/squads/reorder', json={"order": as_ids(['S4', 'S0', 'S2', 'S1', 'S3']), "moved": ids['S2']})
+    moved = {s['name']: s['position'] for s in client.get('/api/init').get_json()['squads']}
+    assert order() == ['S4', 'S0', 'S2', 'S1', 'S3']
+    assert [n for n in moved if moved[n] != positions[n]] == ['S2']
+
+    # Moves to the ends, and a plain order without `moved`
+    client.post('/api/squads/reorder', json={"order": as_ids(['S3', 'S4', 'S0', 'S2', 'S1']), "moved": ids['S3']})
+    assert order() == ['S3', 'S4', 'S0', 'S2', 'S1']
+    client.post('/api/squads/reorder', json={"order": as_ids(['S4', 'S0', 'S2', 'S1', 'S3']), "moved": ids['S3']})
+    assert order() == ['S4', 'S0', 'S2', 'S1', 'S3']
+    client.post('/api/squads/reorder', json={"order": as_ids(['S0', 'S1', 'S2', 'S3', 'S4'])})
+    assert order() == ['S0', 'S1', 'S2', 'S3', 'S4']
+
+    # Another session's squads are left alone
+    other = client.application.test_client().post('/api/squads/reorder', json={"order": list(ids.values())[::-1]})
+    assert other.status_code == 200 and order() == ['S0', 'S1', 'S2', 'S3', 'S4']
@@ -0,0 +1,154 @@
+import pytest
+from sqlalchemy import create_engine, text
+
+from app.extensions import db
+from app.migrations import upgrade, MIGRATIONS
+from app.models import Squad, Mission, LogEntry, mission_squad
+from sqlalchemy.exc import IntegrityError
+
+
+def query_plan(query):
+    sql = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+    rows = db.session.execute(text(f"EXPLAIN QUERY PLAN {sql}")).fetchall()
+    return ' | '.join(row[-1] for row in rows)
+
+
+@pytest.mark.parametrize('build, index', [
+    (lambda: Squad.query.filter_by(session_id='s').order_by(Squad.position), 'ix_squad_session_position'),
+    (lambda: Squad.query.filter_by(access_token='t'), 'ix_squad_access_token'),
+    (lambda: Mission.query.filter_by(session_id='s', is_deleted=False).order_by(Mission.created_at.desc()),
+     'ix_mission_session_deleted_created'),
+    (lambda: Mission.query.filter(Mission.session_id == 's', Mission.updated_at > '2025-01-01'),
+     'ix_mission_session_updated'),
+    (lambda: LogEntry.query.filter_by(session_id='s').order_by(LogEntry.timestamp.desc()),
+     'ix_log_entry_session_timestamp'),
+    (lambda: LogEntry.query.filter_by(session_id='s').filter(db.or_(
+        LogEntry.timestamp < '2025-01-01', db.and_(LogEntry.timestamp == '2025-01-01', LogEntry.id < 5)
+    )).order_by(LogEntry.timestamp.desc(), LogEntry.id.desc()), 'ix_log_entry_session_timestamp'),
+    (lambda: LogEntry.query.filter_by(mission_id=1).order_by(LogEntry.timestamp), 'ix_log_entry_mission_timestamp'),
+    (lambda: LogEntry.query.filter_by(squad_id=1).order_by(LogEntry.timestamp), 'ix_log_entry_squad_timestamp'),
+    (lambda: db.session.query(mission_squad.c.mission_id).filter(mission_squad.c.squad_id == 1),
+     'ix_mission_squad_squad_id'),
+])
+def test_hot_queries_use_indexes(app, build, index):
+    plan = query_plan(build())
+    assert f'INDEX {index}' in plan, plan
+    assert 'TEMP B-TREE' not in plan, plan
+
+
+def test_upgrade_adds_indexes_to_existing_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    # Pre-migration schema: tables without the new indexes
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        for (name,) in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'ix_%'")).fetchall():
+            conn.execute(text(f"DROP INDEX {name}"))
+
+    assert upgrade(engine) == [m[0] for m in MIGRATIONS]
+    with engine.connect() as conn:
+        names = {row[0] for row in conn.execute(text("SELECT name FROM sqlite_master WHERE type = 'index'"))}
+    assert {'ix_squad_session_position', 'ix_log_entry_mission_timestamp', 'ix_mission_squad_squad_id'} <= names
+
+    # Already up to date: nothing runs twice
+    assert upgrade(engine) == []
+
+
+def test_lifecycle_backfill_from_logs(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO schema_version VALUES (2)"))
+        conn.execute(text("""INSERT INTO mission (id, location, reason, status, session_id, created_at, updated_at)
+                             VALUES (1, 'Zelt', 'Intern', 'Abgeschlossen', 's', '2025-07-01 12:00:00', '2025-07-01 13:00:00')"""))
+        conn.execute(text("INSERT INTO squad (id, name, type, session_id) VALUES (1, 'T1', 'Trupp', 's'), (2, 'UHS', 'Ambulanz', 's')"))
+        conn.execute(text("INSERT INTO mission_squad VALUES (1, 1), (1, 2)"))
+        for ts, action, details, squad_id in [
+            ('2025-07-01 12:00:05', 'STATUS', 'T1: Disposition (System)', 1),
+            # Not arrivals: an Ambulanz taking the patient, free text
+            ('2025-07-01 12:02:00', 'STATUS', 'Statusänderung UHS: EB -> BO', 2),
+            ('2025-07-01 12:03:00', 'EINSATZ UPDATE', 'Änderungen an Einsatz #1: Ort: Zelt 3 -> 4', 1),
+            ('2025-07-01 12:09:00', 'STATUS', 'Statusänderung T1: zBO -> BO', 1),
+            ('2025-07-01 12:40:00', 'EINSATZ UPDATE', 'Änderungen an Einsatz #1: Status geändert: Abgeschlossen', None),
+        ]:
+            conn.execute(text("INSERT INTO log_entry (timestamp, action, details, mission_id, squad_id, session_id) VALUES (:ts, :a, :d, 1, :s, 's')"),
+                         {'ts': ts, 'a': action, 'd': details, 's': squad_id})
+
+    assert upgrade(engine) == [m[0] for m in MIGRATIONS if m[0] > 2]
+    with engine.connect() as conn:
+        row = conn.execute(text("SELECT alarmed_at, arrived_at, completed_at FROM mission WHERE id = 1")).one()
+    assert [str(v)[:19] for v in row] == ['2025-07-01 12:00:05', '2025-07-01 12:09:00', '2025-07-01 12:40:00']
+
+
+def test_join_key_migration_drops_secret_key_digests(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'old.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE schema_version (version INTEGER NOT NULL)"))
+        conn.execute(text("INSERT INTO schema_version VALUES (3)"))
+        conn.execute(text("INSERT INTO shift_config (session_id, is_active, password_hash, join_digest) VALUES ('s', 1, 'h', 'old')"))
+        # Written by an earlier version of migration 4
+        conn.execute(text("INSERT INTO app_setting (name, value) VALUES ('join_key', 'k')"))
+
+    assert upgrade(engine) == [4, 5]
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT join_digest FROM shift_config")).scalar() is None
+        assert conn.execute(text("SELECT COUNT(*) FROM app_setting WHERE name = 'join_key'")).scalar() == 0
+
+
+def test_join_key_kept_out_of_database(tmp_path):
+    from app import create_app
+    from app.migrations import init_db
+    from config import Config
+
+    class FileConfig(Config):
+        TESTING = True
+        SECRET_KEY = 'test-key'
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'app.db'}"
+        REPORT_DIR = str(tmp_path / 'reports')
+
+    def start():
+        app = create_app(FileConfig)
+        app.instance_path = str(tmp_path / 'instance')
+        with app.app_context():
+            init_db()
+            db.session.remove()
+        return app
+
+    app = start()
+    app.test_client().post('/api/config', json={"location": "Event", "password": "pw", "squads": []})
+    key_path = tmp_path / 'instance' / 'join_key'
+    key = key_path.read_text()
+    assert oct(key_path.stat().st_mode & 0o777) == oct(0o600)
+    with app.app_context():
+        assert db.session.execute(text("SELECT join_digest FROM shift_config")).scalar()
+        db.session.remove()
+        db.engine.dispose()
+    assert key.encode() not in (tmp_path / 'app.db').read_bytes()
+
+    # Key file lost: the next start drops the digests it can't reproduce
+    key_path.unlink()
+    app = start()
+    assert key_path.read_text() != key
+    with app.app_context():
+        assert db.session.execute(text("SELECT join_digest FROM shift_config")).scalar() is None
+        db.session.remove()
+    rv = app.test_client().post('/api/join', json={"password": "pw"})
+    assert rv.status_code == 200 and rv.get_json()['config']['location'] == "Event"
+
+
+def test_foreign_keys_enforced_in_memory(app, client):
+    assert db.session.execute(text("PRAGMA foreign_keys")).scalar() == 1
+    db.session.add(LogEntry(action='INFO', details='x', squad_id=999, session_id='s'))
+    with pytest.raises(IntegrityError):
+        db.session.commit()
+    db.session.rollback()
+
+    # Delete paths keep the constraints: a squad with missions and logs,
+    # then a restart that replaces all squads
+    client.post('/api/config', json={"location": "Event", "squads": [{"name": "S1"}, {"name": "S2"}]})
+    s1, s2 = (s['id'] for s in client.get('/api/init').get_json()['squads'])
+    client.post('/api/missions', json={"location": "Zelt", "reason": "Intern", "squad_ids": [s1, s2]})
+    client.post(f'/api/squads/{s1}/status', json={"status": "4"})
+    assert client.delete(f'/api/squads/{s1}').status_code == 200
+    assert client.post('/api/config', json={"location": "Neu", "squads": [{"name": "S3"}]}).status_code == 200
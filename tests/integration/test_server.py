@@ -0,0 +1,63 @@
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+import pytest
+
+pytest.importorskip('gunicorn')
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def request(url, payload=None):
+    data = json.dumps(payload).encode('utf-8') if payload is not None else None
+    req = urllib.request.Request(url, data=data, headers={'Content-Type': 'application/json', 'X-Session-ID': 'smoke'})
+    with urllib.request.urlopen(req, timeout=5) as rv:
+        return rv.status, json.loads(rv.read())
+
+
+def test_serve_boots_and_answers(tmp_path):
+    port = free_port()
+    env = dict(os.environ,
+               DATABASE_URL=f"sqlite:///{tmp_path / 'app.db'}",
+               REPORT_DIR=str(tmp_path / 'reports'),
+               SECRET_KEY='smoke-test',
+               JOIN_KEY='smoke-test')
+    proc = subprocess.Popen(
+        [sys.executable, '-m', 'app', 'serve', '--bind', f'127.0.0.1:{port}', '--workers', '2', '--threads', '4'],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    base = f'http://127.0.0.1:{port}'
+    try:
+        deadline = time.monotonic() + 30
+        while True:
+            try:
+                status, data = request(f'{base}/api/init')
+                break
+            except OSError:
+                assert proc.poll() is None, proc.stdout.read().decode()
+                assert time.monotonic() < deadline, "server did not come up"
+                time.sleep(0.2)
+        assert status == 200 and data['config'] is None
+
+        request(f'{base}/api/config', {"location": "Smoke", "squads": [{"name": "S1"}]})
+        # Any worker answers with the same data
+        for _ in range(4):
+            status, data = request(f'{base}/api/init')
+            assert data['config']['location'] == "Smoke"
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        output = proc.communicate(timeout=30)[0].decode()
+
+    # Schema set up once, by the master
+    assert output.count("Migration 1:") == 1
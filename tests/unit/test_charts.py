@@ -0,0 +1,52 @@
+from datetime import datetime
+
+from reportlab.graphics.shapes import Drawing
+from reportlab.platypus import Image
+
+from app.reports import charts
+from app.models import Mission
+
+
+def _missions():
+    return [
+        Mission(reason="Chirurgisch", created_at=datetime(2025, 7, 1, 14, 5)),
+        Mission(reason="Chirurgisch", created_at=datetime(2025, 7, 1, 14, 50)),
+        Mission(reason="Internistisch", created_at=datetime(2025, 7, 1, 9, 30)),
+    ]
+
+
+def test_chart_data():
+    hours, reasons = charts.chart_data(_missions())
+    assert hours == [('09:00', 1), ('14:00', 2)]
+    assert reasons == [('Chirurgisch', 2), ('Internistisch', 1)]
+
+
+def test_vector_charts():
+    drawing = charts.chart_flowable('123', _missions())
+    assert isinstance(drawing, Drawing)
+    # Draws without matplotlib
+    assert drawing.asString('pdf').startswith(b'%PDF')
+
+
+def test_matplotlib_charts_cached_by_data(app, monkeypatch):
+    calls = []
+    render = charts.matplotlib_png
+    monkeypatch.setattr(charts, 'matplotlib_png', lambda *args: calls.append(args) or render(*args))
+
+    first = charts.chart_flowable('123', _missions(), 'matplotlib')
+    again = charts.chart_flowable('123', _missions(), 'matplotlib')
+    assert isinstance(first, Image) and again.filename == first.filename
+    assert len(calls) == 1
+
+    charts.chart_flowable('123', _missions()[:2], 'matplotlib')
+    assert len(calls) == 2
+
+
+def test_matplotlib_png_in_threads():
+    from concurrent.futures import ThreadPoolExecutor
+
+    hours, reasons = charts.chart_data(_missions())
+    with ThreadPoolExecutor(4) as pool:
+        pngs = list(pool.map(lambda _: charts.matplotlib_png(hours, reasons), range(8)))
+    assert all(png.startswith(b'\x89PNG') for png in pngs)
+    assert len(set(pngs)) == 1
@@ -0,0 +1,25 @@
+import time
+
+from app import metrics
+
+
+def test_histogram_times_generator_without_consumer():
+    histogram = metrics.Histogram('test_generate_seconds', "Test.")
+    try:
+        @histogram.time()
+        def generate():
+            time.sleep(0.05)
+            yield 'head'
+            yield 'tail'
+
+        for _ in generate():
+            time.sleep(0.2)  # a slow client between chunks
+        counts, total = histogram._values[()]
+        assert sum(counts) == 1
+        assert 0.05 <= total < 0.2
+
+        # An abandoned stream is still observed once
+        next(generate())
+        assert sum(histogram._values[()][0]) == 2
+    finally:
+        metrics._registry.remove(histogram)
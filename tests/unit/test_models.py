@@ -24,3 +24,21 @@ def test_mission_creation(app):
         db.session.add(m)
         db.session.commit()
         assert m.status == "Laufend"
+
+def test_squad_serialization_query_count(app, query_budget):
+    with app.app_context():
+        squads = [Squad(name=f"S{i}", session_id="123") for i in range(10)]
+        db.session.add_all(squads)
+        for i in range(20):
+            m = Mission(location="Loc", reason="Sick", session_id="123")
+            m.squads = squads[i % 10:i % 10 + 2]
+            db.session.add(m)
+        db.session.commit()
+        db.session.expunge_all()
+
+        # squads, their missions, the mission rosters
+        with query_budget(3):
+            data = [s.to_dict() for s in Squad.for_session("123").all()]
+
+        assert len(data) == 10
+        assert all(d['active_mission'] for d in data)
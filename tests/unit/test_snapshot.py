@@ -0,0 +1,85 @@
+import gc
+import tracemalloc
+
+from app.snapshot import SnapshotCache
+
+
+def snapshot_data(n=0, token=None):
+    return {'cursor': n, 'squads': [{'id': 1, 'access_token': token}], 'missions': [], 'pad': 'x' * 100}
+
+
+def test_snapshot_built_once_until_invalidated():
+    cache = SnapshotCache(revalidate=60)
+    builds = []
+    def build():
+        builds.append(1)
+        return len(builds), snapshot_data(len(builds), token='t')
+
+    first = cache.get('a', build, lambda: 1)
+    assert cache.get('a', build, lambda: 1) is first
+    assert cache.cursor('a') == 1
+    assert cache.session_for_token('t') == 'a'
+
+    cache.invalidate(['a'])
+    assert cache.cursor('a') is None
+    assert cache.session_for_token('t') is None
+    assert cache.get('a', build, lambda: 2).cursor == 2
+    assert len(builds) == 2
+
+
+def test_snapshot_revalidated_against_cursor():
+    cache = SnapshotCache(revalidate=0)
+    entry = cache.get('a', lambda: (1, snapshot_data(1)), lambda: 1)
+    # Unchanged cursor: entry kept
+    assert cache.get('a', lambda: (2, snapshot_data(2)), lambda: 1) is entry
+    # Written by another process: rebuilt
+    assert cache.get('a', lambda: (2, snapshot_data(2)), lambda: 2).cursor == 2
+
+
+def test_snapshot_not_stored_when_invalidated_during_build():
+    cache = SnapshotCache(revalidate=60)
+    def build():
+        cache.invalidate(['a'])  # a commit lands while building
+        return 1, snapshot_data(1)
+    cache.get('a', build, lambda: 1)
+    assert cache.cursor('a') is None
+
+
+def test_snapshot_lru_eviction():
+    size = SnapshotCache().get('x', lambda: (0, snapshot_data()), lambda: 0).size
+    cache = SnapshotCache(max_sessions=2, max_bytes=10 * size, revalidate=60)
+    for sid in 'abc':
+        cache.get(sid, lambda: (0, snapshot_data()), lambda: 0)
+    assert cache.cursor('a') is None and cache.cursor('c') == 0
+
+    # Byte cap: room for two entries; 'b' was used last, so 'c' goes
+    cache = SnapshotCache(max_bytes=2 * size, revalidate=60)
+    for sid in 'bc':
+        cache.get(sid, lambda: (0, snapshot_data()), lambda: 0)
+    cache.get('b', lambda: (0, snapshot_data()), lambda: 0)
+    cache.get('d', lambda: (0, snapshot_data()), lambda: 0)
+    assert cache.cursor('b') == 0 and cache.cursor('c') is None and cache.cursor('d') == 0
+
+
+def test_snapshot_byte_cap_bounds_memory():
+    def build(n):
+        squads = [{'id': i, 'name': f"S{i}", 'access_token': f"token-{n}-{i}", 'current_status': '2'} for i in range(50)]
+        missions = [{'id': i, 'location': f"Sektor {i}", 'squad_ids': [i % 50], 'status': 'Laufend'} for i in range(200)]
+        return 0, {'cursor': 0, 'squads': squads, 'missions': missions, 'logs': []}
+
+    cap = 256 * 1024
+    cache = SnapshotCache(max_sessions=1000, max_bytes=cap, revalidate=60)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        for n in range(100):
+            cache.get(f"s{n}", lambda: build(n), lambda: 0)
+        gc.collect()
+        held = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+    assert cache._bytes <= cap
+    # What the cache really keeps alive, bookkeeping included
+    assert held <= 1.25 * cap, f"{held} bytes held for a {cap} byte cap"